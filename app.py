@@ -1,6 +1,45 @@
 import streamlit as st
 import pandas as pd
+import base64
 import datetime
+import os
+
+from utils.avatars import UI_AVATARS_URL, initials_avatar
+from utils.blobstore import BlobStore, is_blob_key
+from utils.bracket import BYE, PENDING
+from utils.cache import ViewCache
+from utils.eventlog import EventLogRepository
+from utils.events import FileChannel
+from utils.metrics import METRICS, timed
+from utils.profiling import capture, list_captures
+from utils.repository import SQLiteRepository
+from utils.store import TournamentStore
+from utils.thumbnails import PLACEHOLDER_SVG, ThumbnailPipeline
+
+# Percorso del database SQLite con i dati del torneo
+DB_PATH = os.environ.get("TORNEO_DB_PATH", os.path.join("data", "torneo.db"))
+
+# Cartella delle immagini caricate (indirizzate per contenuto)
+BLOB_DIR = os.environ.get("TORNEO_BLOB_DIR", os.path.join("data", "blobs"))
+
+# Cartella delle miniature generate in background
+THUMBNAIL_DIR = os.environ.get("TORNEO_THUMBNAIL_DIR", os.path.join("data", "thumbs"))
+
+# Cartella del log degli eventi: se impostata sostituisce il database SQLite
+# (snapshot + log in sola aggiunta, per un solo processo Streamlit)
+LOG_DIR = os.environ.get("TORNEO_LOG_DIR")
+
+# File con gli eventi di modifica condivisi tra più processi Streamlit (facoltativo)
+EVENTS_PATH = os.environ.get("TORNEO_EVENTS_PATH")
+
+# Ogni quanti secondi una sessione controlla se i dati mostrati sono cambiati
+CHANGE_POLL_SECONDS = float(os.environ.get("TORNEO_CHANGE_POLL_SECONDS", "5"))
+
+# Sfide mostrate per pagina nello storico
+HISTORY_PAGE_SIZE = 20
+
+# Avversari mostrati per pagina nella proposta di sfida
+OPPONENTS_PAGE_SIZE = 20
 
 # Page configuration
 st.set_page_config(
@@ -80,13 +119,10 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Initialize session state for Chanbara tournament
-if "page" not in st.session_state: 
-    st.session_state.page = "login"
-if "user" not in st.session_state: 
-    st.session_state.user = None
-if "tournaments" not in st.session_state:
-    st.session_state.tournaments = [
+# Dati dimostrativi per un database vuoto
+def seed_store(store):
+    """Fill an empty store with the demo tournament data."""
+    for tournament in [
         {
             "id": 1,
             "name": "Torneo Chanbara 2025",
@@ -108,40 +144,40 @@ if "tournaments" not in st.session_state:
             "start_date": "2025-09-01",
             "end_date": "2025-10-15"
         }
-    ]
-
-# Per retrocompatibilità
-if "tournament" not in st.session_state:
-    st.session_state.tournament = st.session_state.tournaments[0]
-if "athletes" not in st.session_state:
-    st.session_state.athletes = [
-        {"id": 1, "name": "Mario Rossi", "nickname": "Super Mario", "email": "mario@example.com", "password": "password", "level": 3, "profile_img": "https://ui-avatars.com/api/?name=Super+Mario&background=random", "tournaments": [1, 3]},
-        {"id": 2, "name": "Luigi Verdi", "nickname": "Green Arrow", "email": "luigi@example.com", "password": "password", "level": 2, "profile_img": "https://ui-avatars.com/api/?name=Green+Arrow&background=random", "tournaments": [1, 2]},
-        {"id": 3, "name": "Anna Bianchi", "nickname": "Ninja", "email": "anna@example.com", "password": "password", "level": 2, "profile_img": "https://ui-avatars.com/api/?name=Ninja&background=random", "tournaments": [1]},
-        {"id": 4, "name": "Sara Neri", "nickname": "Black Samurai", "email": "sara@example.com", "password": "password", "level": 1, "profile_img": "https://ui-avatars.com/api/?name=Black+Samurai&background=random", "tournaments": [2, 3]}
-    ]
-if "specialties" not in st.session_state:
-    st.session_state.specialties = [
+    ]:
+        store.add_tournament(tournament)
+
+    for athlete in [
+        {"id": 1, "name": "Mario Rossi", "nickname": "Super Mario", "email": "mario@example.com", "password": "password", "level": 3, "profile_img": None, "tournaments": [1, 3]},
+        {"id": 2, "name": "Luigi Verdi", "nickname": "Green Arrow", "email": "luigi@example.com", "password": "password", "level": 2, "profile_img": None, "tournaments": [1, 2]},
+        {"id": 3, "name": "Anna Bianchi", "nickname": "Ninja", "email": "anna@example.com", "password": "password", "level": 2, "profile_img": None, "tournaments": [1]},
+        {"id": 4, "name": "Sara Neri", "nickname": "Black Samurai", "email": "sara@example.com", "password": "password", "level": 1, "profile_img": None, "tournaments": [1, 2, 3]}
+    ]:
+        store.add_athlete(athlete)
+
+    for specialty in [
         {"id": 1, "name": "kodachi"},
         {"id": 2, "name": "choken free"},
         {"id": 3, "name": "nito"},
         {"id": 4, "name": "tate-kodachi"},
         {"id": 5, "name": "tate-choken"}
-    ]
-if "challenges" not in st.session_state:
+    ]:
+        store.add_specialty(specialty)
+
     # Create sample challenges
     today = datetime.date.today()
     tomorrow = today + datetime.timedelta(days=1)
     next_week = today + datetime.timedelta(days=7)
-    
-    st.session_state.challenges = [
+
+    for challenge in [
         {
             "id": 1,
             "challenger_id": 1,
             "opponent_id": 2,
             "date": tomorrow.isoformat(),
             "specialty_id": 1,
-            "winner_id": None
+            "winner_id": None,
+            "tournament_id": 1
         },
         {
             "id": 2,
@@ -149,38 +185,138 @@ if "challenges" not in st.session_state:
             "opponent_id": 4,
             "date": next_week.isoformat(),
             "specialty_id": 3,
-            "winner_id": None
+            "winner_id": None,
+            "tournament_id": 1
         }
-    ]
+    ]:
+        store.add_challenge(challenge)
+
+    store.save_all()
+
+@st.cache_resource
+def get_blob_store():
+    """Get the on-disk store for uploaded images."""
+    return BlobStore(BLOB_DIR)
+
+@st.cache_resource
+def get_thumbnail_pipeline():
+    """Get the background pipeline that produces profile thumbnails."""
+    return ThumbnailPipeline(get_blob_store(), THUMBNAIL_DIR)
+
+def migrate_inline_images(store):
+    """Move base64 data URIs left by older versions into the blob store."""
+    for athlete in list(store.athletes.values()):
+        profile_img = athlete.get("profile_img") or ""
+        if profile_img.startswith("data:") and ";base64," in profile_img:
+            data = base64.b64decode(profile_img.split(";base64,", 1)[1])
+            store.modify_athlete(athlete["id"], {"profile_img": get_blob_store().put(data)})
+
+@st.cache_resource
+def get_shared_store(db_path, events_path=None, log_dir=None):
+    """Load the tournament store shared by every session of this process."""
+    repository = EventLogRepository(log_dir) if log_dir else SQLiteRepository(db_path)
+    store = TournamentStore(repository)
+
+    # Il canale parte prima del caricamento, così nessun evento va perso
+    if events_path:
+        store.attach_channel(FileChannel(events_path))
+
+    if repository.is_empty():
+        seed_store(store)
+    else:
+        store.load()
+        migrate_inline_images(store)
+
+    # Sfide eliminate e rating da ricalcolare: in background, fuori dalle esecuzioni delle pagine
+    store.start_compactor()
+    return store
+
+@st.cache_resource
+def get_view_cache(db_path, events_path=None, log_dir=None):
+    """Get the derived views shared by every session of this process."""
+    # Le viste dipendono solo dai loro parametri: una copia per processo, non per sessione
+    view_cache = ViewCache(maxsize=256)
+    get_shared_store(db_path, events_path, log_dir).events.subscribe(view_cache)
+    return view_cache
+
+# Initialize session state for Chanbara tournament
+if "page" not in st.session_state: 
+    st.session_state.page = "login"
+if "user" not in st.session_state: 
+    st.session_state.user = None
+
+# Numero dell'ultimo evento dello store visto dall'ultima pagina mostrata a questa sessione
+if "seen_sequence" not in st.session_state:
+    st.session_state.seen_sequence = get_shared_store(DB_PATH, EVENTS_PATH, LOG_DIR).sequence
+
+# Versione di ogni atleta o sfida mostrata nei moduli all'esecuzione precedente
+if "seen_versions" not in st.session_state:
+    st.session_state.seen_versions = {}
+
+# Per retrocompatibilità (il torneo corrente può essere stato eliminato da un'altra sessione)
+if ("tournament" not in st.session_state
+        or get_shared_store(DB_PATH, EVENTS_PATH, LOG_DIR).get_tournament_by_id(st.session_state.tournament["id"]) is None):
+    st.session_state.tournament = get_shared_store(DB_PATH, EVENTS_PATH, LOG_DIR).list_tournaments()[0]
+
+# Percorso del file con le metriche in formato Prometheus
+METRICS_PATH = os.environ.get("TORNEO_METRICS_PATH", os.path.join("data", "metrics.prom"))
+
+# Cartella dei profili cProfile catturati su richiesta
+PROFILE_DIR = os.environ.get("TORNEO_PROFILE_DIR", os.path.join("data", "profiles"))
 
 # Helper functions for Chanbara tournament
+def get_store():
+    """Get the tournament data store shared by all sessions."""
+    return get_shared_store(DB_PATH, EVENTS_PATH, LOG_DIR)
+
+def get_views():
+    """Get the derived views (DataFrames, options) shared by all sessions."""
+    return get_view_cache(DB_PATH, EVENTS_PATH, LOG_DIR)
+
+def rerun():
+    """Rerun the script, counting the rerun against the current user action."""
+    METRICS.increment("reruns", st.session_state.get("action_page", st.session_state.page))
+    st.session_state.rerun_requested = True
+    st.rerun()
+
+def seen_version(key, record):
+    """Get the version of a record shown by the previous run, and remember the current one.
+
+    A click reruns the script, and in that run the record may already hold
+    another admin's change: the version the form was built from is the one
+    stored by the run before.
+    """
+    seen = st.session_state.seen_versions.get(key, record["version"])
+    st.session_state.seen_versions[key] = record["version"]
+    return seen
+
+@timed("helper")
 def get_athlete_by_id(athlete_id):
     """Get athlete information by ID."""
-    for athlete in st.session_state.athletes:
-        if athlete["id"] == athlete_id:
-            return athlete
-    return None
+    return get_store().get_athlete_by_id(athlete_id)
 
+@timed("helper")
 def get_athlete_by_email(email):
     """Get athlete information by email."""
-    for athlete in st.session_state.athletes:
-        if athlete["email"] == email:
-            return athlete
-    return None
+    return get_store().get_athlete_by_email(email)
 
+@timed("helper")
 def get_specialty_by_id(specialty_id):
     """Get specialty information by ID."""
-    for specialty in st.session_state.specialties:
-        if specialty["id"] == specialty_id:
-            return specialty
-    return None
+    return get_store().get_specialty_by_id(specialty_id)
+
+@timed("helper")
+def get_tournament_by_id(tournament_id):
+    """Get tournament information by ID."""
+    return get_store().get_tournament_by_id(tournament_id)
 
+@timed("helper")
 def authenticate(email, password, is_admin=False):
     """Authenticate a user."""
     if is_admin:
         # Admin authentication (simplified)
         if email == "admin@example.com" and password == "admin123":
-            st.session_state.user = {"id": 999, "name": "Admin", "email": email, "is_admin": True, "profile_img": "https://ui-avatars.com/api/?name=Admin&background=red"}
+            st.session_state.user = {"id": 999, "name": "Admin", "email": email, "is_admin": True, "profile_img": None}
             st.session_state.page = "admin"
             return True
         return False
@@ -188,417 +324,325 @@ def authenticate(email, password, is_admin=False):
         # Athlete authentication
         athlete = get_athlete_by_email(email)
         if athlete and athlete["password"] == password:
-            athlete["is_admin"] = False
-            st.session_state.user = athlete
+            # Copia per la sessione: il record dello store è condiviso da tutte
+            st.session_state.user = dict(athlete, is_admin=False)
             st.session_state.page = "profile"
             return True
         return False
 
+@timed("helper")
+def refresh_session_records():
+    """Replace the session's copies of the logged-in athlete and the current tournament with their current records."""
+    user = st.session_state.user
+    if user and not user.get("is_admin", False):
+        athlete = get_athlete_by_id(user["id"])
+        # Atleta eliminato nel frattempo: la sessione si chiude
+        st.session_state.user = dict(athlete, is_admin=False) if athlete else None
+    # Torneo eliminato nel frattempo: si passa al primo rimasto
+    tournament = get_store().get_tournament_by_id(st.session_state.tournament["id"])
+    st.session_state.tournament = tournament or get_store().list_tournaments()[0]
+
+@timed("helper")
 def register_athlete(name, email, password, nickname=None, tournament_id=1):
     """Register a new athlete."""
-    # Trova il torneo selezionato
-    selected_tournament = None
-    for tournament in st.session_state.tournaments:
-        if tournament["id"] == tournament_id:
-            selected_tournament = tournament
-            break
-    
-    if not selected_tournament:
-        return False, "Torneo non trovato"
-    
-    if not selected_tournament["registration_open"]:
-        return False, "Le registrazioni per questo torneo sono chiuse"
-    
-    # Check if email already exists
-    if get_athlete_by_email(email):
-        return False, "Email già registrata"
-    
-    # Use nickname or default to name if not provided
-    if not nickname:
-        nickname = name.split()[0]  # Use first name as default nickname
-    
-    # Create new athlete
-    new_id = max(athlete["id"] for athlete in st.session_state.athletes) + 1 if st.session_state.athletes else 1
-    new_athlete = {
-        "id": new_id,
-        "name": name,
-        "nickname": nickname,
-        "email": email,
-        "password": password,
-        "level": 1,
-        "profile_img": f"https://ui-avatars.com/api/?name={nickname.replace(' ', '+')}&background=random",
-        "tournaments": [tournament_id]
-    }
-    
-    st.session_state.athletes.append(new_athlete)
-    return True, "Registrazione completata con successo"
+    return get_store().register_athlete(name, email, password, nickname, tournament_id)
 
+@timed("helper")
 def delete_athlete(athlete_id):
     """Delete an athlete and all their challenges."""
-    # Trova l'atleta da eliminare
-    athlete_index = None
-    for i, athlete in enumerate(st.session_state.athletes):
-        if athlete["id"] == athlete_id:
-            athlete_index = i
-            break
-    
-    if athlete_index is None:
-        return False, "Atleta non trovato"
-    
-    # Rimuovi tutte le sfide relative all'atleta
-    st.session_state.challenges = [c for c in st.session_state.challenges 
-                                 if c["challenger_id"] != athlete_id and c["opponent_id"] != athlete_id]
-    
-    # Rimuovi l'atleta
-    st.session_state.athletes.pop(athlete_index)
-    
-    return True, "Atleta eliminato con successo"
+    return get_store().delete_athlete(athlete_id)
 
-def modify_athlete(athlete_id, data):
-    """Modify an athlete's data."""
-    # Trova l'atleta da modificare
-    athlete_index = None
-    for i, athlete in enumerate(st.session_state.athletes):
-        if athlete["id"] == athlete_id:
-            athlete_index = i
-            break
-    
-    if athlete_index is None:
-        return False, "Atleta non trovato"
-    
-    # Aggiorna i dati dell'atleta
-    for key, value in data.items():
-        if key in st.session_state.athletes[athlete_index]:
-            st.session_state.athletes[athlete_index][key] = value
-    
-    return True, "Dati atleta aggiornati con successo"
+@timed("helper")
+def delete_athletes(athlete_ids):
+    """Delete many athletes and their challenges in one batch."""
+    return get_store().delete_athletes(athlete_ids)
 
+@timed("helper")
+def modify_athlete(athlete_id, data, expected_version=None):
+    """Modify an athlete's data (refused if it changed since ``expected_version``)."""
+    return get_store().modify_athlete(athlete_id, data, expected_version)
+
+@timed("helper")
 def enroll_in_tournament(athlete_id, tournament_id):
     """Enroll an athlete in a tournament."""
-    # Trova l'atleta
-    athlete_index = None
-    for i, athlete in enumerate(st.session_state.athletes):
-        if athlete["id"] == athlete_id:
-            athlete_index = i
-            break
-    
-    if athlete_index is None:
-        return False, "Atleta non trovato"
-    
-    # Trova il torneo
-    tournament = None
-    for t in st.session_state.tournaments:
-        if t["id"] == tournament_id:
-            tournament = t
-            break
-    
-    if not tournament:
-        return False, "Torneo non trovato"
-    
-    if not tournament["registration_open"]:
-        return False, "Le registrazioni per questo torneo sono chiuse"
-    
-    # Verifica se l'atleta è già iscritto
-    if tournament_id in st.session_state.athletes[athlete_index].get("tournaments", []):
-        return False, "Atleta già iscritto a questo torneo"
-    
-    # Iscrivi l'atleta al torneo
-    if "tournaments" not in st.session_state.athletes[athlete_index]:
-        st.session_state.athletes[athlete_index]["tournaments"] = []
-    
-    st.session_state.athletes[athlete_index]["tournaments"].append(tournament_id)
-    
-    return True, f"Iscrizione al torneo {tournament['name']} completata con successo"
+    return get_store().enroll_in_tournament(athlete_id, tournament_id)
 
+@timed("helper")
 def create_challenge(challenger_id, opponent_id, date, specialty_id):
     """Create a new challenge."""
-    if st.session_state.tournament["registration_open"]:
-        return False, "Le sfide possono essere create solo dopo la chiusura delle registrazioni"
-    
-    # Validate challenger and opponent
-    challenger = get_athlete_by_id(challenger_id)
-    opponent = get_athlete_by_id(opponent_id)
-    
-    if not challenger or not opponent:
-        return False, "Atleta non trovato"
-    
-    # Check if opponent is of equal or higher level
-    if opponent["level"] < challenger["level"]:
-        return False, "Puoi sfidare solo atleti di livello pari o superiore"
-    
-    # Check if specialty exists
-    specialty = get_specialty_by_id(specialty_id)
-    if not specialty:
-        return False, "Specialità non trovata"
-    
-    # Check if date is in the future
-    challenge_date = datetime.date.fromisoformat(date)
-    if challenge_date <= datetime.date.today():
-        return False, "La data della sfida deve essere futura"
-    
-    # Check if there's already a challenge between these athletes on this date
-    for challenge in st.session_state.challenges:
-        if ((challenge["challenger_id"] == challenger_id and challenge["opponent_id"] == opponent_id) or
-            (challenge["challenger_id"] == opponent_id and challenge["opponent_id"] == challenger_id)) and \
-           challenge["date"] == date:
-            return False, "Esiste già una sfida tra questi atleti per questa data"
-    
-    # Create new challenge
-    new_id = max(challenge["id"] for challenge in st.session_state.challenges) + 1 if st.session_state.challenges else 1
-    new_challenge = {
-        "id": new_id,
-        "challenger_id": challenger_id,
-        "opponent_id": opponent_id,
-        "date": date,
-        "specialty_id": specialty_id,
-        "winner_id": None
-    }
-    
-    st.session_state.challenges.append(new_challenge)
-    return True, "Sfida creata con successo"
-
-def record_challenge_result(challenge_id, winner_id):
-    """Record the result of a challenge."""
-    # Find the challenge
-    for i, challenge in enumerate(st.session_state.challenges):
-        if challenge["id"] == challenge_id:
-            # Check if result is already recorded
-            if challenge["winner_id"] is not None:
-                return False, "Il risultato è già stato registrato"
-            
-            # Check if winner is one of the athletes
-            if winner_id != challenge["challenger_id"] and winner_id != challenge["opponent_id"]:
-                return False, "Il vincitore deve essere uno degli atleti partecipanti alla sfida"
-            
-            # Check if the challenge date is today or in the past
-            challenge_date = datetime.date.fromisoformat(challenge["date"])
-            if challenge_date > datetime.date.today():
-                return False, "Non è possibile registrare il risultato di una sfida futura"
-            
-            # Update challenge with winner
-            st.session_state.challenges[i]["winner_id"] = winner_id
-            
-            # Increase winner's level
-            for j, athlete in enumerate(st.session_state.athletes):
-                if athlete["id"] == winner_id:
-                    st.session_state.athletes[j]["level"] += 1
-                    break
-            
-            return True, "Risultato registrato con successo"
-    
-    return False, "Sfida non trovata"
+    return get_store().create_challenge(challenger_id, opponent_id, date, specialty_id,
+                                        st.session_state.tournament["id"])
+
+@timed("helper")
+def generate_calendar(specialty_id, courts, matches_per_court=1, max_per_day=1, pool_size=None):
+    """Generate the round robin (or pool) calendar of the current tournament."""
+    return get_store().generate_calendar(st.session_state.tournament["id"], specialty_id, courts,
+                                         matches_per_court, max_per_day, pool_size)
+
+@timed("helper")
+def generate_swiss_round(specialty_id):
+    """Pair the current tournament's athletes for the next Swiss round."""
+    return get_store().generate_swiss_round(st.session_state.tournament["id"], specialty_id)
 
+@timed("helper")
+def create_bracket(specialty_id, double=False):
+    """Start an elimination bracket for the current tournament."""
+    return get_store().create_bracket(st.session_state.tournament["id"], specialty_id, double)
+
+@timed("helper")
+def delete_bracket():
+    """Drop the bracket of the current tournament."""
+    return get_store().delete_bracket(st.session_state.tournament["id"])
+
+@timed("helper")
+def record_challenge_result(challenge_id, winner_id, expected_version=None):
+    """Record the result of a challenge (refused if it changed since ``expected_version``)."""
+    return get_store().record_challenge_result(challenge_id, winner_id, expected_version)
+
+@timed("helper")
 def close_registration(tournament_id=None):
     """Close tournament registration."""
     if tournament_id is None:
         # Retrocompatibilità
-        st.session_state.tournament["registration_open"] = False
-        # Aggiorna anche nell'array dei tornei
-        for i, tournament in enumerate(st.session_state.tournaments):
-            if tournament["id"] == st.session_state.tournament["id"]:
-                st.session_state.tournaments[i]["registration_open"] = False
-                break
-        return True, "Registrazione chiusa con successo"
-    else:
-        # Cerca il torneo specifico
-        for i, tournament in enumerate(st.session_state.tournaments):
-            if tournament["id"] == tournament_id:
-                st.session_state.tournaments[i]["registration_open"] = False
-                # Aggiorna anche il torneo corrente se è quello selezionato
-                if st.session_state.tournament["id"] == tournament_id:
-                    st.session_state.tournament["registration_open"] = False
-                return True, f"Registrazione per {tournament['name']} chiusa con successo"
-        return False, "Torneo non trovato"
+        success, _ = get_store().close_registration(st.session_state.tournament["id"])
+        return success, "Registrazione chiusa con successo"
+    return get_store().close_registration(tournament_id)
 
+@timed("helper")
 def update_tournament_settings(tournament_id, name=None, start_date=None, end_date=None, registration_open=None):
     """Update tournament settings."""
-    # Cerca il torneo
-    tournament_index = None
-    for i, tournament in enumerate(st.session_state.tournaments):
-        if tournament["id"] == tournament_id:
-            tournament_index = i
-            break
-    
-    if tournament_index is None:
-        return False, "Torneo non trovato"
-    
-    # Aggiorna i campi specificati
-    if name:
-        st.session_state.tournaments[tournament_index]["name"] = name
-    if start_date:
-        st.session_state.tournaments[tournament_index]["start_date"] = start_date
-    if end_date:
-        st.session_state.tournaments[tournament_index]["end_date"] = end_date
-    if registration_open is not None:
-        st.session_state.tournaments[tournament_index]["registration_open"] = registration_open
-    
-    # Aggiorna anche il torneo corrente se è quello modificato
-    if st.session_state.tournament["id"] == tournament_id:
-        st.session_state.tournament = st.session_state.tournaments[tournament_index]
-    
-    return True, "Impostazioni aggiornate con successo"
+    return get_store().update_tournament_settings(tournament_id, name, start_date, end_date, registration_open)
 
+@timed("helper")
 def create_tournament(name, start_date, end_date, registration_open=True):
     """Create a new tournament."""
-    # Genera un nuovo ID
-    new_id = max(t["id"] for t in st.session_state.tournaments) + 1 if st.session_state.tournaments else 1
-    
-    # Crea il nuovo torneo
-    new_tournament = {
-        "id": new_id,
-        "name": name,
-        "registration_open": registration_open,
-        "start_date": start_date,
-        "end_date": end_date
-    }
-    
-    # Aggiungi il torneo
-    st.session_state.tournaments.append(new_tournament)
-    
-    return True, f"Torneo {name} creato con successo"
+    return get_store().create_tournament(name, start_date, end_date, registration_open)
 
+@timed("helper")
 def delete_tournament(tournament_id):
     """Delete a tournament."""
-    # Trova il torneo
-    tournament_index = None
-    for i, tournament in enumerate(st.session_state.tournaments):
-        if tournament["id"] == tournament_id:
-            tournament_index = i
-            break
-    
-    if tournament_index is None:
-        return False, "Torneo non trovato"
-    
-    # Rimuovi il torneo dalle iscrizioni degli atleti
-    for i, athlete in enumerate(st.session_state.athletes):
-        if "tournaments" in athlete and tournament_id in athlete["tournaments"]:
-            st.session_state.athletes[i]["tournaments"].remove(tournament_id)
-    
-    # Rimuovi tutte le sfide associate al torneo
-    # Nota: devi aggiungere il campo tournament_id alle sfide per supportare questa funzionalità
-    
-    # Rimuovi il torneo
-    st.session_state.tournaments.pop(tournament_index)
-    
+    success, message = get_store().delete_tournament(tournament_id)
+
     # Se era il torneo corrente, imposta un altro torneo come corrente
-    if st.session_state.tournament["id"] == tournament_id:
-        if st.session_state.tournaments:
-            st.session_state.tournament = st.session_state.tournaments[0]
-        else:
-            # Crea un torneo predefinito se non ce ne sono altri
-            default_tournament = {
-                "id": 1,
-                "name": "Torneo Chanbara 2025",
-                "registration_open": True,
-                "start_date": "2025-06-01",
-                "end_date": "2025-06-30"
-            }
-            st.session_state.tournaments.append(default_tournament)
-            st.session_state.tournament = default_tournament
-    
-    return True, "Torneo eliminato con successo"
+    if success and st.session_state.tournament["id"] == tournament_id:
+        st.session_state.tournament = get_store().list_tournaments()[0]
 
+    return success, message
+
+@timed("helper")
 def get_rankings():
     """Get rankings sorted by level."""
-    rankings = []
-    
-    for athlete in st.session_state.athletes:
-        # Count victories
-        victories = sum(1 for challenge in st.session_state.challenges 
-                        if challenge["winner_id"] == athlete["id"])
-        
-        # Count total challenges
-        total_challenges = sum(1 for challenge in st.session_state.challenges 
-                              if (challenge["challenger_id"] == athlete["id"] or 
-                                  challenge["opponent_id"] == athlete["id"]) and
-                                 challenge["winner_id"] is not None)
-        
-        rankings.append({
-            "id": athlete["id"],
-            "name": athlete["name"],
-            "level": athlete["level"],
-            "victories": victories,
-            "total_challenges": total_challenges,
-            "profile_img": athlete["profile_img"]
-        })
-    
-    # Sort by level (descending), then by victories (descending), then by name
-    rankings.sort(key=lambda x: (-x["level"], -x["victories"], x["name"]))
-    
-    return rankings
+    return get_store().get_rankings(st.session_state.tournament["id"])
+
+@timed("helper")
+def save_profile_image(uploaded_file):
+    """Store an uploaded image and queue its thumbnails."""
+    key = get_blob_store().put(uploaded_file.getvalue())
+    get_thumbnail_pipeline().submit(key)
+    return key
+
+@timed("helper")
+def resolve_profile_img(profile_img, size, name):
+    """Turn a stored profile image into something st.image can show."""
+    # Per le immagini caricate si mostra solo la miniatura, con un segnaposto
+    # finché non è pronta; senza foto si usa l'avatar locale con le iniziali
+    if is_blob_key(profile_img):
+        return get_thumbnail_pipeline().thumbnail(profile_img, size) or PLACEHOLDER_SVG
+    if not profile_img or profile_img.startswith(UI_AVATARS_URL):
+        return initials_avatar(name, size)
+    return profile_img
+
+@timed("helper")
+def collect_unused_images():
+    """Delete stored images and thumbnails no athlete uses anymore."""
+    referenced = get_store().profile_images()
+    removed = get_blob_store().collect_garbage(referenced)
+    get_thumbnail_pipeline().collect_garbage(referenced)
+    return removed
+
+@timed("helper")
+def get_top_athletes(n=3):
+    """Get the first athletes of the ranking."""
+    return get_store().get_top_athletes(st.session_state.tournament["id"], n)
+
+@timed("helper")
+def get_rating(athlete_id):
+    """Get an athlete's Elo rating."""
+    return get_store().get_rating(athlete_id)
+
+@timed("helper")
+def get_ranking_position(athlete_id):
+    """Get an athlete's position in the ranking."""
+    return get_store().get_ranking_position(st.session_state.tournament["id"], athlete_id)
 
+@timed("helper")
 def get_athlete_challenges(athlete_id):
     """Get upcoming and past challenges for an athlete."""
-    today = datetime.date.today()
-    upcoming_challenges = []
-    past_challenges = []
+    return get_store().get_athlete_challenges(athlete_id)
+
+@timed("helper")
+def get_upcoming_challenges(athlete_id):
+    """Get upcoming challenges for an athlete."""
+    return get_store().get_upcoming_challenges(athlete_id)
+
+@timed("helper")
+def count_past_challenges(athlete_id):
+    """Count past challenges for an athlete."""
+    return get_store().count_past_challenges(athlete_id)
+
+@timed("helper")
+def get_past_challenges(athlete_id, offset=0, limit=None):
+    """Get one page of past challenges for an athlete."""
+    return get_store().get_past_challenges(athlete_id, offset, limit)
+
+@timed("helper")
+def get_possible_opponents(athlete_id):
+    """Get possible opponents for an athlete."""
+    return get_store().get_possible_opponents(athlete_id, st.session_state.tournament["id"])
+
+@timed("helper")
+def count_opponents(athlete_id, query=""):
+    """Count possible opponents matching a name search."""
+    return get_store().count_opponents(athlete_id, st.session_state.tournament["id"], query)
+
+@timed("helper")
+def find_opponents(athlete_id, query="", offset=0, limit=None):
+    """Get one page of possible opponents matching a name search."""
+    return get_store().find_opponents(athlete_id, st.session_state.tournament["id"], query, offset, limit)
+
+@timed("helper")
+def get_admin_stats():
+    """Get statistics for admin dashboard."""
+    return get_store().get_admin_stats(st.session_state.tournament["id"])
+
+@timed("helper")
+def cached_view(name, kinds, tournament_id, builder, *params):
+    """Get a derived view of one tournament (or all, with None), rebuilt only after its data changed."""
+    # Costruita sotto il lock, mai a metà di una scrittura
+    with get_store().lock.read():
+        return get_views().get((name,) + params, kinds, tournament_id, lambda: builder(*params))
+
+@timed("helper")
+def build_rankings_df(tournament_id):
+    """Build the rankings table of a tournament."""
+    return pd.DataFrame([{
+        "Posizione": i+1,
+        "Nome": r["name"],
+        "Livello": r["level"],
+        "Rating": round(get_store().get_rating(r["id"])),
+        "Vittorie": r["victories"],
+        "Sfide Totali": r["total_challenges"]
+    } for i, r in enumerate(get_store().get_rankings(tournament_id))])
+
+@timed("helper")
+def build_athletes_view(tournament_id):
+    """Build the admin athletes table and selectbox options, for one tournament or all (None)."""
+    if tournament_id is None:
+        filtered_athletes = get_store().list_athletes()
+    else:
+        filtered_athletes = get_store().get_tournament_athletes(tournament_id)
     
-    for challenge in st.session_state.challenges:
-        if challenge["challenger_id"] == athlete_id or challenge["opponent_id"] == athlete_id:
-            challenge_date = datetime.date.fromisoformat(challenge["date"])
-            
-            # Get challenger and opponent
-            challenger = get_athlete_by_id(challenge["challenger_id"])
-            opponent = get_athlete_by_id(challenge["opponent_id"])
-            specialty = get_specialty_by_id(challenge["specialty_id"])
-            winner = get_athlete_by_id(challenge["winner_id"]) if challenge["winner_id"] else None
-            
-            # Create a challenge object with all needed info
-            challenge_obj = {
-                "id": challenge["id"],
-                "date": challenge["date"],
-                "challenger": challenger["name"] if challenger else "Sconosciuto",
-                "opponent": opponent["name"] if opponent else "Sconosciuto",
-                "specialty": specialty["name"] if specialty else "Sconosciuta",
-                "winner": winner["name"] if winner else None
-            }
-            
-            if challenge_date >= today:
-                upcoming_challenges.append(challenge_obj)
-            else:
-                past_challenges.append(challenge_obj)
+    athletes_data = []
     
-    # Sort by date
-    upcoming_challenges.sort(key=lambda x: x["date"])
-    past_challenges.sort(key=lambda x: x["date"], reverse=True)
+    for athlete in filtered_athletes:
+        # Get tournaments names
+        tournament_names = []
+        for t_id in athlete["tournaments"]:
+            t = get_tournament_by_id(t_id)
+            if t:
+                tournament_names.append(t["name"])
+        
+        athletes_data.append({
+            "ID": athlete["id"],
+            "Nome": athlete["name"],
+            "Soprannome": athlete.get("nickname", ""),
+            "Email": athlete["email"],
+            "Livello": athlete["level"],
+            "Tornei": ", ".join(tournament_names)
+        })
     
-    return upcoming_challenges, past_challenges
+    athlete_options = [f"{a['id']} - {a['name']}" for a in filtered_athletes]
+    return pd.DataFrame(athletes_data), athlete_options
 
-def get_possible_opponents(athlete_id):
-    """Get possible opponents for an athlete."""
-    athlete = get_athlete_by_id(athlete_id)
-    if not athlete:
-        return []
+@timed("helper")
+def build_challenges_view(filter_option, tournament_id):
+    """Build a tournament's challenges table and the options of its pending challenges."""
+    challenges = get_store().get_tournament_challenges(tournament_id)
+    
+    # Apply filter
+    if filter_option == "In attesa":
+        filtered_challenges = [c for c in challenges if c["winner_id"] is None]
+    elif filter_option == "Completate":
+        filtered_challenges = [c for c in challenges if c["winner_id"] is not None]
+    else:
+        filtered_challenges = challenges
     
-    # Get athletes with equal or higher level
-    opponents = [a for a in st.session_state.athletes 
-                if a["id"] != athlete_id and a["level"] >= athlete["level"]]
+    challenges_data = []
+    challenge_options = []
     
-    # Sort by level and name
-    opponents.sort(key=lambda x: (x["level"], x["name"]))
+    for challenge in filtered_challenges:
+        challenger = get_athlete_by_id(challenge["challenger_id"])
+        opponent = get_athlete_by_id(challenge["opponent_id"])
+        specialty = get_specialty_by_id(challenge["specialty_id"])
+        winner = get_athlete_by_id(challenge["winner_id"]) if challenge["winner_id"] else None
+        
+        if challenger and opponent and specialty:
+            challenges_data.append({
+                "ID": challenge["id"],
+                "Data": challenge["date"],
+                "Sfidante": challenger["name"],
+                "Sfidato": opponent["name"],
+                "Specialità": specialty["name"],
+                "Vincitore": winner["name"] if winner else "Non registrato"
+            })
+        
+        if challenge["winner_id"] is None and challenger and opponent:
+            challenge_options.append((
+                challenge["id"], 
+                f"{challenger['name']} vs {opponent['name']} ({challenge['date']})"
+            ))
     
-    return opponents
+    return len(filtered_challenges), pd.DataFrame(challenges_data), challenge_options
 
-def get_admin_stats():
-    """Get statistics for admin dashboard."""
-    today = datetime.date.today().isoformat()
-    
-    total_athletes = len(st.session_state.athletes)
-    total_challenges = len(st.session_state.challenges)
-    completed_challenges = sum(1 for c in st.session_state.challenges if c["winner_id"] is not None)
-    future_challenges = sum(1 for c in st.session_state.challenges if c["date"] > today)
-    today_challenges = sum(1 for c in st.session_state.challenges if c["date"] == today)
-    
-    return {
-        "total_athletes": total_athletes,
-        "total_challenges": total_challenges,
-        "completed_challenges": completed_challenges,
-        "future_challenges": future_challenges,
-        "today_challenges": today_challenges,
-        "registration_open": st.session_state.tournament["registration_open"]
-    }
+@timed("helper")
+def build_tournaments_df():
+    """Build the admin tournaments table."""
+    return pd.DataFrame([{
+        "ID": t["id"],
+        "Nome": t["name"],
+        "Data Inizio": t["start_date"],
+        "Data Fine": t["end_date"],
+        "Iscrizioni": "Aperte" if t["registration_open"] else "Chiuse",
+        "Atleti Iscritti": get_store().count_enrolled(t["id"])
+    } for t in get_store().list_tournaments()])
+
+@timed("helper")
+def build_bracket_round_df(tournament_id, round_index):
+    """Build the table of one round of a tournament's bracket."""
+    bracket = get_store().get_bracket(tournament_id)
+    
+    def entrant(athlete_id):
+        if athlete_id == BYE:
+            return "Bye"
+        if athlete_id == PENDING:
+            return "In attesa"
+        athlete = get_athlete_by_id(athlete_id)
+        return athlete["name"] if athlete else "Atleta eliminato"
+    
+    rows = []
+    for match, top, bottom, winner in bracket.round_matches(round_index):
+        challenge = get_store().get_challenge_by_id(bracket.challenge_of.get(match))
+        rows.append({
+            "Incontro": match + 1,
+            "Atleta 1": entrant(top),
+            "Atleta 2": entrant(bottom),
+            "Data": challenge["date"] if challenge else "",
+            "Vincitore": entrant(winner) if winner > 0 else ""
+        })
+    return pd.DataFrame(rows)
 
 # Page functions
+@timed("page")
 def login():
     """Render the login page."""
     st.title("Accedi al Torneo Chanbara")
@@ -613,7 +657,7 @@ def login():
         if st.button("Accedi come Atleta"):
             if authenticate(email, password):
                 st.success("Login effettuato con successo!")
-                st.rerun()
+                rerun()
             else:
                 st.error("Credenziali non valide")
     
@@ -625,7 +669,7 @@ def login():
         if st.button("Accedi come Admin"):
             if authenticate(admin_email, admin_password, is_admin=True):
                 st.success("Login admin effettuato con successo!")
-                st.rerun()
+                rerun()
             else:
                 st.error("Credenziali admin non valide")
         
@@ -659,32 +703,29 @@ def login():
                     if success:
                         # Se è stata caricata un'immagine, aggiorna la foto profilo
                         if uploaded_file is not None:
-                            # Converti l'immagine in base64 per salvarla
-                            import base64
-                            bytes_data = uploaded_file.getvalue()
-                            encoded_img = base64.b64encode(bytes_data).decode()
-                            image_src = f"data:image/{uploaded_file.type.split('/')[-1]};base64,{encoded_img}"
+                            # Salva l'immagine nello store su disco, il profilo tiene solo la chiave
+                            image_src = save_profile_image(uploaded_file)
                             
                             # Aggiorna l'immagine profilo dell'atleta appena registrato
-                            for athlete in st.session_state.athletes:
-                                if athlete["email"] == reg_email:
-                                    athlete["profile_img"] = image_src
-                                    break
+                            new_athlete = get_athlete_by_email(reg_email)
+                            if new_athlete:
+                                modify_athlete(new_athlete["id"], {"profile_img": image_src})
                         
                         st.success(message)
                         # Auto login after registration
                         authenticate(reg_email, reg_password)
-                        st.rerun()
+                        rerun()
                     else:
                         st.error(message)
         else:
             st.error("Le registrazioni sono chiuse")
 
+@timed("page")
 def profile_page():
     """Render the athlete profile page."""
     if not st.session_state.user:
         st.session_state.page = "login"
-        st.rerun()
+        rerun()
         return
     
     athlete = st.session_state.user
@@ -700,7 +741,7 @@ def profile_page():
         st.markdown('<div class="profile-card">', unsafe_allow_html=True)
         
         # Profile image
-        st.image(athlete["profile_img"], width=150)
+        st.image(resolve_profile_img(athlete["profile_img"], 150, athlete.get("nickname") or athlete["name"]), width=150)
         
         # Mostro il soprannome in evidenza e il nome completo sotto in piccolo
         st.markdown(f'<div class="nickname">{athlete.get("nickname", athlete["name"].split()[0])}</div>', unsafe_allow_html=True)
@@ -708,6 +749,8 @@ def profile_page():
         
         # Informazioni atleta con stile migliorato
         st.markdown(f'<div class="dark-mode-text"><strong>Livello:</strong> {athlete["level"]}</div>', unsafe_allow_html=True)
+        st.markdown(f'<div class="dark-mode-text"><strong>Rating:</strong> {round(get_rating(athlete["id"]))}</div>', unsafe_allow_html=True)
+        st.markdown(f'<div class="dark-mode-text"><strong>Posizione:</strong> {get_ranking_position(athlete["id"]) or "-"}</div>', unsafe_allow_html=True)
         st.markdown(f'<div class="dark-mode-text"><strong>Email:</strong> {athlete["email"]}</div>', unsafe_allow_html=True)
         
         # Chiusura del contenitore
@@ -716,7 +759,7 @@ def profile_page():
         # Aggiungi bottone per modificare foto profilo
         if st.button("Modifica Profilo"):
             st.session_state.page = "edit_profile"
-            st.rerun()
+            rerun()
     
     with col2:
         # Navigation buttons in styled container
@@ -727,24 +770,24 @@ def profile_page():
         with col_a:
             if st.button("⚔️ Sfida", key="sfida_btn"):
                 st.session_state.page = "challenge"
-                st.rerun()
+                rerun()
         
         with col_b:
             if st.button("📊 Ranking", key="ranking_btn"):
                 st.session_state.page = "ranking" 
-                st.rerun()
+                rerun()
         
         with col_c:
             if st.button("📜 Storico", key="storico_btn"):
                 st.session_state.page = "history"
-                st.rerun()
+                rerun()
         
         st.markdown('</div>', unsafe_allow_html=True)
     
     # Display upcoming challenges in a styled container
     st.markdown('<div class="profile-card">', unsafe_allow_html=True)
     st.markdown('<h3 class="dark-mode-text">Le tue prossime sfide</h3>', unsafe_allow_html=True)
-    upcoming_challenges, _ = get_athlete_challenges(athlete["id"])
+    upcoming_challenges = get_upcoming_challenges(athlete["id"])
     
     if upcoming_challenges:
         for challenge in upcoming_challenges:
@@ -761,11 +804,12 @@ def profile_page():
     
     st.markdown('</div>', unsafe_allow_html=True)
 
+@timed("page")
 def edit_profile_page():
     """Render the profile edit page."""
     if not st.session_state.user:
         st.session_state.page = "login"
-        st.rerun()
+        rerun()
         return
     
     athlete = st.session_state.user
@@ -775,7 +819,7 @@ def edit_profile_page():
     # Back button
     if st.button("← Torna al Profilo"):
         st.session_state.page = "profile"
-        st.rerun()
+        rerun()
     
     # Form per modificare il soprannome
     st.subheader("Modifica Soprannome")
@@ -786,47 +830,36 @@ def edit_profile_page():
     uploaded_file = st.file_uploader("Scegli un'immagine", type=["jpg", "jpeg", "png"])
     
     if uploaded_file is not None:
-        # Preview dell'immagine caricata
-        st.image(uploaded_file, width=150, caption="Anteprima")
+        # Il file resta selezionato tra un rerun e l'altro: si salva una volta
+        # per caricamento e poi si riusa la chiave
+        if st.session_state.get("uploaded_image", (None,))[0] != uploaded_file.file_id:
+            st.session_state.uploaded_image = (uploaded_file.file_id, save_profile_image(uploaded_file))
+        preview_key = st.session_state.uploaded_image[1]
+        # Preview dell'immagine caricata (miniatura, pronta dopo qualche istante)
+        st.image(resolve_profile_img(preview_key, 150, athlete["name"]), width=150, caption="Anteprima")
     
     # Salva modifiche
     if st.button("Salva Modifiche"):
         # Aggiorna il soprannome
         if new_nickname:
-            # Aggiorna in session_state.user
-            st.session_state.user["nickname"] = new_nickname
-            
-            # Aggiorna anche in athletes
-            for i, a in enumerate(st.session_state.athletes):
-                if a["id"] == athlete["id"]:
-                    st.session_state.athletes[i]["nickname"] = new_nickname
-                    break
+            modify_athlete(athlete["id"], {"nickname": new_nickname})
         
         # Aggiorna la foto profilo
         if uploaded_file is not None:
-            import base64
-            bytes_data = uploaded_file.getvalue()
-            encoded_img = base64.b64encode(bytes_data).decode()
-            image_src = f"data:image/{uploaded_file.type.split('/')[-1]};base64,{encoded_img}"
+            image_src = preview_key
             
-            # Aggiorna in session_state.user
-            st.session_state.user["profile_img"] = image_src
-            
-            # Aggiorna anche in athletes
-            for i, a in enumerate(st.session_state.athletes):
-                if a["id"] == athlete["id"]:
-                    st.session_state.athletes[i]["profile_img"] = image_src
-                    break
+            modify_athlete(athlete["id"], {"profile_img": image_src})
         
         st.success("Profilo aggiornato con successo!")
         st.session_state.page = "profile"
-        st.rerun()
+        rerun()
 
+@timed("page")
 def challenge_page():
     """Render the challenge creation page."""
     if not st.session_state.user:
         st.session_state.page = "login"
-        st.rerun()
+        rerun()
         return
     
     athlete = st.session_state.user
@@ -836,29 +869,46 @@ def challenge_page():
     # Back button
     if st.button("← Torna al Profilo"):
         st.session_state.page = "profile"
-        st.experimental_rerun()
+        rerun()
     
     # Challenge form
     st.subheader("Crea una nuova sfida")
     
     if not st.session_state.tournament["registration_open"]:
-        opponents = get_possible_opponents(athlete["id"])
+        # Ricerca e paginazione: si carica solo la pagina di avversari visibile
+        opponent_query = st.text_input("Cerca avversario", key="opponent_search")
+        total_opponents = count_opponents(athlete["id"], opponent_query)
+        page_count = max(1, -(-total_opponents // OPPONENTS_PAGE_SIZE))
+        
+        opponent_page_number = 1
+        if page_count > 1:
+            opponent_page_number = st.number_input(
+                "Pagina avversari",
+                min_value=1,
+                max_value=page_count,
+                value=1,
+                key=f"opponent_page_number_{opponent_query}"
+            )
+            st.caption(f"{total_opponents} avversari, pagina {opponent_page_number} di {page_count}")
+        
+        opponents = find_opponents(
+            athlete["id"],
+            opponent_query,
+            (opponent_page_number - 1) * OPPONENTS_PAGE_SIZE,
+            OPPONENTS_PAGE_SIZE
+        )
         
         if opponents:
             # Create a selectbox with opponents
-            opponent_options = [(o["id"], f"{o['name']} (Liv. {o['level']})") for o in opponents]
-            opponent_ids = [id for id, _ in opponent_options]
-            opponent_names = [name for _, name in opponent_options]
-            
             selected_opponent_index = st.selectbox(
                 "Sfida un atleta",
-                options=range(len(opponent_names)),
-                format_func=lambda i: opponent_names[i]
+                options=range(len(opponents)),
+                format_func=lambda i: f"{opponents[i]['name']} (Liv. {opponents[i]['level']})"
             )
-            selected_opponent_id = opponent_ids[selected_opponent_index]
+            selected_opponent_id = opponents[selected_opponent_index]["id"]
             
             # Create a selectbox with specialties
-            specialty_options = [(s["id"], s["name"]) for s in st.session_state.specialties]
+            specialty_options = [(s["id"], s["name"]) for s in get_store().list_specialties()]
             specialty_ids = [id for id, _ in specialty_options]
             specialty_names = [name for _, name in specialty_options]
             
@@ -888,9 +938,11 @@ def challenge_page():
                 if success:
                     st.success(message)
                     st.session_state.page = "profile"
-                    st.rerun()
+                    rerun()
                 else:
                     st.error(message)
+        elif opponent_query:
+            st.info("Nessun avversario corrisponde alla ricerca")
         else:
             st.info("Non ci sono avversari disponibili di livello pari o superiore")
     else:
@@ -899,31 +951,25 @@ def challenge_page():
         # Admin info for demo purposes
         st.info("Per continuare con la demo, accedi come admin (admin@example.com / admin123) e chiudi le registrazioni dal pannello di amministrazione.")
 
+@timed("page")
 def ranking_page():
     """Render the rankings page."""
     if not st.session_state.user:
         st.session_state.page = "login"
-        st.rerun()
+        rerun()
         return
     
     st.title("Classifica del Torneo")
+    st.caption(st.session_state.tournament["name"])
     
     # Back button
     if st.button("← Torna al Profilo"):
         st.session_state.page = "profile"
-        st.experimental_rerun()
+        rerun()
     
     # Display rankings
-    rankings = get_rankings()
-    
-    # Create a DataFrame for the rankings
-    rankings_df = pd.DataFrame([{
-        "Posizione": i+1,
-        "Nome": r["name"],
-        "Livello": r["level"],
-        "Vittorie": r["victories"],
-        "Sfide Totali": r["total_challenges"]
-    } for i, r in enumerate(rankings)])
+    rankings_df = cached_view("rankings", ("athletes", "challenges"), st.session_state.tournament["id"],
+                              build_rankings_df, st.session_state.tournament["id"])
     
     st.dataframe(rankings_df, use_container_width=True, hide_index=True)
     
@@ -931,19 +977,22 @@ def ranking_page():
     st.subheader("Top 3 Atleti")
     
     top_cols = st.columns(3)
-    for i, athlete in enumerate(rankings[:3]):
+    for i, athlete in enumerate(get_top_athletes(3)):
         if i < 3:  # Ensure we have at least 3 athletes
             with top_cols[i]:
-                st.image(athlete["profile_img"], width=100)
+                ranked_athlete = get_athlete_by_id(athlete["id"])
+                st.image(resolve_profile_img(athlete["profile_img"], 100, ranked_athlete.get("nickname") or athlete["name"]), width=100)
                 st.subheader(f"{i+1}. {athlete['name']}")
                 st.write(f"**Livello:** {athlete['level']}")
+                st.write(f"**Rating:** {round(get_rating(athlete['id']))}")
                 st.write(f"**Vittorie:** {athlete['victories']}")
 
+@timed("page")
 def history_page():
     """Render the challenge history page."""
     if not st.session_state.user:
         st.session_state.page = "login"
-        st.experimental_rerun()
+        rerun()
         return
     
     athlete = st.session_state.user
@@ -953,10 +1002,18 @@ def history_page():
     # Back button
     if st.button("← Torna al Profilo"):
         st.session_state.page = "profile"
-        st.experimental_rerun()
+        rerun()
+    
+    # Get one page of past challenges for this athlete
+    total_past = count_past_challenges(athlete["id"])
+    page_count = max(1, -(-total_past // HISTORY_PAGE_SIZE))
     
-    # Get all challenges for this athlete
-    _, past_challenges = get_athlete_challenges(athlete["id"])
+    history_page_number = 1
+    if page_count > 1:
+        history_page_number = st.number_input("Pagina", min_value=1, max_value=page_count, value=1, key="history_page_number")
+        st.caption(f"{total_past} sfide passate, pagina {history_page_number} di {page_count}")
+    
+    past_challenges = get_past_challenges(athlete["id"], (history_page_number - 1) * HISTORY_PAGE_SIZE, HISTORY_PAGE_SIZE)
     
     if past_challenges:
         for challenge in past_challenges:
@@ -971,24 +1028,30 @@ def history_page():
     else:
         st.info("Non hai sfide passate")
 
+@timed("page")
 def admin_page():
     """Render the admin dashboard."""
     if not st.session_state.user or not st.session_state.user.get("is_admin", False):
         st.session_state.page = "login"
-        st.rerun()
+        rerun()
         return
     
     st.title("Dashboard Amministrazione")
     
-    # Admin tabs
-    tab1, tab2, tab3, tab4, tab5 = st.tabs(["Dashboard", "Atleti", "Sfide", "Tornei", "Impostazioni"])
+    # Admin tabs (la scheda delle metriche compare solo con ?debug=1)
+    tab_names = ["Dashboard", "Atleti", "Sfide", "Tornei", "Impostazioni"]
+    show_metrics = st.query_params.get("debug") == "1"
+    if show_metrics:
+        tab_names.append("Metriche")
+    tabs = st.tabs(tab_names)
+    tab1, tab2, tab3, tab4, tab5 = tabs[:5]
     
     with tab1:
         st.markdown('<div class="profile-card">', unsafe_allow_html=True)
         st.header("Panoramica Torneo")
         
         # Selezione torneo corrente
-        tournament_options = [(t["id"], t["name"]) for t in st.session_state.tournaments]
+        tournament_options = [(t["id"], t["name"]) for t in get_store().list_tournaments()]
         tournament_ids, tournament_names = zip(*tournament_options)
         
         current_tournament_index = tournament_ids.index(st.session_state.tournament["id"]) if st.session_state.tournament["id"] in tournament_ids else 0
@@ -1003,10 +1066,8 @@ def admin_page():
         
         # Se il torneo selezionato è diverso dal corrente, cambia il torneo corrente
         if selected_tournament_id != st.session_state.tournament["id"]:
-            for t in st.session_state.tournaments:
-                if t["id"] == selected_tournament_id:
-                    st.session_state.tournament = t
-                    st.rerun()
+            st.session_state.tournament = get_tournament_by_id(selected_tournament_id)
+            rerun()
         
         # Stats
         stats = get_admin_stats()
@@ -1022,6 +1083,14 @@ def admin_page():
         with col3:
             st.metric("Sfide Completate", stats["completed_challenges"])
         
+        col4, col5, _ = st.columns(3)
+        
+        with col4:
+            st.metric("Sfide Future", stats["future_challenges"])
+        
+        with col5:
+            st.metric("Sfide Oggi", stats["today_challenges"])
+        
         # Registration status
         st.subheader("Stato Registrazioni")
         if stats["registration_open"]:
@@ -1030,7 +1099,7 @@ def admin_page():
                 success, message = close_registration(st.session_state.tournament["id"])
                 if success:
                     st.success(message)
-                    st.rerun()
+                    rerun()
                 else:
                     st.error(message)
         else:
@@ -1041,7 +1110,7 @@ def admin_page():
                     registration_open=True
                 )
                 st.success(f"Registrazioni per {st.session_state.tournament['name']} riaperte")
-                st.rerun()
+                rerun()
                 
         st.markdown('</div>', unsafe_allow_html=True)
     
@@ -1052,48 +1121,17 @@ def admin_page():
         # Filter for tournament
         tournament_filter = st.selectbox(
             "Filtra per Torneo", 
-            options=["Tutti"] + [t["name"] for t in st.session_state.tournaments],
+            options=[None] + [t["id"] for t in get_store().list_tournaments()],
+            format_func=lambda t_id: "Tutti" if t_id is None else get_tournament_by_id(t_id)["name"],
             key="athlete_tournament_filter"
         )
         
-        filtered_athletes = st.session_state.athletes
-        
-        if tournament_filter != "Tutti":
-            # Trova l'ID del torneo
-            tournament_id = None
-            for t in st.session_state.tournaments:
-                if t["name"] == tournament_filter:
-                    tournament_id = t["id"]
-                    break
-            
-            if tournament_id:
-                filtered_athletes = [a for a in st.session_state.athletes 
-                                    if "tournaments" in a and tournament_id in a["tournaments"]]
+        athletes_df, athlete_options = cached_view(
+            "athletes", ("athletes", "tournaments"), tournament_filter, build_athletes_view, tournament_filter
+        )
         
         # Display athletes with more details
-        if filtered_athletes:
-            athletes_data = []
-            
-            for athlete in filtered_athletes:
-                # Get tournaments names
-                tournament_names = []
-                if "tournaments" in athlete:
-                    for t_id in athlete["tournaments"]:
-                        for t in st.session_state.tournaments:
-                            if t["id"] == t_id:
-                                tournament_names.append(t["name"])
-                                break
-                
-                athletes_data.append({
-                    "ID": athlete["id"],
-                    "Nome": athlete["name"],
-                    "Soprannome": athlete.get("nickname", ""),
-                    "Email": athlete["email"],
-                    "Livello": athlete["level"],
-                    "Tornei": ", ".join(tournament_names)
-                })
-            
-            athletes_df = pd.DataFrame(athletes_data)
+        if athlete_options:
             st.dataframe(athletes_df, use_container_width=True, hide_index=True)
             
             # Sezione per eliminare un atleta
@@ -1101,7 +1139,7 @@ def admin_page():
             
             athlete_to_delete = st.selectbox(
                 "Seleziona atleta da eliminare",
-                options=[f"{a['id']} - {a['name']}" for a in filtered_athletes],
+                options=athlete_options,
                 key="delete_athlete_select"
             )
             
@@ -1110,16 +1148,28 @@ def admin_page():
                 success, message = delete_athlete(athlete_id)
                 if success:
                     st.success(message)
-                    st.rerun()
+                    rerun()
                 else:
                     st.error(message)
             
+            # Eliminazione in blocco, es. per la pulizia di fine stagione
+            athletes_to_delete = st.multiselect(
+                "Seleziona più atleti da eliminare",
+                options=athlete_options,
+                key="delete_athletes_select"
+            )
+            
+            if st.button("Elimina selezionati", key="delete_athletes_btn", disabled=not athletes_to_delete):
+                removed = delete_athletes([int(option.split(" - ")[0]) for option in athletes_to_delete])
+                st.success(f"Atleti eliminati: {removed}")
+                rerun()
+            
             # Sezione per modificare un atleta
             st.subheader("Modifica Atleta")
             
             athlete_to_edit = st.selectbox(
                 "Seleziona atleta da modificare",
-                options=[f"{a['id']} - {a['name']}" for a in filtered_athletes],
+                options=athlete_options,
                 key="edit_athlete_select"
             )
             
@@ -1127,6 +1177,8 @@ def admin_page():
             athlete = get_athlete_by_id(athlete_id)
             
             if athlete:
+                athlete_version = seen_version(("athlete", athlete_id), athlete)
+                
                 col1, col2 = st.columns(2)
                 
                 with col1:
@@ -1141,8 +1193,8 @@ def admin_page():
                 st.subheader("Iscrizione ai Tornei")
                 tournament_enrollments = []
                 
-                for tournament in st.session_state.tournaments:
-                    is_enrolled = tournament["id"] in athlete.get("tournaments", [])
+                for tournament in get_store().list_tournaments():
+                    is_enrolled = get_store().is_enrolled(athlete_id, tournament["id"])
                     enrollment = st.checkbox(
                         f"{tournament['name']}", 
                         value=is_enrolled,
@@ -1167,10 +1219,10 @@ def admin_page():
                     
                     updated_data["tournaments"] = updated_enrollments
                     
-                    success, message = modify_athlete(athlete_id, updated_data)
+                    success, message = modify_athlete(athlete_id, updated_data, athlete_version)
                     if success:
                         st.success(message)
-                        st.rerun()
+                        rerun()
                     else:
                         st.error(message)
         else:
@@ -1188,113 +1240,118 @@ def admin_page():
             options=["Tutte", "In attesa", "Completate"]
         )
         
-        # Apply filter
-        if filter_option == "In attesa":
-            filtered_challenges = [c for c in st.session_state.challenges if c["winner_id"] is None]
-        elif filter_option == "Completate":
-            filtered_challenges = [c for c in st.session_state.challenges if c["winner_id"] is not None]
-        else:
-            filtered_challenges = st.session_state.challenges.copy()
+        challenge_count, challenges_df, challenge_options = cached_view(
+            "challenges", ("challenges", "athletes", "specialties"), st.session_state.tournament["id"],
+            build_challenges_view, filter_option, st.session_state.tournament["id"]
+        )
         
         # Create a DataFrame for challenges
-        if filtered_challenges:
-            challenges_data = []
-            
-            for challenge in filtered_challenges:
-                challenger = get_athlete_by_id(challenge["challenger_id"])
-                opponent = get_athlete_by_id(challenge["opponent_id"])
-                specialty = get_specialty_by_id(challenge["specialty_id"])
-                winner = get_athlete_by_id(challenge["winner_id"]) if challenge["winner_id"] else None
-                
-                if challenger and opponent and specialty:
-                    challenges_data.append({
-                        "ID": challenge["id"],
-                        "Data": challenge["date"],
-                        "Sfidante": challenger["name"],
-                        "Sfidato": opponent["name"],
-                        "Specialità": specialty["name"],
-                        "Vincitore": winner["name"] if winner else "Non registrato"
-                    })
-            
-            challenges_df = pd.DataFrame(challenges_data)
+        if challenge_count:
             st.dataframe(challenges_df, use_container_width=True, hide_index=True)
             
             # Register result for a challenge
             st.subheader("Registra Risultato")
             
-            pending_challenges = [c for c in filtered_challenges if c["winner_id"] is None]
-            if pending_challenges:
-                challenge_options = []
+            if challenge_options:
+                challenge_ids, challenge_names = zip(*challenge_options)
                 
-                for c in pending_challenges:
-                    challenger = get_athlete_by_id(c["challenger_id"])
-                    opponent = get_athlete_by_id(c["opponent_id"])
-                    
-                    if challenger and opponent:
-                        challenge_options.append((
-                            c["id"], 
-                            f"{challenger['name']} vs {opponent['name']} ({c['date']})"
-                        ))
+                selected_challenge_index = st.selectbox(
+                    "Seleziona sfida",
+                    options=range(len(challenge_names)),
+                    format_func=lambda i: challenge_names[i]
+                )
+                selected_challenge_id = challenge_ids[selected_challenge_index]
+                selected_challenge = get_store().get_challenge_by_id(selected_challenge_id)
+                challenge_version = seen_version(("challenge", selected_challenge_id), selected_challenge)
                 
-                if challenge_options:
-                    challenge_ids, challenge_names = zip(*challenge_options)
+                challenger = get_athlete_by_id(selected_challenge["challenger_id"])
+                opponent = get_athlete_by_id(selected_challenge["opponent_id"])
+                
+                if challenger and opponent:
+                    winner_options = [(challenger["id"], challenger["name"]), (opponent["id"], opponent["name"])]
+                    winner_ids, winner_names = zip(*winner_options)
                     
-                    selected_challenge_index = st.selectbox(
-                        "Seleziona sfida",
-                        options=range(len(challenge_names)),
-                        format_func=lambda i: challenge_names[i]
+                    selected_winner_index = st.radio(
+                        "Seleziona il vincitore",
+                        options=range(len(winner_names)),
+                        format_func=lambda i: winner_names[i]
                     )
-                    selected_challenge_id = challenge_ids[selected_challenge_index]
-                    selected_challenge = next(c for c in pending_challenges if c["id"] == selected_challenge_id)
-                    
-                    challenger = get_athlete_by_id(selected_challenge["challenger_id"])
-                    opponent = get_athlete_by_id(selected_challenge["opponent_id"])
+                    selected_winner_id = winner_ids[selected_winner_index]
                     
-                    if challenger and opponent:
-                        winner_options = [(challenger["id"], challenger["name"]), (opponent["id"], opponent["name"])]
-                        winner_ids, winner_names = zip(*winner_options)
-                        
-                        selected_winner_index = st.radio(
-                            "Seleziona il vincitore",
-                            options=range(len(winner_names)),
-                            format_func=lambda i: winner_names[i]
-                        )
-                        selected_winner_id = winner_ids[selected_winner_index]
-                        
-                        if st.button("Registra Risultato"):
-                            success, message = record_challenge_result(selected_challenge_id, selected_winner_id)
-                            if success:
-                                st.success(message)
-                                st.rerun()
-                            else:
-                                st.error(message)
+                    if st.button("Registra Risultato"):
+                        success, message = record_challenge_result(selected_challenge_id, selected_winner_id,
+                                                                   challenge_version)
+                        if success:
+                            st.success(message)
+                            rerun()
+                        else:
+                            st.error(message)
             else:
                 st.info("Nessuna sfida in attesa di risultato")
         else:
             st.info("Nessuna sfida trovata con i filtri selezionati")
+        
+        # Calendario automatico a gironi o girone unico
+        st.subheader("Genera Calendario")
+        st.caption(f"Incontri tra gli iscritti a {st.session_state.tournament['name']} "
+                   f"dal {st.session_state.tournament['start_date']} al {st.session_state.tournament['end_date']}")
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            calendar_format = st.radio("Formato", options=["Girone unico", "Gironi"], key="calendar_format")
+            pool_size = None
+            if calendar_format == "Gironi":
+                pool_size = st.number_input("Atleti per girone", min_value=2, value=8, step=1, key="calendar_pool_size")
+            specialty_ids = [s["id"] for s in get_store().list_specialties()]
+            calendar_specialty = st.selectbox(
+                "Specialità",
+                options=specialty_ids,
+                format_func=lambda i: get_specialty_by_id(i)["name"],
+                key="calendar_specialty"
+            )
+        
+        with col2:
+            courts = st.number_input("Campi disponibili", min_value=1, value=4, step=1, key="calendar_courts")
+            matches_per_court = st.number_input("Incontri per campo al giorno", min_value=1, value=8, step=1,
+                                                key="calendar_matches_per_court")
+            max_per_day = st.number_input("Incontri per atleta al giorno", min_value=1, value=1, step=1,
+                                          key="calendar_max_per_day")
+        
+        if st.button("Genera Calendario", key="generate_calendar_btn"):
+            success, message = generate_calendar(calendar_specialty, int(courts), int(matches_per_court),
+                                                 int(max_per_day), int(pool_size) if pool_size else None)
+            if success:
+                st.success(message)
+                rerun()
+            else:
+                st.error(message)
+        
+        # Sistema svizzero: un turno alla volta, dopo i risultati del precedente
+        st.subheader("Turno Svizzero")
+        st.caption(f"Turni generati: {get_store().count_swiss_rounds(st.session_state.tournament['id'])}")
+        
+        swiss_specialty = st.selectbox(
+            "Specialità",
+            options=[s["id"] for s in get_store().list_specialties()],
+            format_func=lambda i: get_specialty_by_id(i)["name"],
+            key="swiss_specialty"
+        )
+        
+        if st.button("Genera Turno", key="generate_swiss_round_btn"):
+            success, message = generate_swiss_round(swiss_specialty)
+            if success:
+                st.success(message)
+                rerun()
+            else:
+                st.error(message)
     
     with tab4:
         st.markdown('<div class="profile-card">', unsafe_allow_html=True)
         st.header("Gestione Tornei")
         
         # Display existing tournaments
-        tournaments_data = []
-        
-        for t in st.session_state.tournaments:
-            # Conta atleti iscritti
-            enrolled_athletes = sum(1 for a in st.session_state.athletes 
-                                  if "tournaments" in a and t["id"] in a["tournaments"])
-            
-            tournaments_data.append({
-                "ID": t["id"],
-                "Nome": t["name"],
-                "Data Inizio": t["start_date"],
-                "Data Fine": t["end_date"],
-                "Iscrizioni": "Aperte" if t["registration_open"] else "Chiuse",
-                "Atleti Iscritti": enrolled_athletes
-            })
-        
-        tournaments_df = pd.DataFrame(tournaments_data)
+        tournaments_df = cached_view("tournaments", ("tournaments", "athletes"), None, build_tournaments_df)
         st.dataframe(tournaments_df, use_container_width=True, hide_index=True)
         
         # Create new tournament
@@ -1327,7 +1384,7 @@ def admin_page():
                 
                 if success:
                     st.success(message)
-                    st.rerun()
+                    rerun()
                 else:
                     st.error(message)
         
@@ -1336,17 +1393,12 @@ def admin_page():
         
         edit_tournament = st.selectbox(
             "Seleziona torneo da modificare",
-            options=[f"{t['id']} - {t['name']}" for t in st.session_state.tournaments],
+            options=[f"{t['id']} - {t['name']}" for t in get_store().list_tournaments()],
             key="edit_tournament_select"
         )
         
         tournament_id = int(edit_tournament.split(" - ")[0])
-        tournament = None
-        
-        for t in st.session_state.tournaments:
-            if t["id"] == tournament_id:
-                tournament = t
-                break
+        tournament = get_tournament_by_id(tournament_id)
         
         if tournament:
             edit_tournament_name = st.text_input("Nome Torneo", value=tournament["name"], key="edit_tournament_name")
@@ -1377,16 +1429,62 @@ def admin_page():
                     
                     if success:
                         st.success(message)
-                        st.rerun()
+                        rerun()
                     else:
                         st.error(message)
         
+        # Bracket of the current tournament
+        st.subheader("Tabellone a Eliminazione")
+        
+        bracket = get_store().get_bracket(st.session_state.tournament["id"])
+        if bracket is None:
+            st.caption(f"Le teste di serie di {st.session_state.tournament['name']} seguono la classifica attuale")
+            bracket_double = st.radio("Formato", options=["Eliminazione diretta", "Doppia eliminazione"],
+                                      key="bracket_format") == "Doppia eliminazione"
+            bracket_specialty = st.selectbox(
+                "Specialità",
+                options=[s["id"] for s in get_store().list_specialties()],
+                format_func=lambda i: get_specialty_by_id(i)["name"],
+                key="bracket_specialty"
+            )
+            
+            if st.button("Crea Tabellone", key="create_bracket_btn"):
+                success, message = create_bracket(bracket_specialty, bracket_double)
+                if success:
+                    st.success(message)
+                    rerun()
+                else:
+                    st.error(message)
+        else:
+            champion = get_athlete_by_id(bracket.champion()) if bracket.champion() else None
+            if champion:
+                st.success(f"Vincitore del tabellone: {champion['name']}")
+            
+            round_index = st.selectbox(
+                "Turno",
+                options=range(len(bracket.rounds)),
+                format_func=lambda i: bracket.rounds[i][0],
+                key="bracket_round"
+            )
+            bracket_df = cached_view("bracket", ("tournaments", "challenges", "athletes"),
+                                     st.session_state.tournament["id"], build_bracket_round_df,
+                                     st.session_state.tournament["id"], round_index)
+            st.dataframe(bracket_df, use_container_width=True, hide_index=True)
+            
+            if st.button("Elimina Tabellone", key="delete_bracket_btn"):
+                success, message = delete_bracket()
+                if success:
+                    st.success(message)
+                    rerun()
+                else:
+                    st.error(message)
+        
         # Delete tournament
         st.subheader("Elimina Torneo")
         
         delete_tournament_select = st.selectbox(
             "Seleziona torneo da eliminare",
-            options=[f"{t['id']} - {t['name']}" for t in st.session_state.tournaments],
+            options=[f"{t['id']} - {t['name']}" for t in get_store().list_tournaments()],
             key="delete_tournament_select"
         )
         
@@ -1400,7 +1498,7 @@ def admin_page():
                 success, message = delete_tournament(tournament_id)
                 if success:
                     st.success(message)
-                    st.rerun()
+                    rerun()
                 else:
                     st.error(message)
             else:
@@ -1432,13 +1530,115 @@ def admin_page():
             
             if success:
                 st.success(message)
-                st.experimental_rerun()
+                rerun()
             else:
                 st.error(message)
+        
+        # Pulizia delle immagini profilo non più usate
+        st.subheader("Immagini Profilo")
+        
+        if st.button("Elimina immagini non utilizzate", key="collect_images_btn"):
+            removed = collect_unused_images()
+            st.success(f"Immagini eliminate: {removed}")
+        
+        # Parametri del rating Elo, ricalcolato su tutto lo storico
+        st.subheader("Rating Elo")
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            rating_k = st.number_input("Fattore K", min_value=1.0, max_value=100.0,
+                                       value=float(get_store().ratings.k), key="rating_k")
+        
+        with col2:
+            rating_initial = st.number_input("Rating iniziale", min_value=100.0, max_value=3000.0,
+                                             value=float(get_store().ratings.initial), key="rating_initial")
+        
+        if st.button("Ricalcola rating", key="replay_ratings_btn"):
+            get_store().replay_ratings(rating_k, rating_initial)
+            st.success("Rating ricalcolati su tutte le sfide")
+        
+        # Profilazione della prossima esecuzione di questa sessione
+        st.subheader("Profilazione")
+        
+        if st.button("Profila la prossima esecuzione", key="profile_next_run_btn"):
+            st.session_state.profile_next_run = True
+            st.info("La prossima esecuzione verrà profilata")
+        
+        captures = list_captures(PROFILE_DIR)
+        if captures:
+            for name, pstats_path, collapsed_path in captures:
+                col1, col2, col3 = st.columns([2, 1, 1])
+                with col1:
+                    st.write(name)
+                with col2:
+                    with open(pstats_path, "rb") as f:
+                        st.download_button(".pstats", f.read(), file_name=os.path.basename(pstats_path),
+                                           key=f"download_pstats_{name}")
+                with col3:
+                    if os.path.exists(collapsed_path):
+                        with open(collapsed_path, "rb") as f:
+                            st.download_button(".collapsed", f.read(), file_name=os.path.basename(collapsed_path),
+                                               key=f"download_collapsed_{name}")
+        else:
+            st.info("Nessun profilo catturato")
+    
+    if show_metrics:
+        with tabs[5]:
+            metrics_tab()
+
+def metrics_tab():
+    """Render the hidden admin tab with the render and helper metrics."""
+    st.header("Metriche")
+    
+    st.subheader("Pagine")
+    st.dataframe(pd.DataFrame(METRICS.summary("page")), use_container_width=True, hide_index=True)
+    
+    # Rerun programmatici per ogni azione dell'utente, pagina per pagina
+    st.subheader("Rerun per Azione")
+    pages = sorted({label for name, label in METRICS.counters if name in ("reruns", "user_actions")})
+    st.dataframe(pd.DataFrame([{
+        "Pagina": page,
+        "Azioni": METRICS.counter("user_actions", page),
+        "Rerun": METRICS.counter("reruns", page),
+        "Rerun per Azione": METRICS.counter("reruns", page) / max(1, METRICS.counter("user_actions", page))
+    } for page in pages]), use_container_width=True, hide_index=True)
+    
+    st.subheader("Helper")
+    st.dataframe(pd.DataFrame(METRICS.summary("helper")), use_container_width=True, hide_index=True)
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        if st.button("Salva file Prometheus", key="write_metrics_btn"):
+            METRICS.write_prometheus(METRICS_PATH)
+            st.success(f"Metriche salvate in {METRICS_PATH}")
+    
+    with col2:
+        st.download_button("Scarica metriche", METRICS.to_prometheus(),
+                           file_name="metrics.prom", mime="text/plain")
+
+@st.fragment(run_every=CHANGE_POLL_SECONDS)
+def watch_changes():
+    """Rerun the page once another session or process changed data it shows."""
+    get_store().sync()
+    if get_store().sequence != st.session_state.seen_sequence:
+        # Non è una nuova pagina chiesta dall'utente: niente metrica dei rerun
+        st.session_state.rerun_requested = True
+        st.rerun()
 
 # Main function
 def main():
     """Main function to render the Chanbara tournament application."""
+    # Un'esecuzione non chiesta da rerun() è una nuova azione dell'utente
+    if not st.session_state.pop("rerun_requested", False):
+        st.session_state.action_page = st.session_state.page
+        METRICS.increment("user_actions", st.session_state.page)
+    
+    # Modifiche fatte da altri processi sullo stesso database
+    get_store().sync()
+    refresh_session_records()
+    
     # Header
     st.markdown(
         """
@@ -1462,7 +1662,7 @@ def main():
     col1, col2, col3 = st.columns([1, 2, 1])
     
     with col1:
-        st.image("https://ui-avatars.com/api/?name=Chanbara&size=50&background=random", width=50)
+        st.image(initials_avatar("Chanbara", 50), width=50)
     
     with col2:
         st.title("Torneo Chanbara 2025")
@@ -1472,7 +1672,7 @@ def main():
             if st.button("Logout"):
                 st.session_state.user = None
                 st.session_state.page = "login"
-                st.experimental_rerun()
+                rerun()
     
     # Routing based on session state
     if st.session_state.page == "login" or not st.session_state.user:
@@ -1489,6 +1689,21 @@ def main():
         history_page()
     elif st.session_state.page == "admin":
         admin_page()
+    
+    # La pagina mostra i dati attuali: da qui in poi conta solo quello che cambia
+    if st.session_state.user:
+        st.session_state.seen_sequence = get_store().sequence
+        watch_changes()
+
+def run():
+    """Run the app, under the profiler if this session asked for it."""
+    # Con ?profile=1 o dal pulsante dell'admin, solo per questa esecuzione
+    if st.query_params.get("profile") == "1" or st.session_state.pop("profile_next_run", False):
+        if "profile" in st.query_params:
+            del st.query_params["profile"]
+        capture(main, PROFILE_DIR, label=st.session_state.page)
+    else:
+        main()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    run()
\ No newline at end of file
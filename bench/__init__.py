@@ -0,0 +1 @@
+"""Benchmarks for the Chanbara tournament application."""
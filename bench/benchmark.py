@@ -0,0 +1,177 @@
+"""Benchmark suite for the tournament store.
+
+Times the operations behind the page helpers of ``app.py`` (which only
+delegate to ``TournamentStore``) on synthetic tournaments of growing size,
+and writes the figures as JSON so two commits can be compared.
+
+    python -m bench.benchmark
+    python -m bench.benchmark --scales 1000 10000 --sqlite --output before.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+
+from utils.repository import SQLiteRepository
+from utils.synthetic import generate_store
+
+DEFAULT_SCALES = (1000, 10000, 100000)
+
+
+def timed(calls):
+    """Run each call once and summarise the timings in milliseconds."""
+    timings = []
+    for call in calls:
+        start = time.perf_counter()
+        call()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    if not timings:
+        return {"calls": 0}
+    timings.sort()
+    return {
+        "calls": len(timings),
+        "mean_ms": statistics.fmean(timings),
+        "median_ms": statistics.median(timings),
+        "p95_ms": timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+        "min_ms": timings[0],
+        "max_ms": timings[-1],
+        "total_ms": sum(timings)
+    }
+
+
+def bench_scale(n_athletes, challenges_per_athlete, repeat, seed, sqlite):
+    """Generate one synthetic tournament and time every operation on it."""
+    rng = random.Random(seed)
+    n_challenges = n_athletes * challenges_per_athlete
+    n_tournaments = max(3, n_athletes // 1000)
+
+    repository = None
+    db_path = None
+    if sqlite:
+        fd, db_path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        repository = SQLiteRepository(db_path)
+
+    start = time.perf_counter()
+    store = generate_store(n_athletes, n_challenges, n_tournaments, seed=seed, repository=repository)
+    if sqlite:
+        store.save_all()
+    generate_ms = (time.perf_counter() - start) * 1000
+
+    athlete_ids = list(store.athletes)
+    tournament_ids = list(store.tournaments)
+    today = datetime.date.today()
+
+    def sample(ids, k):
+        return rng.sample(ids, min(k, len(ids)))
+
+    results = {}
+
+    # Letture
+    results["get_rankings"] = timed(
+        [lambda t=rng.choice(tournament_ids): store.get_rankings(t) for _ in range(repeat)])
+    results["get_athlete_challenges"] = timed(
+        [lambda a=a: store.get_athlete_challenges(a) for a in sample(athlete_ids, repeat)])
+    results["get_possible_opponents"] = timed(
+        [lambda a=a: store.get_possible_opponents(a, store.athletes[a]["tournaments"][0])
+         for a in sample(athlete_ids, repeat)])
+    results["get_admin_stats"] = timed(
+        [lambda t=rng.choice(tournament_ids): store.get_admin_stats(t) for _ in range(repeat)])
+
+    results["replay_ratings"] = timed([store.replay_ratings])
+
+    # Scritture: sfide valide tra compagni di torneo di livello crescente, in date future
+    proposals = []
+    for challenger_id in sample(athlete_ids, repeat):
+        tournament_id = store.athletes[challenger_id]["tournaments"][0]
+        opponents = store.get_possible_opponents(challenger_id, tournament_id)
+        if opponents:
+            date = (today + datetime.timedelta(days=rng.randint(1, 60))).isoformat()
+            proposals.append((challenger_id, rng.choice(opponents)["id"], date,
+                              rng.choice(list(store.specialties)), tournament_id))
+    results["create_challenge"] = timed(
+        [lambda p=p: store.create_challenge(*p) for p in proposals])
+
+    pending = [c for c in store.challenges.values()
+               if c["winner_id"] is None and datetime.date.fromisoformat(c["date"]) <= today]
+    results["record_challenge_result"] = timed(
+        [lambda c=c: store.record_challenge_result(c["id"], c["opponent_id"]) for c in sample(pending, repeat)])
+
+    doomed = sample(athlete_ids, max(1, repeat // 5) * 11)
+    results["delete_athlete"] = timed(
+        [lambda a=a: store.delete_athlete(a) for a in doomed[:max(1, repeat // 5)]])
+    results["delete_athletes"] = timed(
+        [lambda batch=doomed[max(1, repeat // 5):]: store.delete_athletes(batch)])
+    results["compact"] = timed([store.compact])
+    results["delete_tournament"] = timed(
+        [lambda t=t: store.delete_tournament(t) for t in sample(tournament_ids, max(1, min(repeat // 5, len(tournament_ids) - 1)))])
+
+    if sqlite:
+        store.repository.close()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(db_path + suffix):
+                os.unlink(db_path + suffix)
+
+    return {
+        "athletes": n_athletes,
+        "challenges": n_challenges,
+        "tournaments": n_tournaments,
+        "generate_ms": generate_ms,
+        "operations": results
+    }
+
+
+def git_commit():
+    """Get the current commit hash, if the tree is a git checkout."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the tournament store on synthetic data.")
+    parser.add_argument("--scales", type=int, nargs="+", default=list(DEFAULT_SCALES),
+                        help="numbers of athletes to benchmark")
+    parser.add_argument("--challenges-per-athlete", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=100, help="calls per operation")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--sqlite", action="store_true", help="write through to a temporary SQLite database")
+    parser.add_argument("--output", help="JSON file for the results (default: data/benchmarks/<commit>.json)")
+    args = parser.parse_args()
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": args.sqlite,
+        "seed": args.seed,
+        "scales": []
+    }
+
+    for n_athletes in args.scales:
+        result = bench_scale(n_athletes, args.challenges_per_athlete, args.repeat, args.seed, args.sqlite)
+        report["scales"].append(result)
+        print(f"{n_athletes} atleti, {result['challenges']} sfide (generate {result['generate_ms']:.0f} ms)")
+        for name, timing in result["operations"].items():
+            if timing["calls"]:
+                print(f"  {name:<26} median {timing['median_ms']:9.3f} ms   p95 {timing['p95_ms']:9.3f} ms")
+
+    output = args.output or os.path.join("data", "benchmarks", f"{commit or 'local'}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Risultati salvati in {output}")
+
+
+if __name__ == "__main__":
+    main()
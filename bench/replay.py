@@ -0,0 +1,97 @@
+"""Write and replay benchmark for the event log backend.
+
+Writes a stream of single-record writes to an ``EventLogRepository``,
+the way the page helpers do: registrations, challenges and results, each
+its own frame. Then times a cold start from the log alone and from a
+snapshot, and the load of the store from the recovered tables.
+
+    python -m bench.replay
+    python -m bench.replay --events 200000 --sync-interval 0
+"""
+import argparse
+import datetime
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from utils.eventlog import EventLogRepository
+from utils.store import TournamentStore
+
+
+def write_events(repository, n_events, seed):
+    """Write about ``n_events`` records: one athlete every ten, then challenges and their results."""
+    rng = random.Random(seed)
+    start = datetime.date.today() - datetime.timedelta(days=15)
+    for tournament_id in (1, 2, 3):
+        repository.save_tournament({"id": tournament_id, "name": f"Torneo {tournament_id}", "registration_open": False,
+                                    "start_date": start.isoformat(),
+                                    "end_date": (start + datetime.timedelta(days=29)).isoformat()})
+    repository.save_specialty({"id": 1, "name": "kodachi"})
+
+    n_athletes = max(2, n_events // 10)
+    for athlete_id in range(1, n_athletes + 1):
+        repository.save_athlete({"id": athlete_id, "name": f"Atleta {athlete_id}", "nickname": None,
+                                 "email": f"atleta{athlete_id}@example.com", "password": "password", "level": 1,
+                                 "profile_img": None, "version": 1, "tournaments": [athlete_id % 3 + 1]})
+
+    n_challenges = (n_events - n_athletes) // 2
+    written = n_athletes + 4
+    for challenge_id in range(1, n_challenges + 1):
+        challenger_id = rng.randint(1, n_athletes)
+        opponent_id = challenger_id % n_athletes + 1
+        challenge = {"id": challenge_id, "challenger_id": challenger_id, "opponent_id": opponent_id,
+                     "date": (start + datetime.timedelta(days=rng.randint(0, 14))).isoformat(), "specialty_id": 1,
+                     "winner_id": None, "tournament_id": challenger_id % 3 + 1, "version": 1}
+        repository.save_challenge(challenge)
+        repository.record_result(challenge, {"id": rng.choice((challenger_id, opponent_id))})
+        written += 2
+    return written
+
+
+def timed(call):
+    start = time.perf_counter()
+    result = call()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark writing and replaying the event log.")
+    parser.add_argument("--events", type=int, default=1000000)
+    parser.add_argument("--sync-interval", type=float, default=0.05,
+                        help="seconds between fsyncs of the log (0: fsync every write)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        # Niente snapshot durante la scrittura: il primo avvio ripete tutto il log
+        repository = EventLogRepository(directory, snapshot_bytes=1 << 62, sync_interval=args.sync_interval)
+        written, elapsed = timed(lambda: write_events(repository, args.events, args.seed))
+        repository.close()
+        log_bytes = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+        print(f"{written} eventi scritti in {elapsed:.2f} s ({written / elapsed:.0f}/s), "
+              f"log di {log_bytes / 1e6:.1f} MB ({log_bytes / written:.1f} byte/evento)")
+
+        repository, elapsed = timed(lambda: EventLogRepository(directory))
+        print(f"  replay del log            {elapsed:.2f} s")
+        store = TournamentStore(repository)
+        _, elapsed = timed(store.load)
+        print(f"  caricamento dello store   {elapsed:.2f} s "
+              f"({len(store.athletes)} atleti, {len(store.challenges)} sfide)")
+
+        _, elapsed = timed(repository.snapshot)
+        repository.close()
+        snapshot_bytes = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+        print(f"  snapshot                  {elapsed:.2f} s ({snapshot_bytes / 1e6:.1f} MB)")
+
+        repository, elapsed = timed(lambda: EventLogRepository(directory))
+        print(f"  avvio dallo snapshot      {elapsed:.2f} s")
+        repository.close()
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""Concurrency stress test for result entry and athlete edits.
+
+Several stores share one SQLite file, as the Streamlit processes of a
+deployment do, and several threads use each store, as the sessions of one
+process do. Every thread records results for the same pending challenges,
+with random winners, and edits random athletes, writing back the level it
+read like the admin form does. At the end the database must show each
+challenge won exactly once, every level must equal the starting level plus
+the wins recorded, and every store must agree with the database once it
+has synced.
+
+    python -m bench.stress
+    python -m bench.stress --stores 4 --threads 8 --athletes 2000
+
+``tests/test_concurrency.py`` runs a smaller configuration with pytest.
+"""
+import argparse
+import datetime
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+
+from utils.events import FileChannel
+from utils.repository import SQLiteRepository
+from utils.store import CONFLICT_MESSAGE, TournamentStore
+from utils.synthetic import generate_store
+
+
+def worker(store, pending, athlete_ids, edits, seed, outcomes, lock):
+    """Record every pending challenge and edit some athletes, counting the outcomes."""
+    rng = random.Random(seed)
+    counts = {"results": 0, "already_recorded": 0, "result_conflicts": 0, "edits": 0, "edit_conflicts": 0}
+    order = list(pending)
+    rng.shuffle(order)
+
+    for i, challenge_id in enumerate(order):
+        challenge = store.get_challenge_by_id(challenge_id)
+        version = challenge["version"]
+        winner_id = rng.choice((challenge["challenger_id"], challenge["opponent_id"]))
+        success, message = store.record_challenge_result(challenge_id, winner_id, version)
+        if success:
+            counts["results"] += 1
+        elif message == CONFLICT_MESSAGE:
+            counts["result_conflicts"] += 1
+        else:
+            counts["already_recorded"] += 1
+
+        if i % edits == 0:
+            athlete = store.get_athlete_by_id(rng.choice(athlete_ids))
+            data = {"nickname": f"n{seed}-{i}", "level": athlete["level"]}
+            success, message = store.modify_athlete(athlete["id"], data, athlete["version"])
+            counts["edits" if success else "edit_conflicts"] += 1
+
+    with lock:
+        for key, value in counts.items():
+            outcomes[key] = outcomes.get(key, 0) + value
+
+
+def check(db_path, stores, initial_levels, pending):
+    """Compare the database and every store with the expected final state; return the errors."""
+    errors = []
+    conn = sqlite3.connect(db_path)
+    winners = dict(conn.execute("SELECT id, vincitore_id FROM sfide"))
+    versions = dict(conn.execute("SELECT id, versione FROM sfide"))
+    levels = dict(conn.execute("SELECT id, livello FROM atleti"))
+    conn.close()
+
+    for challenge_id in pending:
+        if winners[challenge_id] is None:
+            errors.append(f"sfida {challenge_id} senza vincitore")
+        if versions[challenge_id] != 2:
+            errors.append(f"sfida {challenge_id} alla versione {versions[challenge_id]} (attesa 2)")
+
+    wins = {}
+    for challenge_id in pending:
+        wins[winners[challenge_id]] = wins.get(winners[challenge_id], 0) + 1
+    for athlete_id, level in levels.items():
+        expected = initial_levels[athlete_id] + wins.get(athlete_id, 0)
+        if level != expected:
+            errors.append(f"atleta {athlete_id}: livello {level}, atteso {expected}")
+
+    for index, store in enumerate(stores):
+        store.sync()
+        for athlete_id, level in levels.items():
+            if store.get_athlete_by_id(athlete_id)["level"] != level:
+                errors.append(f"store {index}: livello dell'atleta {athlete_id} non allineato")
+        for challenge_id in pending:
+            if store.get_challenge_by_id(challenge_id)["winner_id"] != winners[challenge_id]:
+                errors.append(f"store {index}: vincitore della sfida {challenge_id} non allineato")
+        for tournament in store.list_tournaments():
+            if store.check_rankings(tournament["id"]):
+                errors.append(f"store {index}: classifica del torneo {tournament['id']} non coerente")
+    return errors
+
+
+def run(directory, n_stores=3, threads=4, athletes=1000, challenges_per_athlete=5, edits=10, seed=0):
+    """Run the stress on a database in ``directory``.
+
+    Returns the pending challenges, the outcome counts, the seconds taken
+    and the inconsistencies found (empty when no update was lost).
+    """
+    db_path = os.path.join(directory, "torneo.db")
+    events_path = os.path.join(directory, "events.log")
+
+    seeded = generate_store(athletes, athletes * challenges_per_athlete,
+                            max(3, athletes // 1000), seed, SQLiteRepository(db_path))
+    seeded.save_all()
+    today = datetime.date.today().isoformat()
+    pending = [challenge["id"] for challenge in seeded.challenges.values()
+               if challenge["winner_id"] is None and challenge["date"] <= today]
+    initial_levels = {athlete["id"]: athlete["level"] for athlete in seeded.list_athletes()}
+    athlete_ids = list(initial_levels)
+    seeded.repository.close()
+
+    # Uno store per "processo", ognuno con la sua connessione e la sua origine sul canale
+    stores = []
+    for _ in range(n_stores):
+        store = TournamentStore(SQLiteRepository(db_path))
+        store.attach_channel(FileChannel(events_path, origin=uuid.uuid4().hex))
+        store.load()
+        stores.append(store)
+
+    outcomes = {}
+    lock = threading.Lock()
+    workers = [threading.Thread(target=worker, args=(store, pending, athlete_ids, edits,
+                                                      seed * 1000 + s * 100 + t, outcomes, lock))
+               for s, store in enumerate(stores) for t in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    errors = check(db_path, stores, initial_levels, pending)
+    if outcomes.get("results", 0) != len(pending):
+        errors.append(f"{outcomes.get('results', 0)} risultati registrati, attesi {len(pending)}")
+    for store in stores:
+        store.repository.close()
+    return pending, outcomes, elapsed, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress concurrent result entry on one shared database.")
+    parser.add_argument("--stores", type=int, default=3, help="stores sharing the database (processes)")
+    parser.add_argument("--threads", type=int, default=4, help="threads per store (sessions)")
+    parser.add_argument("--athletes", type=int, default=1000)
+    parser.add_argument("--challenges-per-athlete", type=int, default=5)
+    parser.add_argument("--edits", type=int, default=10, help="one athlete edit every N results")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        pending, outcomes, elapsed, errors = run(directory, args.stores, args.threads, args.athletes,
+                                                 args.challenges_per_athlete, args.edits, args.seed)
+
+    attempts = len(pending) * args.stores * args.threads
+    print(f"{len(pending)} sfide in attesa, {args.stores} store x {args.threads} thread: "
+          f"{attempts} tentativi in {elapsed:.2f} s ({attempts / elapsed:.0f}/s)")
+    for key, value in sorted(outcomes.items()):
+        print(f"  {key:<18} {value}")
+
+    if errors:
+        for error in errors[:20]:
+            print(error)
+        raise SystemExit(f"{len(errors)} incoerenze")
+    print("Nessuna incoerenza: ogni sfida vinta una volta, livelli allineati")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Elimination brackets: byes, advancement, dates inside the tournament and cascading deletes."""
+import datetime
+import sqlite3
+
+import pytest
+
+from utils.bracket import Bracket, seed_order
+from utils.eventlog import EventLogRepository
+from utils.repository import SQLiteRepository
+from utils.store import ENDED_MESSAGE, TournamentStore
+from utils.synthetic import generate_store
+
+TODAY = datetime.date.today()
+
+
+def play(bracket, winner=min):
+    """Play every match as it becomes ready; return how many were fought."""
+    ready = bracket.opening_matches()
+    played = 0
+    while ready:
+        match = ready.pop()
+        ready += bracket.record(match, winner(bracket.top[match], bracket.bottom[match]))
+        played += 1
+    return played
+
+
+@pytest.fixture
+def travel(monkeypatch):
+    """Move the store's "today" some days ahead."""
+    def to(days):
+        class Date(datetime.date):
+            @classmethod
+            def today(cls):
+                return TODAY + datetime.timedelta(days=days)
+        monkeypatch.setattr(datetime, "date", Date)
+    return to
+
+
+def test_seed_order_keeps_the_top_seeds_apart():
+    order = seed_order(8)
+    assert sorted(order) == list(range(1, 9))
+    assert order.index(1) < 4 <= order.index(2)
+
+
+@pytest.mark.parametrize("n", [2, 3, 5, 8, 13])
+def test_single_elimination_plays_n_minus_one_matches(n):
+    bracket = Bracket(list(range(1, n + 1)))
+    assert play(bracket) == n - 1
+    assert bracket.champion() == 1
+
+
+@pytest.mark.parametrize("n", [2, 4, 6, 11])
+def test_double_elimination_champion_loses_at_most_once(n):
+    bracket = Bracket(list(range(1, n + 1)), double=True)
+    played = play(bracket, winner=max)
+    assert played in (2 * n - 2, 2 * n - 1)
+    assert bracket.champion() == n
+
+
+def test_bracket_matches_stay_inside_the_tournament(travel):
+    store = generate_store(8, 0, seed=1)
+    tomorrow = (TODAY + datetime.timedelta(days=1)).isoformat()
+    assert store.create_bracket(1, 1)[0]
+    store.update_tournament_settings(1, end_date=tomorrow)
+    opening = store.get_tournament_challenges(1)
+    assert len(opening) == 4 and {c["date"] for c in opening} == {tomorrow}
+
+    # L'ultimo giorno del torneo: le semifinali non hanno più date
+    travel(1)
+    for challenge in opening:
+        assert store.record_challenge_result(challenge["id"], challenge["challenger_id"])[0]
+    bracket = store.get_bracket(1)
+    assert len(store.get_tournament_challenges(1)) == 4
+    assert len(bracket.unscheduled_matches()) == 2
+
+    # Prolungato il torneo, trovano posto nel primo giorno utile
+    store.update_tournament_settings(1, end_date=(TODAY + datetime.timedelta(days=10)).isoformat())
+    assert not bracket.unscheduled_matches()
+    semifinals = [c for c in store.get_tournament_challenges(1) if c not in opening]
+    assert {c["date"] for c in semifinals} == {(TODAY + datetime.timedelta(days=2)).isoformat()}
+
+
+def test_no_bracket_after_the_end_of_the_tournament():
+    store = generate_store(8, 0, seed=1)
+    store.update_tournament_settings(1, end_date=TODAY.isoformat())
+    assert store.create_bracket(1, 1) == (False, ENDED_MESSAGE)
+    assert store.get_bracket(1) is None
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "eventlog"])
+def test_deleting_an_athlete_drops_their_bracket_links(tmp_path, backend):
+    def open_repository():
+        if backend == "sqlite":
+            return SQLiteRepository(str(tmp_path / "torneo.db"))
+        return EventLogRepository(str(tmp_path / "log"), sync_interval=0)
+
+    store = generate_store(8, 0, seed=1, repository=open_repository())
+    store.save_all()
+    store.create_bracket(1, 1)
+    seed = store.get_bracket(1).seeds[0]
+    store.delete_athlete(seed)
+    assert len(store.get_bracket(1).challenge_of) == 3
+
+    if backend == "sqlite":
+        rows = sqlite3.connect(str(tmp_path / "torneo.db")).execute(
+            "SELECT COUNT(*) FROM incontri_tabellone i LEFT JOIN sfide s ON s.id = i.sfida_id "
+            "WHERE s.id IS NULL").fetchone()
+        assert rows == (0,)
+    else:
+        assert len(store.repository.bracket_matches[1]) == 3
+    store.repository.close()
+
+    restarted = TournamentStore(open_repository())
+    restarted.load()
+    assert len(restarted.get_bracket(1).challenge_of) == 3
+    restarted.repository.close()
@@ -0,0 +1,132 @@
+"""Concurrent result entry: conflicts are detected and no update is lost."""
+import datetime
+import threading
+
+import pytest
+
+from bench.stress import run
+from utils.repository import SQLiteRepository
+from utils.store import CONFLICT_MESSAGE
+from utils.synthetic import generate_store
+
+TODAY = datetime.date.today()
+
+
+def test_stores_sharing_a_database_lose_no_update(tmp_path):
+    pending, outcomes, _, errors = run(str(tmp_path), n_stores=3, threads=3, athletes=120,
+                                       challenges_per_athlete=5, edits=3, seed=1)
+    assert pending
+    assert errors == []
+    assert outcomes["results"] == len(pending)
+    # Ogni sfida la tentano tutti i thread: chi arriva dopo è respinto
+    assert outcomes["result_conflicts"] + outcomes["already_recorded"] == len(pending) * 8
+    assert outcomes["result_conflicts"] > 0
+
+
+def test_threads_of_one_store_record_each_result_once():
+    store = generate_store(60, 400, seed=2)
+    levels = {athlete["id"]: athlete["level"] for athlete in store.list_athletes()}
+    today = datetime.date.today().isoformat()
+    # Le sfide lette prima che i thread partano, con la loro versione
+    pending = [(challenge["id"], challenge["challenger_id"], challenge["version"])
+               for challenge in store._live_challenges()
+               if challenge["winner_id"] is None and challenge["date"] <= today]
+    outcomes = []
+
+    def record():
+        for challenge_id, winner_id, version in pending:
+            outcomes.append(store.record_challenge_result(challenge_id, winner_id, version))
+
+    threads = [threading.Thread(target=record) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert pending
+    assert sum(success for success, _ in outcomes) == len(pending)
+    assert all(success or message in (CONFLICT_MESSAGE, "Il risultato è già stato registrato")
+               for success, message in outcomes)
+    wins = {}
+    for _, winner_id, _ in pending:
+        wins[winner_id] = wins.get(winner_id, 0) + 1
+    for athlete in store.list_athletes():
+        assert athlete["level"] == levels[athlete["id"]] + wins.get(athlete["id"], 0)
+    for tournament in store.list_tournaments():
+        assert store.check_rankings(tournament["id"]) == []
+
+
+def race(store, challenge_id, winner_id, n_threads=4):
+    """Record one result from many threads; the thread whose write commits waits until the others are done.
+
+    That is the worst interleaving: the losers' conflicts re-read and apply
+    the committed result before its own thread gets the store's lock.
+    """
+    record_result = store.repository.record_result
+    losers_done = threading.Event()
+    outcomes = []
+    lock = threading.Lock()
+
+    def committing(challenge, winner):
+        committed = record_result(challenge, winner)
+        if committed is not None:
+            losers_done.wait(5)
+        return committed
+
+    def attempt():
+        outcome = store.record_challenge_result(challenge_id, winner_id)
+        with lock:
+            outcomes.append(outcome)
+            if sum(not success for success, _ in outcomes) == n_threads - 1:
+                losers_done.set()
+
+    store.repository.record_result = committing
+    threads = [threading.Thread(target=attempt) for _ in range(n_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    del store.repository.record_result
+    return outcomes
+
+
+@pytest.fixture
+def sqlite_store(tmp_path, monkeypatch):
+    store = generate_store(4, 0, seed=3, repository=SQLiteRepository(str(tmp_path / "torneo.db")))
+    store.save_all()
+    store.update_tournament_settings(1, end_date=(TODAY + datetime.timedelta(days=10)).isoformat())
+
+    store.create_bracket(1, 1)
+
+    # Le sfide del tabellone sono da domani: i risultati si registrano "domani"
+    class Date(datetime.date):
+        @classmethod
+        def today(cls):
+            return TODAY + datetime.timedelta(days=1)
+    monkeypatch.setattr(datetime, "date", Date)
+    yield store
+    store.repository.close()
+
+
+def test_a_raced_result_succeeds_once_and_counts_once(sqlite_store):
+    challenge = sqlite_store.get_tournament_challenges(1)[0]
+    winner_id = challenge["challenger_id"]
+    level = sqlite_store.get_athlete_by_id(winner_id)["level"]
+
+    outcomes = race(sqlite_store, challenge["id"], winner_id)
+    assert sum(success for success, _ in outcomes) == 1
+    assert sqlite_store.get_athlete_by_id(winner_id)["level"] == level + 1
+    assert sqlite_store.repository.fetch_athlete(winner_id)["level"] == level + 1
+    assert sqlite_store.get_challenge_by_id(challenge["id"])["winner_id"] == winner_id
+
+
+def test_a_raced_semifinal_still_creates_the_final(sqlite_store):
+    first, second = sqlite_store.get_tournament_challenges(1)
+    assert sqlite_store.record_challenge_result(first["id"], first["challenger_id"])[0]
+    outcomes = race(sqlite_store, second["id"], second["opponent_id"])
+    assert sum(success for success, _ in outcomes) == 1
+
+    bracket = sqlite_store.get_bracket(1)
+    assert not bracket.unscheduled_matches()
+    final = sqlite_store.get_challenge_by_id(bracket.challenge_of[len(bracket) - 1])
+    assert {final["challenger_id"], final["opponent_id"]} == {first["challenger_id"], second["opponent_id"]}
@@ -0,0 +1,77 @@
+"""Deleted athletes' challenges are hidden at once and dropped by compaction."""
+import time
+
+import pytest
+
+from utils.synthetic import generate_store
+
+
+@pytest.fixture
+def store():
+    return generate_store(200, 1000, n_tournaments=2, seed=3)
+
+
+def listed_challenges(store, athlete_id):
+    upcoming, past = store.get_athlete_challenges(athlete_id)
+    return {challenge["id"] for challenge in upcoming + past}
+
+
+def deleted_challenges(store, athlete_ids):
+    return set().union(*(listed_challenges(store, athlete_id) for athlete_id in athlete_ids))
+
+
+def assert_hidden(store, athlete_ids, challenge_ids):
+    for challenge_id in challenge_ids:
+        assert store.get_challenge_by_id(challenge_id) is None
+    for tournament in store.list_tournaments():
+        listed = {challenge["id"] for challenge in store.get_tournament_challenges(tournament["id"])}
+        assert not listed & challenge_ids
+        assert store.check_rankings(tournament["id"]) == []
+    for athlete in store.list_athletes():
+        assert athlete["id"] not in athlete_ids
+        assert not listed_challenges(store, athlete["id"]) & challenge_ids
+
+
+def test_deleted_challenges_are_hidden_before_compaction(store):
+    athlete_ids = list(range(1, 21))
+    challenge_ids = deleted_challenges(store, athlete_ids)
+    assert store.delete_athletes(athlete_ids) == 20
+
+    # Ancora nelle mappe, ma nessuna lettura le vede
+    assert challenge_ids <= set(store.challenges)
+    assert_hidden(store, set(athlete_ids), challenge_ids)
+
+    assert store.compact() == len(challenge_ids)
+    assert not challenge_ids & set(store.challenges)
+    assert all(not partition.dead for partition in store.partitions.values())
+    assert_hidden(store, set(athlete_ids), challenge_ids)
+
+
+def test_results_on_deleted_challenges_are_refused(store):
+    challenge_id = next(iter(deleted_challenges(store, [1])))
+    store.delete_athlete(1)
+    success, _ = store.record_challenge_result(challenge_id, 1)
+    assert not success
+
+
+def test_deleting_a_tournament_drops_its_tombstones(store):
+    challenge_ids = deleted_challenges(store, [1, 2, 3])
+    store.delete_athletes([1, 2, 3])
+    store.delete_tournament(1)
+    store.compact()
+    assert not challenge_ids & set(store.challenges)
+    assert_hidden(store, {1, 2, 3}, challenge_ids)
+
+
+def test_compactor_runs_in_background(store):
+    challenge_ids = deleted_challenges(store, range(1, 11))
+    store.delete_athletes(range(1, 11))
+    store.start_compactor(interval=0.01, threshold=1)
+    try:
+        deadline = time.monotonic() + 5
+        while challenge_ids & set(store.challenges) and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        store.stop_compactor()
+    assert not challenge_ids & set(store.challenges)
+    assert not store._ratings_stale
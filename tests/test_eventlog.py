@@ -0,0 +1,79 @@
+"""Event log backend: rollback, replayed deletes, background snapshots and the bulk load."""
+import os
+
+import pytest
+
+from utils.eventlog import EventLogRepository
+from utils.store import TournamentStore
+from utils.synthetic import generate_store
+
+
+def open_store(directory, **options):
+    store = TournamentStore(EventLogRepository(str(directory), sync_interval=0, **options))
+    store.load()
+    return store
+
+
+def state(store):
+    return (store.list_athletes(), sorted(store._live_challenges(), key=lambda c: c["id"]),
+            [store.get_rankings(tournament["id"]) for tournament in store.list_tournaments()])
+
+
+@pytest.fixture
+def saved(tmp_path):
+    store = generate_store(150, 900, n_tournaments=2, seed=8,
+                           repository=EventLogRepository(str(tmp_path), sync_interval=0))
+    store.save_all()
+    return store
+
+
+def test_a_failed_transaction_logs_and_keeps_nothing(tmp_path, saved):
+    repository = saved.repository
+    athlete = dict(saved.get_athlete_by_id(1), nickname="Mai salvato")
+    with pytest.raises(RuntimeError):
+        with repository.transaction():
+            repository.save_athlete(athlete)
+            repository.delete_athletes([2, 3])
+            raise RuntimeError("interrotta")
+
+    assert repository.fetch_athlete(1)["nickname"] != "Mai salvato"
+    assert repository.fetch_athlete(2) is not None
+    repository.close()
+    assert open_store(tmp_path).get_athlete_by_id(1)["nickname"] != "Mai salvato"
+
+
+def test_deletes_replay_to_the_same_state(tmp_path, saved):
+    saved.delete_athletes(range(1, 31))
+    saved.delete_athlete(40)
+    expected = state(saved)
+    saved.repository.close()
+
+    restarted = open_store(tmp_path)
+    assert state(restarted) == expected
+    assert not any(c["challenger_id"] <= 30 or c["opponent_id"] <= 30 for c in restarted.challenges.values())
+
+
+def test_snapshots_are_written_in_the_background(tmp_path, saved):
+    saved.repository.close()
+    store = open_store(tmp_path, snapshot_bytes=4096)
+    for athlete in store.list_athletes()[:60]:
+        assert store.modify_athlete(athlete["id"], {"nickname": f"n{athlete['id']}"})[0]
+    expected = state(store)
+    store.repository.close()
+
+    # Restano solo l'ultimo snapshot e i segmenti scritti dopo
+    snapshots = [name for name in os.listdir(tmp_path) if name.startswith("snapshot-")]
+    assert len(snapshots) == 1 and not snapshots[0].endswith(".tmp")
+    assert state(open_store(tmp_path)) == expected
+
+
+def test_bulk_load_builds_the_same_indexes(tmp_path, saved):
+    saved.repository.close()
+    loaded = open_store(tmp_path)
+    assert state(loaded) == state(saved)
+    for tournament in loaded.list_tournaments():
+        assert loaded.check_rankings(tournament["id"]) == []
+        assert (loaded.partitions[tournament["id"]].stats.summary(0)
+                == saved.partitions[tournament["id"]].stats.summary(0))
+    athlete_id = loaded.list_athletes()[0]["id"]
+    assert loaded.get_athlete_challenges(athlete_id) == saved.get_athlete_challenges(athlete_id)
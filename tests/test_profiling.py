@@ -0,0 +1,54 @@
+"""Collapsed stacks rebuilt from caller/callee pairs."""
+import time
+
+import pytest
+
+from utils.profiling import collapsed_stacks
+
+
+class FakeStats:
+    """The ``stats`` table of a ``pstats.Stats``: func -> (cc, nc, self, total, callers)."""
+
+    def __init__(self, edges, self_times):
+        totals = {}
+
+        def total(func):
+            if func not in totals:
+                totals[func] = self_times[func] + sum(total(callee) * share
+                                                      for caller, callee, share in edges if caller == func)
+            return totals[func]
+
+        callers = {func: {} for func in self_times}
+        for caller, callee, share in edges:
+            callers[callee][caller] = (1, 1, 0.0, total(callee) * share)
+        self.stats = {func: (1, 1, self_times[func], total(func), callers[func]) for func in self_times}
+
+
+def func(name):
+    return ("app.py", 1, name)
+
+
+def test_a_tree_keeps_its_stacks():
+    edges = [(func("main"), func("load"), 1.0), (func("main"), func("draw"), 1.0)]
+    stats = FakeStats(edges, {func("main"): 0.5, func("load"): 2.0, func("draw"): 1.0})
+    assert collapsed_stacks(stats) == pytest.approx({
+        "main (app.py:1)": 0.5,
+        "main (app.py:1);load (app.py:1)": 2.0,
+        "main (app.py:1);draw (app.py:1)": 1.0,
+    })
+
+
+def test_a_dag_is_bounded_and_keeps_the_total_time():
+    # 30 livelli di due funzioni che chiamano entrambe quelle del livello sotto: 2^30 pile
+    levels = [[func(f"f{level}a"), func(f"f{level}b")] for level in range(30)]
+    edges = [(caller, callee, 0.5) for upper, lower in zip(levels, levels[1:]) for caller in upper for callee in lower]
+    edges += [(func("main"), callee, 1.0) for callee in levels[0]]
+    self_times = {f: 1.0 for level in levels for f in level}
+    self_times[func("main")] = 0.0
+    stats = FakeStats(edges, self_times)
+
+    start = time.perf_counter()
+    stacks = collapsed_stacks(stats, max_stacks=5000)
+    assert time.perf_counter() - start < 5
+    assert len(stacks) <= 5000
+    assert sum(stacks.values()) == pytest.approx(stats.stats[func("main")][3])
@@ -0,0 +1,63 @@
+"""The incremental rankings agree with a full recomputation after every kind of change."""
+import datetime
+import random
+
+import pytest
+
+from utils.synthetic import generate_store
+
+
+@pytest.fixture
+def store():
+    return generate_store(300, 1500, n_tournaments=3, seed=7)
+
+
+def assert_consistent(store):
+    for tournament in store.list_tournaments():
+        assert store.check_rankings(tournament["id"]) == []
+
+
+def test_generated_store_is_consistent(store):
+    assert_consistent(store)
+
+
+def test_results_keep_rankings_consistent(store):
+    rng = random.Random(1)
+    today = datetime.date.today().isoformat()
+    pending = [c for c in store.challenges.values() if c["winner_id"] is None and c["date"] <= today]
+    assert pending
+
+    for challenge in pending:
+        winner_id = rng.choice((challenge["challenger_id"], challenge["opponent_id"]))
+        success, _ = store.record_challenge_result(challenge["id"], winner_id)
+        assert success
+
+    assert_consistent(store)
+
+
+def test_deletes_keep_rankings_consistent(store):
+    store.delete_athlete(1)
+    store.delete_athletes(range(2, 40))
+    assert_consistent(store)
+
+    store.compact()
+    assert_consistent(store)
+
+
+def test_athlete_changes_keep_rankings_consistent(store):
+    store.modify_athlete(5, {"level": 10, "name": "Zeno Ultimo"})
+    store.modify_athlete(6, {"tournaments": [1, 2, 3]})
+    store.modify_athlete(7, {"tournaments": []})
+    assert_consistent(store)
+
+
+def test_tournament_delete_keeps_rankings_consistent(store):
+    store.delete_tournament(2)
+    assert_consistent(store)
+
+
+def test_top_and_position_read_the_table(store):
+    table = store.get_rankings(1)
+    assert store.get_top_athletes(1, 3) == table[:3]
+    for position, row in enumerate(table[:20], start=1):
+        assert store.get_ranking_position(1, row["id"]) == position
@@ -0,0 +1,102 @@
+"""Elo ratings: O(1) updates, the vectorised replay and persisted parameters."""
+import datetime
+import random
+
+import pytest
+
+from utils.eventlog import EventLogRepository
+from utils.rating import INITIAL_RATING, RatingEngine, expected_score
+from utils.repository import SQLiteRepository
+from utils.store import TournamentStore
+from utils.synthetic import generate_store
+
+
+def test_record_moves_both_ratings_by_the_same_amount():
+    engine = RatingEngine(k=20)
+    engine.record(1, 2)
+    assert engine.rating(1) == pytest.approx(INITIAL_RATING + 10)
+    assert engine.rating(2) == pytest.approx(INITIAL_RATING - 10)
+    assert engine.rating(3) == INITIAL_RATING
+
+    # Battere un favorito vale più che battere uno sfavorito
+    before = engine.rating(2)
+    engine.record(2, 1)
+    assert engine.rating(2) - before > 10
+    assert expected_score(1600, 1400) == pytest.approx(1 - expected_score(1400, 1600))
+
+
+def test_replay_matches_results_applied_one_by_one():
+    rng = random.Random(5)
+    challenges = []
+    for challenge_id in range(1, 3001):
+        a, b = rng.sample(range(1, 201), 2)
+        challenges.append({"id": challenge_id, "challenger_id": a, "opponent_id": b,
+                           "date": f"2025-06-{rng.randint(1, 30):02d}", "winner_id": rng.choice((a, b, None))})
+
+    engine = RatingEngine(k=24, initial=1200)
+    engine.replay(challenges, range(1, 201))
+
+    sequential = RatingEngine(k=24, initial=1200)
+    for c in sorted(challenges, key=lambda c: (c["date"], c["id"])):
+        if c["winner_id"] is not None:
+            loser_id = c["opponent_id"] if c["winner_id"] == c["challenger_id"] else c["challenger_id"]
+            sequential.record(c["winner_id"], loser_id)
+
+    for athlete_id in range(1, 201):
+        assert engine.rating(athlete_id) == pytest.approx(sequential.rating(athlete_id))
+
+
+def test_store_ratings_follow_results_and_deletes():
+    store = generate_store(100, 500, seed=2)
+    store.replay_ratings()
+    replayed = {athlete["id"]: store.get_rating(athlete["id"]) for athlete in store.list_athletes()}
+    assert sum(replayed.values()) == pytest.approx(INITIAL_RATING * len(replayed))
+
+    store.delete_athlete(1)
+    assert 1 not in store.ratings.ratings
+    fresh = RatingEngine()
+    fresh.replay(store._live_challenges(), store.athletes)
+    for athlete in store.list_athletes():
+        assert store.get_rating(athlete["id"]) == pytest.approx(fresh.rating(athlete["id"]))
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "eventlog"])
+def test_rating_parameters_survive_a_restart(tmp_path, backend):
+    def open_repository():
+        if backend == "sqlite":
+            return SQLiteRepository(str(tmp_path / "torneo.db"))
+        return EventLogRepository(str(tmp_path / "log"), sync_interval=0)
+
+    store = generate_store(50, 200, seed=4, repository=open_repository())
+    store.save_all()
+    store.replay_ratings(k=12, initial=1000)
+    expected = {athlete["id"]: store.get_rating(athlete["id"]) for athlete in store.list_athletes()}
+    store.repository.close()
+
+    restarted = TournamentStore(open_repository())
+    restarted.load()
+    assert (restarted.ratings.k, restarted.ratings.initial) == (12, 1000)
+    for athlete_id, rating in expected.items():
+        assert restarted.get_rating(athlete_id) == pytest.approx(rating)
+
+    # Ricaricare lo store non riporta i parametri ai valori predefiniti
+    restarted._reset()
+    assert (restarted.ratings.k, restarted.ratings.initial) == (12, 1000)
+    restarted.repository.close()
+
+
+def test_results_recorded_out_of_date_order_match_the_replay():
+    store = generate_store(60, 400, seed=9)
+    store.replay_ratings()
+    today = datetime.date.today().isoformat()
+    pending = [c for c in store._live_challenges() if c["winner_id"] is None and c["date"] <= today]
+    assert len(pending) > 10
+
+    # Dal più recente al più vecchio: ogni risultato precede quelli già applicati
+    for challenge in sorted(pending, key=lambda c: (c["date"], c["id"]), reverse=True):
+        assert store.record_challenge_result(challenge["id"], challenge["opponent_id"])[0]
+
+    replayed = RatingEngine()
+    replayed.replay(store._live_challenges(), store.athletes)
+    for athlete in store.list_athletes():
+        assert store.get_rating(athlete["id"]) == pytest.approx(replayed.rating(athlete["id"]))
@@ -0,0 +1,87 @@
+"""Round-robin rounds, level pools and the calendar's capacity constraints."""
+import datetime
+import itertools
+
+import pytest
+
+from utils.scheduler import plan_calendar, round_robin, split_pools
+from utils.synthetic import generate_store
+
+
+def athletes(n):
+    return [{"id": i, "name": f"Atleta {i}", "level": i % 7 + 1} for i in range(1, n + 1)]
+
+
+def dates(n, start=datetime.date(2025, 6, 1)):
+    return [(start + datetime.timedelta(days=i)).isoformat() for i in range(n)]
+
+
+@pytest.mark.parametrize("n", [2, 5, 8, 13])
+def test_round_robin_pairs_everyone_once(n):
+    rounds = list(round_robin(range(1, n + 1)))
+    assert len(rounds) == n - 1 + n % 2
+
+    pairs = [frozenset(pair) for pairs in rounds for pair in pairs]
+    assert len(pairs) == len(set(pairs)) == n * (n - 1) // 2
+    for pairs in rounds:
+        seen = [athlete_id for pair in pairs for athlete_id in pair]
+        assert len(seen) == len(set(seen))
+
+
+def test_split_pools_keeps_levels_together():
+    pools = split_pools(athletes(23), 5)
+    assert len(pools) == 5
+    assert {len(pool) for pool in pools} <= {4, 5}
+    for lower, upper in itertools.pairwise(pools):
+        assert max(a["level"] for a in lower) <= min(a["level"] for a in upper)
+
+    assert split_pools(athletes(6), None) == [sorted(athletes(6), key=lambda a: (a["level"], a["name"], a["id"]))]
+    assert split_pools([], 4) == []
+
+
+def test_calendar_respects_courts_and_athlete_limits():
+    days = dates(30)
+    matches, unscheduled = plan_calendar(athletes(12), days, courts=2, matches_per_court=2, max_per_day=1,
+                                         day_load={days[0]: 3}, athlete_load={(1, days[1]): 1}, played={(1, 2)})
+    assert unscheduled == 0
+    assert len(matches) == 12 * 11 // 2 - 1
+
+    per_day = {}
+    per_athlete = {}
+    levels = {a["id"]: a["level"] for a in athletes(12)}
+    for challenger_id, opponent_id, date in matches:
+        assert date in days
+        assert (levels[challenger_id], challenger_id) < (levels[opponent_id], opponent_id)
+        assert {challenger_id, opponent_id} != {1, 2}
+        per_day[date] = per_day.get(date, 0) + 1
+        for athlete_id in (challenger_id, opponent_id):
+            per_athlete[athlete_id, date] = per_athlete.get((athlete_id, date), 0) + 1
+
+    assert per_day.get(days[0], 0) <= 1
+    assert all(count <= 4 for count in per_day.values())
+    assert all(count == 1 for count in per_athlete.values())
+    assert (1, days[1]) not in per_athlete
+
+
+def test_calendar_counts_matches_without_room():
+    matches, unscheduled = plan_calendar(athletes(6), dates(2), courts=1)
+    assert len(matches) == 2
+    assert unscheduled == 6 * 5 // 2 - 2
+
+
+def test_generated_calendar_stays_in_the_tournament():
+    store = generate_store(40, 0, seed=1)
+    tournament = store.list_tournaments()[0]
+    store.update_tournament_settings(tournament["id"], start_date="2000-01-01",
+                                     end_date=(datetime.date.today() + datetime.timedelta(days=60)).isoformat())
+    success, message = store.generate_calendar(tournament["id"], 1, courts=4, max_per_day=1, pool_size=8)
+    assert success, message
+
+    challenges = store.get_tournament_challenges(tournament["id"])
+    assert len(challenges) == 5 * 8 * 7 // 2
+    today = datetime.date.today().isoformat()
+    assert all(today < c["date"] <= tournament["end_date"] for c in challenges)
+
+    # Una seconda generazione salta le coppie che hanno già una sfida
+    store.generate_calendar(tournament["id"], 1, courts=4, pool_size=8)
+    assert len(store.get_tournament_challenges(tournament["id"])) == len(challenges)
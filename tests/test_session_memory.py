@@ -0,0 +1,51 @@
+"""Per-session memory of the app stays flat as the dataset grows."""
+import logging
+import os
+import pickle
+
+from streamlit.testing.v1 import AppTest
+
+from utils.repository import SQLiteRepository
+from utils.synthetic import generate_store
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+ADMIN = {"id": 999, "name": "Admin", "email": "admin@example.com", "is_admin": True, "profile_img": None}
+
+
+def session_size(tmp_path, monkeypatch, n_athletes):
+    """Render the ranking and admin pages on a dataset and measure what the session keeps."""
+    db_path = str(tmp_path / f"torneo-{n_athletes}.db")
+    repository = SQLiteRepository(db_path)
+    store = generate_store(n_athletes, n_athletes * 3, 1, seed=0, repository=repository)
+    store.save_all()
+    athlete = dict(store.athletes[1], is_admin=False)
+    repository.close()
+
+    monkeypatch.setenv("TORNEO_DB_PATH", db_path)
+    logging.disable(logging.WARNING)
+    try:
+        at = AppTest.from_file(APP, default_timeout=60)
+        at.run()
+        at.session_state.user = athlete
+        at.session_state.page = "ranking"
+        at.run()
+        assert not at.exception
+        at.session_state.user = ADMIN
+        at.session_state.page = "admin"
+        at.run()
+        assert not at.exception
+    finally:
+        logging.disable(logging.NOTSET)
+
+    return len(pickle.dumps(at.session_state.to_dict()))
+
+
+def test_session_state_does_not_grow_with_data(tmp_path, monkeypatch):
+    small = session_size(tmp_path, monkeypatch, 50)
+    large = session_size(tmp_path, monkeypatch, 5000)
+
+    # Le sessioni tengono solo id, pagina e valori dei widget: i dati e le
+    # viste derivate stanno nello store e nella cache condivisi
+    assert large < 16 * 1024
+    assert large - small < 1024
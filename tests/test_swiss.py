@@ -0,0 +1,84 @@
+"""Swiss pairings: byes, no rematches while a swap avoids them, and rounds inside the tournament."""
+import datetime
+
+import pytest
+
+from utils.store import ENDED_MESSAGE
+from utils.swiss import swiss_pairings
+from utils.synthetic import generate_store
+
+TODAY = datetime.date.today()
+
+
+def meet(played, pairs):
+    for a, b in pairs:
+        played.setdefault(a, set()).add(b)
+        played.setdefault(b, set()).add(a)
+
+
+def test_everyone_plays_once_and_the_lowest_rests():
+    pairs, bye = swiss_pairings(list(range(1, 10)), {})
+    assert bye == 9
+    seen = [athlete_id for pair in pairs for athlete_id in pair]
+    assert sorted(seen) == list(range(1, 9))
+
+    # Chi ha già riposato non riposa di nuovo
+    _, bye = swiss_pairings(list(range(1, 10)), {}, had_bye={9, 8})
+    assert bye == 7
+
+
+def test_rematches_are_avoided_by_swapping_pairs():
+    played = {}
+    meet(played, [(1, 2), (3, 4)])
+    pairs, _ = swiss_pairings([1, 2, 3, 4], played)
+    assert {frozenset(pair) for pair in pairs} == {frozenset((1, 3)), frozenset((2, 4))}
+
+    # In fondo restano 3 e 4, che si sono già incontrati: si rompe (1, 2)
+    played = {}
+    meet(played, [(3, 4), (1, 3)])
+    pairs, _ = swiss_pairings([1, 2, 3, 4], played)
+    assert not any(b in played.get(a, ()) for a, b in pairs)
+
+
+def test_a_rematch_only_when_nothing_else_is_left():
+    played = {}
+    meet(played, [(1, 2)])
+    assert swiss_pairings([1, 2], played) == ([(1, 2)], None)
+
+
+def test_many_rounds_without_rematches():
+    order = list(range(1, 21))
+    played = {}
+    for _ in range(7):
+        pairs, bye = swiss_pairings(order, played)
+        assert bye is None and len(pairs) == 10
+        assert not any(b in played.get(a, ()) for a, b in pairs)
+        meet(played, pairs)
+        # Classifica diversa a ogni turno
+        order = order[1:] + order[:1]
+
+
+@pytest.fixture
+def store():
+    store = generate_store(9, 0, seed=2)
+    store.update_tournament_settings(1, end_date=(TODAY + datetime.timedelta(days=3)).isoformat())
+    return store
+
+
+def test_swiss_round_creates_challenges_inside_the_tournament(store):
+    success, message = store.generate_swiss_round(1, 1)
+    assert success, message
+    challenges = store.get_tournament_challenges(1)
+    assert len(challenges) == 4
+    tournament = store.get_tournament_by_id(1)
+    assert all(TODAY.isoformat() < c["date"] <= tournament["end_date"] for c in challenges)
+    assert store.count_swiss_rounds(1) == 1
+
+    # Il turno successivo aspetta i risultati di questo
+    assert not store.generate_swiss_round(1, 1)[0]
+
+
+def test_no_swiss_round_after_the_end_of_the_tournament(store):
+    store.update_tournament_settings(1, end_date=TODAY.isoformat())
+    assert store.generate_swiss_round(1, 1) == (False, ENDED_MESSAGE)
+    assert store.count_swiss_rounds(1) == 0
@@ -0,0 +1,108 @@
+"""Two processes on one database: remote writes are applied record by record."""
+import datetime
+
+import pytest
+
+from utils.events import FileChannel
+from utils.repository import SQLiteRepository
+from utils.store import TournamentStore
+from utils.synthetic import generate_store
+
+TODAY = datetime.date.today()
+
+
+def open_stores(tmp_path, n_challenges):
+    """A writer and a reader process sharing one database and one event file."""
+    db_path = str(tmp_path / "torneo.db")
+    events_path = str(tmp_path / "events.jsonl")
+    writer = generate_store(16, n_challenges, seed=6, repository=SQLiteRepository(db_path))
+    writer.save_all()
+    writer.update_tournament_settings(1, end_date=(TODAY + datetime.timedelta(days=30)).isoformat())
+    writer.attach_channel(FileChannel(events_path, origin="writer"))
+
+    reader = TournamentStore(SQLiteRepository(db_path))
+    reader.attach_channel(FileChannel(events_path, origin="reader"))
+    reader.load()
+    return writer, reader
+
+
+@pytest.fixture
+def stores(tmp_path):
+    writer, reader = open_stores(tmp_path, 200)
+    yield writer, reader
+    writer.repository.close()
+    reader.repository.close()
+
+
+@pytest.fixture
+def empty_stores(tmp_path):
+    # Senza sfide in sospeso, per i turni svizzeri
+    writer, reader = open_stores(tmp_path, 0)
+    yield writer, reader
+    writer.repository.close()
+    reader.repository.close()
+
+
+def sync_without_reset(reader, monkeypatch):
+    monkeypatch.setattr(reader, "_reset", lambda: pytest.fail("full reload"))
+    before = reader.sequence
+    events = reader.sync()
+    assert events and reader.sequence == before + 1
+    return events
+
+
+def assert_same(writer, reader):
+    assert reader.list_athletes() == writer.list_athletes()
+    for tournament in writer.list_tournaments():
+        assert reader.get_tournament_by_id(tournament["id"]) == tournament
+        assert reader.get_tournament_challenges(tournament["id"]) == writer.get_tournament_challenges(tournament["id"])
+        assert reader.check_rankings(tournament["id"]) == []
+    assert len(reader.list_tournaments()) == len(writer.list_tournaments())
+
+
+def test_results_and_edits_are_applied_in_place(stores, monkeypatch):
+    writer, reader = stores
+    tournament = reader.get_tournament_by_id(1)
+    athlete = reader.get_athlete_by_id(1)
+
+    challenge = next(c for c in writer.get_tournament_challenges(1) if c["winner_id"] is None)
+    assert writer.record_challenge_result(challenge["id"], challenge["challenger_id"])[0]
+    assert writer.modify_athlete(1, {"nickname": "Tigre"})[0]
+    writer.update_tournament_settings(1, name="Torneo d'autunno")
+    sync_without_reset(reader, monkeypatch)
+
+    assert_same(writer, reader)
+    assert reader.get_challenge_by_id(challenge["id"])["winner_id"] == challenge["challenger_id"]
+    # Chi teneva i record li vede aggiornati
+    assert tournament["name"] == "Torneo d'autunno"
+    assert reader.get_athlete_by_id(1) is athlete and athlete["nickname"] == "Tigre"
+
+
+def test_new_and_deleted_records_follow(stores, monkeypatch):
+    writer, reader = stores
+    writer.register_athlete("Nuova Atleta", "nuova@example.com", "segreta")
+    writer.delete_athletes([2, 3])
+    success, _ = writer.create_tournament("Secondo", TODAY.isoformat(),
+                                          (TODAY + datetime.timedelta(days=10)).isoformat())
+    assert success
+    sync_without_reset(reader, monkeypatch)
+    assert_same(writer, reader)
+
+    writer.delete_tournament(2)
+    sync_without_reset(reader, monkeypatch)
+    assert_same(writer, reader)
+    assert reader.get_athlete_by_id(2) is None
+
+
+def test_brackets_swiss_rounds_and_rating_parameters_follow(empty_stores, monkeypatch):
+    writer, reader = empty_stores
+    assert writer.generate_swiss_round(1, 1)[0]
+    writer.replay_ratings(k=16, initial=1200)
+    sync_without_reset(reader, monkeypatch)
+    assert reader.count_swiss_rounds(1) == 1
+    assert (reader.ratings.k, reader.ratings.initial) == (16, 1200)
+
+    assert writer.create_bracket(1, 1)[0]
+    sync_without_reset(reader, monkeypatch)
+    assert reader.get_bracket(1).challenge_of == writer.get_bracket(1).challenge_of
+    assert_same(writer, reader)
@@ -0,0 +1 @@
+"""Utility modules for the Chanbara tournament application."""
@@ -0,0 +1,124 @@
+"""Per-athlete challenge index.
+
+Each athlete has a bucket of ``(date_ordinal, challenge_id)`` pairs kept
+sorted, so splitting upcoming from past challenges is a single bisect at
+today's ordinal and the history can be paged without looking at anyone
+else's challenges.
+
+Bulk deletions don't edit the buckets one entry at a time: ``discard``
+tombstones the challenge, reads skip tombstoned ids in the buckets that
+hold any, and ``compact`` rewrites those buckets in a single pass.
+"""
+import bisect
+import datetime
+import functools
+
+
+@functools.lru_cache(maxsize=4096)
+def date_ordinal(date):
+    """Convert an ISO date string to its proleptic ordinal."""
+    return datetime.date.fromisoformat(date).toordinal()
+
+
+class ChallengeAdjacency:
+    """Challenge ids of every athlete, ordered by date."""
+
+    def __init__(self):
+        self._buckets = {}
+        # Sfide eliminate ma ancora presenti nei bucket, e atleti con bucket da ripulire
+        self._dead = set()
+        self._dirty = set()
+
+    def add(self, challenge):
+        """Index a challenge under both participants."""
+        entry = (date_ordinal(challenge["date"]), challenge["id"])
+        for athlete_id in (challenge["challenger_id"], challenge["opponent_id"]):
+            bisect.insort(self._buckets.setdefault(athlete_id, []), entry)
+
+    def add_many(self, challenges):
+        """Index many challenges, sorting each bucket they touch once."""
+        touched = set()
+        for challenge in challenges:
+            entry = (date_ordinal(challenge["date"]), challenge["id"])
+            for athlete_id in (challenge["challenger_id"], challenge["opponent_id"]):
+                self._buckets.setdefault(athlete_id, []).append(entry)
+                touched.add(athlete_id)
+        for athlete_id in touched:
+            self._buckets[athlete_id].sort()
+
+    def remove(self, challenge):
+        """Drop a challenge from both participants' buckets."""
+        entry = (date_ordinal(challenge["date"]), challenge["id"])
+        for athlete_id in (challenge["challenger_id"], challenge["opponent_id"]):
+            bucket = self._buckets.get(athlete_id)
+            if not bucket:
+                continue
+            i = bisect.bisect_left(bucket, entry)
+            if i < len(bucket) and bucket[i] == entry:
+                del bucket[i]
+
+    def discard(self, challenge):
+        """Tombstone a challenge: hidden from reads now, dropped by ``compact``."""
+        self._dead.add(challenge["id"])
+        for athlete_id in (challenge["challenger_id"], challenge["opponent_id"]):
+            if athlete_id in self._buckets:
+                self._dirty.add(athlete_id)
+
+    def remove_athlete(self, athlete_id):
+        """Forget an athlete's bucket (their challenges must be removed or discarded)."""
+        self._buckets.pop(athlete_id, None)
+        self._dirty.discard(athlete_id)
+
+    def tombstones(self):
+        """Count the discarded challenges not compacted yet."""
+        return len(self._dead)
+
+    def compact(self):
+        """Drop tombstoned entries from every bucket that holds any."""
+        dead = self._dead
+        for athlete_id in self._dirty:
+            bucket = self._buckets.get(athlete_id)
+            if bucket is not None:
+                self._buckets[athlete_id] = [entry for entry in bucket if entry[1] not in dead]
+        removed = len(dead)
+        self._dead = set()
+        self._dirty = set()
+        return removed
+
+    def _ids(self, athlete_id, entries):
+        """Get the challenge ids of some bucket entries, skipping tombstones."""
+        if athlete_id in self._dirty:
+            return [challenge_id for _, challenge_id in entries if challenge_id not in self._dead]
+        return [challenge_id for _, challenge_id in entries]
+
+    def challenge_ids(self, athlete_id):
+        """Get all challenge ids of an athlete, oldest first."""
+        return self._ids(athlete_id, self._buckets.get(athlete_id, ()))
+
+    def _split(self, athlete_id, today_ordinal):
+        bucket = self._buckets.get(athlete_id, [])
+        return bucket, bisect.bisect_left(bucket, (today_ordinal,))
+
+    def upcoming(self, athlete_id, today_ordinal):
+        """Get ids of challenges dated today or later, soonest first."""
+        bucket, split = self._split(athlete_id, today_ordinal)
+        return self._ids(athlete_id, bucket[split:])
+
+    def count_past(self, athlete_id, today_ordinal):
+        """Count challenges dated before today."""
+        bucket, split = self._split(athlete_id, today_ordinal)
+        if athlete_id in self._dirty:
+            return sum(1 for _, challenge_id in bucket[:split] if challenge_id not in self._dead)
+        return split
+
+    def past(self, athlete_id, today_ordinal, offset=0, limit=None):
+        """Get ids of challenges dated before today, most recent first."""
+        bucket, split = self._split(athlete_id, today_ordinal)
+        if athlete_id in self._dirty:
+            live = self._ids(athlete_id, reversed(bucket[:split]))
+            return live[offset:None if limit is None else offset + limit]
+        stop = split - offset
+        start = 0 if limit is None else max(stop - limit, 0)
+        if stop <= 0:
+            return []
+        return [challenge_id for _, challenge_id in reversed(bucket[start:stop])]
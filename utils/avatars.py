@@ -0,0 +1,44 @@
+"""Initials avatars rendered locally.
+
+The same name and size always give the same SVG bytes, so profile
+pictures don't depend on an external image service and the browser can
+cache them.
+"""
+import functools
+import hashlib
+from xml.sax.saxutils import escape
+
+# Colori di sfondo, scelti in modo deterministico dal nome
+PALETTE = (
+    "#c0392b", "#d35400", "#b7950b", "#27ae60", "#16a085", "#2980b9",
+    "#8e44ad", "#2c3e50", "#7f8c8d", "#a93226", "#1e8449", "#5b2c6f",
+)
+
+# Prefisso degli avatar remoti salvati dalle versioni precedenti
+UI_AVATARS_URL = "https://ui-avatars.com/api/"
+
+
+def initials(name):
+    """Get up to two uppercase initials from a name."""
+    words = (name or "").split()
+    if not words:
+        return "?"
+    if len(words) == 1:
+        return words[0][:2].upper()
+    return (words[0][0] + words[-1][0]).upper()
+
+
+@functools.lru_cache(maxsize=2048)
+def initials_avatar(name, size=150):
+    """Render a square SVG avatar with the initials of ``name``."""
+    digest = hashlib.sha256((name or "").encode("utf-8")).digest()
+    background = PALETTE[digest[0] % len(PALETTE)]
+    font_size = round(size * 0.4)
+
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size}" viewBox="0 0 {size} {size}">'
+        f'<rect width="{size}" height="{size}" fill="{background}"/>'
+        f'<text x="50%" y="50%" dy=".35em" text-anchor="middle" fill="#ffffff" '
+        f'font-family="Helvetica, Arial, sans-serif" font-size="{font_size}">{escape(initials(name))}</text>'
+        f'</svg>'
+    )
@@ -0,0 +1,104 @@
+"""Content-addressed storage for uploaded files.
+
+Blobs are stored on local disk under their SHA-256 digest, so the same
+image uploaded twice is kept once. Records only hold the short
+``blob:<digest>`` key. Writes go through a temporary file and an atomic
+rename, and ``collect_garbage`` removes blobs no record references.
+"""
+import hashlib
+import os
+import tempfile
+import time
+
+KEY_PREFIX = "blob:"
+
+
+def is_blob_key(value):
+    """Tell whether a value is a blob key."""
+    return isinstance(value, str) and value.startswith(KEY_PREFIX)
+
+
+class BlobStore:
+    """Blobs on disk, addressed by the SHA-256 of their content."""
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, digest):
+        # Due livelli di directory per non avere migliaia di file in una sola
+        return os.path.join(self.root, digest[:2], digest[2:])
+
+    def path(self, key):
+        """Get the file path of a blob key, or None if it isn't stored."""
+        if not is_blob_key(key):
+            return None
+        path = self._path(key[len(KEY_PREFIX):])
+        return path if os.path.exists(path) else None
+
+    def put(self, data):
+        """Store bytes and return their key (existing content is reused)."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+
+        if not os.path.exists(path):
+            directory = os.path.dirname(path)
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+            try:
+                with os.fdopen(fd, "wb") as tmp:
+                    tmp.write(data)
+                    tmp.flush()
+                    os.fsync(tmp.fileno())
+                os.replace(tmp_path, path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                raise
+
+        return KEY_PREFIX + digest
+
+    def get(self, key):
+        """Read the bytes of a blob, or None if it isn't stored."""
+        path = self.path(key)
+        if path is None:
+            return None
+        with open(path, "rb") as blob:
+            return blob.read()
+
+    def keys(self):
+        """Iterate over the keys of every stored blob."""
+        for prefix in os.listdir(self.root):
+            directory = os.path.join(self.root, prefix)
+            if len(prefix) != 2 or not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                if not name.startswith(".tmp-"):
+                    yield KEY_PREFIX + prefix + name
+
+    def collect_garbage(self, referenced, min_age=3600):
+        """Delete blobs not in ``referenced`` and older than ``min_age`` seconds.
+
+        The age limit keeps blobs that were just uploaded but whose record
+        hasn't been saved yet. Returns the number of files removed.
+        """
+        referenced = set(referenced)
+        cutoff = time.time() - min_age
+        removed = 0
+
+        for prefix in os.listdir(self.root):
+            directory = os.path.join(self.root, prefix)
+            if len(prefix) != 2 or not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                path = os.path.join(directory, name)
+                if not name.startswith(".tmp-") and KEY_PREFIX + prefix + name in referenced:
+                    continue
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.unlink(path)
+                        removed += 1
+                except FileNotFoundError:
+                    pass
+
+        return removed
@@ -0,0 +1,222 @@
+"""Single and double elimination brackets.
+
+A ``Bracket`` keeps every match in flat ``array`` columns: the two
+entrants, the winner, where the winner goes next and (in double
+elimination) where the loser drops. A destination is ``match * 2 + side``.
+Matches are stored round by round, so a round is a contiguous slice and
+rendering it costs O(round size); recording a result only walks the
+destinations of that match, O(log N) even when byes carry an athlete
+through several rounds.
+
+Entrants are athlete ids (always positive); ``PENDING`` marks a side still
+waiting for its athlete and ``BYE`` a side that will never have one.
+"""
+from array import array
+
+PENDING = 0
+BYE = -1
+NOWHERE = -1
+
+MAX_ENTRANTS = 4096
+
+
+def seed_order(size):
+    """Get the seed of each first-round slot, so that seeds 1 and 2 can only meet in the final."""
+    order = [1]
+    while len(order) < size:
+        total = len(order) * 2 + 1
+        order = [seed for s in order for seed in (s, total - s)]
+    return order
+
+
+def winners_round_name(r, rounds):
+    """Name a winners' bracket round by how far it is from the final."""
+    names = {1: "Finale", 2: "Semifinali", 3: "Quarti di finale", 4: "Ottavi di finale"}
+    return names.get(rounds - r, f"Turno {r + 1}")
+
+
+class Bracket:
+    """Elimination bracket over a list of athlete ids in seed order."""
+
+    def __init__(self, seeds, double=False, specialty_id=None):
+        if not 2 <= len(seeds) <= MAX_ENTRANTS:
+            raise ValueError(f"Un tabellone ha da 2 a {MAX_ENTRANTS} atleti")
+
+        self.seeds = list(seeds)
+        self.double = double
+        self.specialty_id = specialty_id
+        size = 1
+        while size < len(self.seeds):
+            size *= 2
+        self.size = size
+
+        self.top = array("i")
+        self.bottom = array("i")
+        self.winner = array("i")
+        self.next_win = array("i")
+        self.next_lose = array("i")
+
+        # (nome, primo incontro, fine) di ogni turno, in ordine di gioco
+        self.rounds = []
+
+        # Sfida creata per ogni incontro e viceversa
+        self.challenge_of = {}
+        self.match_of = {}
+
+        self._build()
+
+        # Primo turno: le teste di serie oltre il numero di atleti sono bye
+        ready = []
+        for slot, seed in enumerate(seed_order(size)):
+            self._place(slot, self.seeds[seed - 1] if seed <= len(self.seeds) else BYE, ready)
+        self._opening = ready
+
+    def _add_round(self, name, count):
+        start = len(self.top)
+        for column in (self.top, self.bottom, self.winner):
+            column.extend([PENDING] * count)
+        for column in (self.next_win, self.next_lose):
+            column.extend([NOWHERE] * count)
+        self.rounds.append((name, start, start + count))
+        return start
+
+    def _build(self):
+        """Lay out the matches and link every winner (and loser) to their next match."""
+        k = self.size.bit_length() - 1
+        prefix = "Vincenti – " if self.double else ""
+
+        winners = []
+        for r in range(k):
+            start = self._add_round(prefix + winners_round_name(r, k), self.size >> (r + 1))
+            if winners:
+                previous = winners[-1]
+                for j in range(self.size >> r):
+                    self.next_win[previous + j] = (start + j // 2) * 2 + j % 2
+            winners.append(start)
+
+        if not self.double:
+            return
+
+        final = winners[-1]
+        if k == 1:
+            grand_final = self._add_round("Finalissima", 1)
+            self.next_win[final] = grand_final * 2
+            self.next_lose[final] = grand_final * 2 + 1
+            return
+
+        # Perdenti: i perdenti del primo turno si affrontano tra loro, poi ogni
+        # turno alterna l'ingresso dei perdenti del turno successivo dei
+        # vincenti e una riduzione tra i sopravvissuti
+        losers_round = 1
+        count = self.size >> 2
+        previous = self._add_round(f"Perdenti – Turno {losers_round}", count)
+        for j in range(self.size >> 1):
+            self.next_lose[winners[0] + j] = (previous + j // 2) * 2 + j % 2
+
+        for i in range(1, k):
+            losers_round += 1
+            start = self._add_round(f"Perdenti – Turno {losers_round}", count)
+            for j in range(count):
+                self.next_win[previous + j] = (start + j) * 2
+                # Ordine invertito a turni alterni per evitare rivincite immediate
+                source = winners[i] + (count - 1 - j if i % 2 else j)
+                self.next_lose[source] = (start + j) * 2 + 1
+            previous = start
+
+            if i < k - 1:
+                losers_round += 1
+                start = self._add_round(f"Perdenti – Turno {losers_round}", count // 2)
+                for j in range(count):
+                    self.next_win[previous + j] = (start + j // 2) * 2 + j % 2
+                previous = start
+                count //= 2
+
+        grand_final = self._add_round("Finalissima", 1)
+        self.next_win[final] = grand_final * 2
+        self.next_win[previous] = grand_final * 2 + 1
+
+    def _place(self, destination, athlete_id, ready):
+        """Put an athlete (or a bye) in a match and resolve walkovers onward."""
+        pending = [(destination, athlete_id)]
+        while pending:
+            destination, athlete_id = pending.pop()
+            if destination == NOWHERE:
+                continue
+            match, side = divmod(destination, 2)
+            if side:
+                self.bottom[match] = athlete_id
+            else:
+                self.top[match] = athlete_id
+
+            top, bottom = self.top[match], self.bottom[match]
+            if top == PENDING or bottom == PENDING:
+                continue
+            if top == BYE or bottom == BYE:
+                # Passaggio automatico (o bye contro bye)
+                self.winner[match] = bottom if top == BYE else top
+                pending.append((self.next_win[match], self.winner[match]))
+                pending.append((self.next_lose[match], BYE))
+            else:
+                ready.append(match)
+
+    def __len__(self):
+        return len(self.top)
+
+    def opening_matches(self):
+        """Get the matches ready to be fought when the bracket is created."""
+        return list(self._opening)
+
+    def attach(self, match, challenge_id):
+        """Link the challenge created for a match."""
+        self.challenge_of[match] = challenge_id
+        self.match_of[challenge_id] = match
+
+    def record(self, match, winner_id):
+        """Record the winner of a match and return the matches that became ready."""
+        top, bottom = self.top[match], self.bottom[match]
+        if self.winner[match] != PENDING or winner_id not in (top, bottom):
+            raise ValueError("Incontro non disputabile")
+
+        self.winner[match] = winner_id
+        ready = []
+        self._place(self.next_win[match], winner_id, ready)
+        self._place(self.next_lose[match], bottom if winner_id == top else top, ready)
+        return ready
+
+    def unscheduled_matches(self):
+        """Get the matches whose two athletes are known but that have no challenge yet."""
+        return [match for match in range(len(self.top))
+                if self.top[match] > 0 and self.bottom[match] > 0 and self.winner[match] == PENDING
+                and match not in self.challenge_of]
+
+    def waiting_after(self, match):
+        """Get the matches a recorded match made ready that have no challenge yet (following walkovers)."""
+        waiting = []
+        pending = [self.next_win[match], self.next_lose[match]]
+        while pending:
+            destination = pending.pop()
+            if destination == NOWHERE:
+                continue
+            target = destination // 2
+            if self.winner[target] != PENDING:
+                pending += [self.next_win[target], self.next_lose[target]]
+            elif self.top[target] > 0 and self.bottom[target] > 0 and target not in self.challenge_of:
+                waiting.append(target)
+        return waiting
+
+    def detach(self, challenge_id):
+        """Unlink a deleted challenge from its match (the match goes back to unscheduled)."""
+        match = self.match_of.pop(challenge_id, None)
+        if match is not None:
+            del self.challenge_of[match]
+
+    def round_matches(self, index):
+        """Get ``(match, top, bottom, winner)`` for every match of a round."""
+        _, start, stop = self.rounds[index]
+        return [(match, self.top[match], self.bottom[match], self.winner[match]) for match in range(start, stop)]
+
+    def champion(self):
+        """Get the winner of the bracket, or ``None`` while it is still running."""
+        # La finale (o la finalissima) è sempre l'ultimo incontro
+        winner = self.winner[len(self.top) - 1]
+        return winner if winner > 0 else None
@@ -0,0 +1,61 @@
+"""Event-invalidated memoisation for derived views.
+
+A view (a DataFrame, a list of selectbox options) is cached together with
+the entity kinds it is built from and the tournament it shows (``None``
+for views across tournaments). The cache subscribes to the store's change
+events and drops only the views an event touches: a result recorded in
+one tournament leaves the rankings of the others cached. Entries are
+evicted least recently used first.
+"""
+import threading
+from collections import OrderedDict
+
+from utils.events import touches
+
+
+class ViewCache:
+    """Bounded LRU cache of views, invalidated by change events."""
+
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        # Viste scartate dagli eventi: se cresce, la pagina mostrata è vecchia
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, kinds, tournament_id, builder):
+        """Return the view for ``key``, building it if it isn't cached."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+
+        value = builder()
+        with self._lock:
+            self._entries[key] = (kinds, tournament_id, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def notify(self, event):
+        """Drop the views a change event touches."""
+        with self._lock:
+            stale = [key for key, (kinds, tournament_id, _) in self._entries.items()
+                     if touches(event, kinds, tournament_id)]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        """Drop every cached view."""
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,55 @@
+"""Two-way index of tournament enrollments.
+
+Athlete records keep their ``tournaments`` list (in enrollment order, as
+the pages and the database expect it). ``EnrollmentIndex`` mirrors it as
+sets in both directions, so membership tests and counts are O(1) and a
+tournament's roster or an athlete's tournaments come without a scan.
+"""
+
+
+class EnrollmentIndex:
+    """Athlete -> tournaments and tournament -> athletes, as sets."""
+
+    def __init__(self):
+        self._tournaments_of = {}
+        self._roster = {}
+
+    def enroll(self, athlete_id, tournament_id):
+        """Record that an athlete is enrolled in a tournament."""
+        self._tournaments_of.setdefault(athlete_id, set()).add(tournament_id)
+        self._roster.setdefault(tournament_id, set()).add(athlete_id)
+
+    def withdraw(self, athlete_id, tournament_id):
+        """Forget one enrollment."""
+        self._tournaments_of.get(athlete_id, set()).discard(tournament_id)
+        self._roster.get(tournament_id, set()).discard(athlete_id)
+
+    def is_enrolled(self, athlete_id, tournament_id):
+        """Tell whether an athlete is enrolled in a tournament."""
+        return athlete_id in self._roster.get(tournament_id, ())
+
+    def tournaments_of(self, athlete_id):
+        """Get the ids of the tournaments an athlete is enrolled in."""
+        return frozenset(self._tournaments_of.get(athlete_id, ()))
+
+    def roster(self, tournament_id):
+        """Get the ids of the athletes enrolled in a tournament."""
+        return frozenset(self._roster.get(tournament_id, ()))
+
+    def count(self, tournament_id):
+        """Count the athletes enrolled in a tournament."""
+        return len(self._roster.get(tournament_id, ()))
+
+    def remove_athlete(self, athlete_id):
+        """Drop every enrollment of an athlete and return their tournaments."""
+        tournaments = self._tournaments_of.pop(athlete_id, set())
+        for tournament_id in tournaments:
+            self._roster[tournament_id].discard(athlete_id)
+        return tournaments
+
+    def remove_tournament(self, tournament_id):
+        """Drop every enrollment in a tournament and return its roster."""
+        roster = self._roster.pop(tournament_id, set())
+        for athlete_id in roster:
+            self._tournaments_of[athlete_id].discard(tournament_id)
+        return roster
@@ -0,0 +1,596 @@
+"""Write-ahead event log backend for the tournament store.
+
+``EventLogRepository`` makes the store durable without a database. Its
+tables are plain dicts of tuples laid out like the SQLite rows. Every
+write is applied to them and appended to a log as one compact record: an
+operation code followed by plain values. The records of one transaction
+go to the file as one frame, with its length and a CRC32.
+
+A write returns as soon as its frame is in the OS cache. A background
+thread fsyncs the log every ``sync_interval`` seconds, so the writes of
+one interval share a single fsync (group commit). If the process crashes
+nothing is lost; a power loss costs at most the last interval, like
+SQLite with ``synchronous = NORMAL``. With ``sync_interval=0`` every frame
+is fsynced before the write returns.
+
+The records of a transaction are buffered and logged together when it
+ends. If it ends with an exception nothing is logged, and the tables are
+rebuilt from the files so the writes already applied are undone.
+
+Once a log segment passes ``snapshot_bytes``, a new segment starts and a
+copy of the tables is pickled to a binary snapshot by a background
+thread. The older segments and snapshots are then deleted, so the log
+stays bounded. At startup the latest snapshot is loaded and the segments
+after it are replayed. A frame torn by a crash in the middle of a write
+is cut off the last segment.
+
+The log belongs to a single process. Several Streamlit processes must
+share a SQLite database instead.
+"""
+import contextlib
+import os
+import pickle
+import re
+import struct
+import threading
+import zlib
+
+from utils.repository import Repository, athlete_from_row, challenge_from_row, tournament_from_row
+
+# Intestazione di ogni frame: lunghezza del contenuto e CRC32
+FRAME = struct.Struct("<II")
+
+SNAPSHOT_FORMAT = 1
+
+FILE_NAME = re.compile(r"^(log|snapshot)-(\d{12})\.bin$")
+
+# Codici delle operazioni registrate nel log
+(SAVE_ATHLETE, DELETE_ATHLETES, SAVE_CHALLENGES, RECORD_RESULT, DELETE_CHALLENGE, SAVE_TOURNAMENT,
+ DELETE_TOURNAMENT, SAVE_SPECIALTY, SAVE_BRACKET, SAVE_BRACKET_MATCHES, DELETE_BRACKET, SAVE_SWISS_ROUND,
+ SAVE_RATING_PARAMETERS) = range(13)
+
+
+def athlete_row(athlete):
+    """Pack an athlete record as a tuple (the layout ``athlete_from_row`` reads)."""
+    return (athlete["id"], athlete["name"], athlete.get("nickname"), athlete["email"], athlete["password"],
+            athlete["level"], athlete.get("profile_img"), athlete["version"], tuple(athlete["tournaments"]))
+
+
+def challenge_row(challenge):
+    """Pack a challenge record as a tuple (the layout ``challenge_from_row`` reads)."""
+    return (challenge["id"], challenge["challenger_id"], challenge["opponent_id"], challenge["date"],
+            challenge["specialty_id"], challenge["winner_id"], challenge["tournament_id"], challenge["version"])
+
+
+class EventLogRepository(Repository):
+    """Repository kept in memory and made durable by a write-ahead log with snapshots."""
+
+    def __init__(self, directory, snapshot_bytes=64 * 1024 * 1024, sync_interval=0.05):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.snapshot_bytes = snapshot_bytes
+        self.sync_interval = sync_interval
+
+        self._lock = threading.RLock()
+        self._fd = None
+        self._snapshotter = None
+        self._depth = 0
+        self._batch = []
+        self._dirty = False
+        self._handlers = {
+            SAVE_ATHLETE: self._apply_save_athlete,
+            DELETE_ATHLETES: self._apply_delete_athletes,
+            SAVE_CHALLENGES: self._apply_save_challenges,
+            RECORD_RESULT: self._apply_record_result,
+            DELETE_CHALLENGE: self._apply_delete_challenge,
+            SAVE_TOURNAMENT: self._apply_save_tournament,
+            DELETE_TOURNAMENT: self._apply_delete_tournament,
+            SAVE_SPECIALTY: self._apply_save_specialty,
+            SAVE_BRACKET: self._apply_save_bracket,
+            SAVE_BRACKET_MATCHES: self._apply_save_bracket_matches,
+            DELETE_BRACKET: self._apply_delete_bracket,
+            SAVE_SWISS_ROUND: self._apply_save_swiss_round,
+            SAVE_RATING_PARAMETERS: self._apply_save_rating_parameters,
+        }
+
+        self._recover()
+
+        self._closed = threading.Event()
+        self._syncer = None
+        if sync_interval > 0:
+            self._syncer = threading.Thread(target=self._sync_loop, name="eventlog-sync", daemon=True)
+            self._syncer.start()
+
+    # --- Files -----------------------------------------------------------
+
+    def _path(self, kind, number):
+        return os.path.join(self.directory, f"{kind}-{number:012d}.bin")
+
+    def _files(self, kind):
+        """Get the numbers of the snapshots or log segments on disk, in order."""
+        return sorted(int(match.group(2)) for match in map(FILE_NAME.match, os.listdir(self.directory))
+                      if match and match.group(1) == kind)
+
+    def _sync_directory(self):
+        """Make renames and new files in the directory durable."""
+        fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _open_segment(self, number):
+        """Start appending to a log segment, closing the previous one."""
+        if self._fd is not None:
+            os.fsync(self._fd)
+            os.close(self._fd)
+        self._segment = number
+        self._fd = os.open(self._path("log", number), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._segment_bytes = os.fstat(self._fd).st_size
+        self._sync_directory()
+
+    # --- Recovery --------------------------------------------------------
+
+    def _clear(self):
+        """Start from empty tables."""
+        self.athletes = {}
+        self.challenges = {}
+        self.tournaments = {}
+        self.specialties = {}
+        self.brackets = {}
+        self.bracket_matches = {}
+        self.swiss_rounds = {}
+        self.rating_parameters = None
+        self.sequences = {"athletes": 0, "challenges": 0, "tournaments": 0, "specialties": 0}
+        # athlete id -> id delle sue sfide, costruito alla prima eliminazione di atleti
+        self.challenges_of = None
+
+    def _recover(self):
+        """Load the latest snapshot and replay the log segments written after it."""
+        self._clear()
+        base = 0
+        for number in reversed(self._files("snapshot")):
+            try:
+                with open(self._path("snapshot", number), "rb") as f:
+                    tables = pickle.load(f)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                # Snapshot illeggibile: si riparte da quello precedente
+                continue
+            if tables.get("format") == SNAPSHOT_FORMAT:
+                self._restore(tables)
+                base = number
+                break
+
+        segments = [number for number in self._files("log") if number >= base]
+        for number in segments:
+            self._replay(number, last=number == segments[-1])
+        self._open_segment(segments[-1] if segments else base)
+
+    def _replay(self, number, last):
+        """Apply every frame of a log segment; a torn frame is only allowed at the end of the last one."""
+        path = self._path("log", number)
+        with open(path, "rb") as f:
+            data = memoryview(f.read())
+
+        handlers = self._handlers
+        offset = 0
+        while offset + FRAME.size <= len(data):
+            length, crc = FRAME.unpack_from(data, offset)
+            start = offset + FRAME.size
+            payload = data[start:start + length]
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                break
+            for record in pickle.loads(payload):
+                handlers[record[0]](record)
+            offset = start + length
+
+        if offset < len(data):
+            if not last:
+                raise ValueError(f"Log corrotto: frame non valido in {path} all'offset {offset}")
+            # Scrittura interrotta da un crash: la coda viene scartata
+            with open(path, "r+b") as f:
+                f.truncate(offset)
+
+    def _restore(self, tables):
+        for name in ("athletes", "challenges", "tournaments", "specialties", "brackets", "bracket_matches",
+                     "swiss_rounds", "sequences"):
+            setattr(self, name, tables[name])
+        # Assenti negli snapshot scritti prima dei parametri del rating
+        self.rating_parameters = tables.get("rating_parameters")
+
+    # --- Writing ---------------------------------------------------------
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Group several writes into one frame (nesting is allowed).
+
+        Writes are applied to the tables as they come and logged when the
+        outermost transaction ends. If it ends with an exception nothing is
+        logged and the tables go back to what the files hold.
+        """
+        with self._lock:
+            self._depth += 1
+            try:
+                yield
+            except BaseException:
+                self._depth -= 1
+                if self._depth == 0:
+                    batch, self._batch = self._batch, []
+                    if batch:
+                        self._rollback()
+                raise
+            else:
+                self._depth -= 1
+                if self._depth == 0 and self._batch:
+                    batch, self._batch = self._batch, []
+                    self._append(batch)
+
+    def _rollback(self):
+        """Undo the writes of a failed transaction by recovering the tables from the files."""
+        # Lo snapshot in corso cancella i file vecchi: si aspetta che finisca
+        if self._snapshotter is not None:
+            self._snapshotter.join()
+        self._recover()
+
+    def _write(self, record):
+        """Apply a record to the tables and log it with the current transaction."""
+        with self.transaction():
+            self._handlers[record[0]](record)
+            self._batch.append(record)
+
+    def _append(self, records):
+        """Append one frame to the log, then take a snapshot if the segment grew too large."""
+        payload = pickle.dumps(records, pickle.HIGHEST_PROTOCOL)
+        frame = memoryview(FRAME.pack(len(payload), zlib.crc32(payload)) + payload)
+        while frame:
+            frame = frame[os.write(self._fd, frame):]
+        self._segment_bytes += FRAME.size + len(payload)
+
+        if self.sync_interval > 0:
+            self._dirty = True
+        else:
+            os.fsync(self._fd)
+
+        if self._segment_bytes >= self.snapshot_bytes and self._snapshotter is None:
+            number, tables = self._capture()
+            self._snapshotter = threading.Thread(target=self._snapshot_in_background, args=(number, tables),
+                                                 name="eventlog-snapshot", daemon=True)
+            self._snapshotter.start()
+
+    def sync(self):
+        """Flush the log to disk now."""
+        with self._lock:
+            if not self._dirty:
+                return
+            self._dirty = False
+            fd = self._fd
+        try:
+            os.fsync(fd)
+        except OSError:
+            # Segmento già chiuso (e sincronizzato) da uno snapshot
+            pass
+
+    def _sync_loop(self):
+        while not self._closed.wait(self.sync_interval):
+            self.sync()
+
+    def snapshot(self):
+        """Write the tables to a binary snapshot, start a new log segment and drop the older files."""
+        # Uno alla volta: entrambi cancellano i file vecchi
+        if self._snapshotter is not None:
+            self._snapshotter.join()
+        number, tables = self._capture()
+        self._write_snapshot(number, tables)
+        return number
+
+    def _capture(self):
+        """Copy the tables and start the log segment that follows them.
+
+        Records are immutable tuples, so copying the dicts that hold them
+        is enough; the copy is pickled without the lock.
+        """
+        with self._lock:
+            number = self._segment + 1
+            tables = {name: dict(getattr(self, name)) for name in (
+                "athletes", "challenges", "tournaments", "specialties", "brackets", "sequences")}
+            for name in ("bracket_matches", "swiss_rounds"):
+                tables[name] = {key: dict(value) for key, value in getattr(self, name).items()}
+            tables["rating_parameters"] = self.rating_parameters
+            tables["format"] = SNAPSHOT_FORMAT
+            self._open_segment(number)
+            self._dirty = False
+            return number, tables
+
+    def _write_snapshot(self, number, tables):
+        """Pickle a copy of the tables, then drop the files it replaces."""
+        path = self._path("snapshot", number)
+        with open(path + ".tmp", "wb") as f:
+            pickle.dump(tables, f, pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+        self._sync_directory()
+
+        # Lo snapshot contiene tutto quello che i file precedenti registravano
+        for kind in ("log", "snapshot"):
+            for old in self._files(kind):
+                if old < number:
+                    os.remove(self._path(kind, old))
+
+    def _snapshot_in_background(self, number, tables):
+        try:
+            self._write_snapshot(number, tables)
+        finally:
+            self._snapshotter = None
+
+    # --- Applying records ------------------------------------------------
+
+    def _advance(self, kind, record_id):
+        if record_id > self.sequences[kind]:
+            self.sequences[kind] = record_id
+
+    def _apply_save_athlete(self, record):
+        athlete = record[1]
+        self.athletes[athlete[0]] = athlete
+        self._advance("athletes", athlete[0])
+
+    def _challenge_index(self):
+        """Get the challenge ids of every athlete, building the index the first time."""
+        if self.challenges_of is None:
+            self.challenges_of = {}
+            for challenge in self.challenges.values():
+                self._index_challenge(challenge)
+        return self.challenges_of
+
+    def _index_challenge(self, challenge):
+        for athlete_id in (challenge[1], challenge[2]):
+            self.challenges_of.setdefault(athlete_id, set()).add(challenge[0])
+
+    def _unindex_challenge(self, challenge):
+        for athlete_id in (challenge[1], challenge[2]):
+            self.challenges_of.get(athlete_id, set()).discard(challenge[0])
+
+    def _drop_challenge(self, challenge_id):
+        """Remove a challenge with its index entries and bracket link."""
+        c = self.challenges.pop(challenge_id, None)
+        if c is None:
+            return
+        if self.challenges_of is not None:
+            self._unindex_challenge(c)
+        self.bracket_matches.get(c[6], {}).pop(challenge_id, None)
+
+    def _apply_delete_athletes(self, record):
+        index = self._challenge_index()
+        for athlete_id in record[1]:
+            self.athletes.pop(athlete_id, None)
+            for challenge_id in index.pop(athlete_id, ()):
+                self._drop_challenge(challenge_id)
+
+    def _apply_save_challenges(self, record):
+        for challenge in record[1]:
+            if self.challenges_of is not None:
+                # Una sfida salvata di nuovo può aver cambiato atleti
+                old = self.challenges.get(challenge[0])
+                if old is not None:
+                    self._unindex_challenge(old)
+                self._index_challenge(challenge)
+            self.challenges[challenge[0]] = challenge
+            self._advance("challenges", challenge[0])
+
+    def _apply_record_result(self, record):
+        _, challenge_id, winner_id = record
+        c = self.challenges[challenge_id]
+        self.challenges[challenge_id] = c[:5] + (winner_id, c[6], c[7] + 1)
+        a = self.athletes[winner_id]
+        self.athletes[winner_id] = a[:5] + (a[5] + 1, a[6], a[7] + 1, a[8])
+
+    def _apply_delete_challenge(self, record):
+        self._drop_challenge(record[1])
+
+    def _apply_save_tournament(self, record):
+        tournament = record[1]
+        self.tournaments[tournament[0]] = tournament
+        self._advance("tournaments", tournament[0])
+
+    def _apply_delete_tournament(self, record):
+        tournament_id = record[1]
+        self.brackets.pop(tournament_id, None)
+        self.bracket_matches.pop(tournament_id, None)
+        self.swiss_rounds.pop(tournament_id, None)
+        for challenge_id in [c[0] for c in self.challenges.values() if c[6] == tournament_id]:
+            self._drop_challenge(challenge_id)
+        for a in [a for a in self.athletes.values() if tournament_id in a[8]]:
+            self.athletes[a[0]] = a[:8] + (tuple(t for t in a[8] if t != tournament_id),)
+        self.tournaments.pop(tournament_id, None)
+
+    def _apply_save_specialty(self, record):
+        specialty = record[1]
+        self.specialties[specialty[0]] = specialty
+        self._advance("specialties", specialty[0])
+
+    def _apply_save_bracket(self, record):
+        _, tournament_id, double, specialty_id, seeds = record
+        self.brackets[tournament_id] = (double, specialty_id, seeds)
+
+    def _apply_save_bracket_matches(self, record):
+        self.bracket_matches.setdefault(record[1], {}).update(record[2])
+
+    def _apply_delete_bracket(self, record):
+        self.brackets.pop(record[1], None)
+        self.bracket_matches.pop(record[1], None)
+
+    def _apply_save_swiss_round(self, record):
+        _, tournament_id, round_number, bye_id = record
+        self.swiss_rounds.setdefault(tournament_id, {})[round_number] = bye_id
+
+    def _apply_save_rating_parameters(self, record):
+        self.rating_parameters = record[1:]
+
+    # --- Repository ------------------------------------------------------
+
+    def is_empty(self):
+        """Tell whether the log holds any tournament."""
+        return not self.tournaments
+
+    def load(self, store):
+        """Fill a store with the recovered records."""
+        with self._lock:
+            for row in sorted(self.tournaments.values()):
+                store.add_tournament(tournament_from_row(row))
+
+            for row in sorted(self.specialties.values()):
+                store.add_specialty({"id": row[0], "name": row[1]})
+
+            # Gli ID crescono sempre, quindi l'ordine di inserimento è quello degli ID
+            store.add_athletes([athlete_from_row(row, list(row[8])) for row in self.athletes.values()])
+            store.add_challenges([challenge_from_row(row) for row in self.challenges.values()])
+
+            for tournament_id, (double, specialty_id, seeds) in self.brackets.items():
+                store.restore_bracket(tournament_id, list(seeds), double, specialty_id,
+                                      sorted(self.bracket_matches.get(tournament_id, {}).items()))
+
+            for tournament_id, rounds in self.swiss_rounds.items():
+                for round_number in sorted(rounds):
+                    store.add_swiss_round(tournament_id, rounds[round_number])
+
+            if self.rating_parameters is not None:
+                store.set_rating_parameters(*self.rating_parameters)
+
+            for kind, seq in self.sequences.items():
+                store._advance_sequence(kind, seq)
+
+    def save_athlete(self, athlete):
+        """Persist an athlete and their enrollments."""
+        self._write((SAVE_ATHLETE, athlete_row(athlete)))
+
+    def update_athlete(self, athlete, expected_version):
+        """Persist an athlete's changes if their record is still at ``expected_version``; tell whether it was."""
+        with self._lock:
+            current = self.athletes.get(athlete["id"])
+            if current is None or current[7] != expected_version:
+                return False
+            self._write((SAVE_ATHLETE, athlete_row(athlete)))
+            return True
+
+    def fetch_athlete(self, athlete_id):
+        """Read an athlete's persisted record, or ``None``."""
+        row = self.athletes.get(athlete_id)
+        return athlete_from_row(row, list(row[8])) if row is not None else None
+
+    def delete_athlete(self, athlete_id):
+        """Remove an athlete and their challenges."""
+        self.delete_athletes([athlete_id])
+
+    def delete_athletes(self, athlete_ids):
+        """Remove many athletes and their challenges with one record."""
+        self._write((DELETE_ATHLETES, tuple(athlete_ids)))
+
+    def save_challenge(self, challenge):
+        """Persist a challenge."""
+        self._write((SAVE_CHALLENGES, (challenge_row(challenge),)))
+
+    def save_challenges(self, challenges):
+        """Persist many challenges with one record."""
+        rows = tuple(map(challenge_row, challenges))
+        if rows:
+            self._write((SAVE_CHALLENGES, rows))
+
+    def record_result(self, challenge, winner):
+        """Persist a result if the challenge is still pending at its version.
+
+        Returns the winner's new ``(level, version)``, or ``None`` when the
+        record had moved on.
+        """
+        with self._lock:
+            current = self.challenges.get(challenge["id"])
+            if current is None or current[7] != challenge["version"] or current[5] is not None:
+                return None
+            self._write((RECORD_RESULT, challenge["id"], winner["id"]))
+            row = self.athletes[winner["id"]]
+            return row[5], row[7]
+
+    def fetch_challenge(self, challenge_id):
+        """Read a challenge's persisted record, or ``None``."""
+        row = self.challenges.get(challenge_id)
+        return challenge_from_row(row) if row is not None else None
+
+    def delete_challenge(self, challenge_id):
+        """Remove a challenge."""
+        self._write((DELETE_CHALLENGE, challenge_id))
+
+    def save_tournament(self, tournament):
+        """Persist a tournament."""
+        self._write((SAVE_TOURNAMENT, (tournament["id"], tournament["name"], tournament["registration_open"],
+                                       tournament["start_date"], tournament["end_date"])))
+
+    def fetch_tournament(self, tournament_id):
+        """Read a tournament's persisted record, or ``None``."""
+        row = self.tournaments.get(tournament_id)
+        return tournament_from_row(row) if row is not None else None
+
+    def delete_tournament(self, tournament_id):
+        """Remove a tournament with its enrollments and challenges."""
+        self._write((DELETE_TOURNAMENT, tournament_id))
+
+    def save_specialty(self, specialty):
+        """Persist a specialty."""
+        self._write((SAVE_SPECIALTY, (specialty["id"], specialty["name"])))
+
+    def fetch_specialty(self, specialty_id):
+        """Read a specialty's persisted record, or ``None``."""
+        row = self.specialties.get(specialty_id)
+        return {"id": row[0], "name": row[1]} if row is not None else None
+
+    def save_bracket(self, tournament_id, bracket):
+        """Persist a tournament's bracket (format, specialty and seeds)."""
+        self._write((SAVE_BRACKET, tournament_id, bracket.double, bracket.specialty_id, tuple(bracket.seeds)))
+
+    def fetch_bracket(self, tournament_id):
+        """Read a persisted bracket as ``(seeds, double, specialty_id, links)``, or ``None``."""
+        with self._lock:
+            bracket = self.brackets.get(tournament_id)
+            if bracket is None:
+                return None
+            double, specialty_id, seeds = bracket
+            return list(seeds), double, specialty_id, sorted(self.bracket_matches.get(tournament_id, {}).items())
+
+    def save_bracket_matches(self, tournament_id, links):
+        """Persist ``(challenge_id, match)`` links of a bracket."""
+        links = tuple(links)
+        if links:
+            self._write((SAVE_BRACKET_MATCHES, tournament_id, links))
+
+    def delete_bracket(self, tournament_id):
+        """Remove a tournament's bracket (its challenges stay)."""
+        self._write((DELETE_BRACKET, tournament_id))
+
+    def save_swiss_round(self, tournament_id, round_number, bye_id):
+        """Persist a Swiss round and the athlete resting in it."""
+        self._write((SAVE_SWISS_ROUND, tournament_id, round_number, bye_id))
+
+    def fetch_swiss_rounds(self, tournament_id):
+        """Read the bye of every persisted Swiss round of a tournament, in order."""
+        with self._lock:
+            rounds = self.swiss_rounds.get(tournament_id, {})
+            return [rounds[round_number] for round_number in sorted(rounds)]
+
+    def save_rating_parameters(self, k, initial):
+        """Persist the Elo parameters (K factor and initial rating)."""
+        self._write((SAVE_RATING_PARAMETERS, k, initial))
+
+    def fetch_rating_parameters(self):
+        """Read the persisted Elo parameters as ``(k, initial)``, or ``None``."""
+        return self.rating_parameters
+
+    def close(self):
+        """Finish the snapshot in progress, flush the log and close it."""
+        if self._snapshotter is not None:
+            self._snapshotter.join()
+        with self._lock:
+            self._closed.set()
+            if self._fd is not None:
+                os.fsync(self._fd)
+                os.close(self._fd)
+                self._fd = None
+        if self._syncer is not None:
+            self._syncer.join()
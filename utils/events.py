@@ -0,0 +1,121 @@
+"""Change notifications for the shared tournament store.
+
+After each write the store publishes one ``ChangeEvent`` on its
+``EventBus``: the name of the store method that ran, the set of
+``(kind, tournament_id)`` pairs it changed, where ``tournament_id`` is
+``None`` when the change isn't limited to one tournament, and the
+``(kind, id)`` of the records it wrote (``None`` when there were too many
+to list). The view cache shared by the sessions subscribes and drops only
+the views the event touches.
+
+``FileChannel`` carries the events between the Streamlit processes of one
+host through an append-only file. Lines are short enough that an
+``O_APPEND`` write lands whole. A process that reads another process's
+event re-reads the records it lists from the shared database, or
+reloads everything when the event doesn't list them.
+"""
+import json
+import os
+import threading
+import uuid
+import weakref
+from collections import namedtuple
+
+ChangeEvent = namedtuple("ChangeEvent", ["action", "changes", "origin", "records"], defaults=(None,))
+
+# Identifica gli eventi di questo processo nel canale condiviso
+PROCESS_ORIGIN = uuid.uuid4().hex
+
+
+def touches(event, kinds, tournament_id=None):
+    """Tell whether an event changed data a view of ``kinds`` (for one tournament, or all) depends on."""
+    return any(kind in kinds and (changed is None or tournament_id is None or changed == tournament_id)
+               for kind, changed in event.changes)
+
+
+class EventBus:
+    """In-process publish/subscribe for change events.
+
+    Subscribers are objects with a ``notify(event)`` method, held weakly so
+    a subscriber goes away once nothing else uses it.
+    """
+
+    def __init__(self):
+        self._subscribers = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._subscribers)
+
+    def subscribe(self, subscriber):
+        """Deliver every future event to ``subscriber.notify``."""
+        with self._lock:
+            self._subscribers.add(subscriber)
+
+    def unsubscribe(self, subscriber):
+        """Stop delivering events to a subscriber."""
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, event):
+        """Deliver an event to every subscriber, on the caller's thread."""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.notify(event)
+
+
+class FileChannel:
+    """Change events shared by the processes of one host through an append-only file."""
+
+    def __init__(self, path, origin=PROCESS_ORIGIN):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.origin = origin
+        # Solo gli eventi scritti da ora in poi
+        self._offset = os.path.getsize(path) if os.path.exists(path) else 0
+
+    def write(self, event):
+        """Append an event for the other processes."""
+        records = None if event.records is None else sorted(event.records, key=repr)
+        line = json.dumps({"origin": self.origin, "action": event.action,
+                           "changes": sorted(event.changes, key=repr), "records": records}) + "\n"
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line.encode())
+        finally:
+            os.close(fd)
+
+    def pending(self):
+        """Tell whether the file grew since the last poll (one ``stat``)."""
+        try:
+            return os.path.getsize(self.path) != self._offset
+        except OSError:
+            return False
+
+    def poll(self):
+        """Read the events appended since the last poll, skipping this process's own."""
+        try:
+            with open(self.path, "rb") as f:
+                if os.fstat(f.fileno()).st_size < self._offset:
+                    # File ricreato: si riparte dall'inizio
+                    self._offset = 0
+                f.seek(self._offset)
+                data = f.read()
+        except OSError:
+            return []
+
+        # Una riga incompleta viene riletta al prossimo giro
+        end = data.rfind(b"\n") + 1
+        self._offset += end
+
+        events = []
+        for line in data[:end].splitlines():
+            record = json.loads(line)
+            if record["origin"] != self.origin:
+                records = record.get("records")
+                events.append(ChangeEvent(record["action"],
+                                          frozenset((kind, tournament_id) for kind, tournament_id in record["changes"]),
+                                          record["origin"],
+                                          None if records is None else frozenset(map(tuple, records))))
+        return events
@@ -0,0 +1,102 @@
+"""Reader-writer lock for the store shared by every Streamlit session.
+
+Streamlit runs each session's script on its own thread. ``RWLock`` lets
+any number of them read at once while a write runs alone. Waiting writers
+block new readers, so a steady stream of page renders can't starve a
+write. Both sides are reentrant on the same thread: store methods call
+each other, and a thread holding the write lock may also read. A read
+can't be upgraded to a write.
+
+Objects whose methods use ``writes`` may define ``_after_write(name)``: it
+runs at the end of the outermost write, still under the lock, with the
+name of the method that took it.
+"""
+import contextlib
+import functools
+import threading
+
+
+class RWLock:
+    """Many readers or one writer, preferring writers."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = None
+        self._waiting_writers = 0
+        self._local = threading.local()
+
+    @contextlib.contextmanager
+    def read(self):
+        """Hold the lock for reading."""
+        depth = getattr(self._local, "reads", 0)
+        if depth or self._writer == threading.get_ident():
+            # Già dentro una lettura o una scrittura di questo thread
+            self._local.reads = depth + 1
+            try:
+                yield
+            finally:
+                self._local.reads = depth
+            return
+
+        with self._cond:
+            while self._writer is not None or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+        self._local.reads = 1
+        try:
+            yield
+        finally:
+            self._local.reads = 0
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextlib.contextmanager
+    def write(self):
+        """Hold the lock for writing; yields whether this is the outermost write."""
+        me = threading.get_ident()
+        if self._writer == me:
+            yield False
+            return
+
+        if getattr(self._local, "reads", 0):
+            raise RuntimeError("Cannot write while holding the read lock")
+
+        with self._cond:
+            self._waiting_writers += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._cond.wait()
+            finally:
+                self._waiting_writers -= 1
+            self._writer = me
+        try:
+            yield True
+        finally:
+            with self._cond:
+                self._writer = None
+                self._cond.notify_all()
+
+
+def reads(method):
+    """Run a method of an object with a ``lock`` under its read lock."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock.read():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def writes(method):
+    """Run a method of an object with a ``lock`` under its write lock."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock.write() as outermost:
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                if outermost and hasattr(self, "_after_write"):
+                    self._after_write(method.__name__)
+    return wrapper
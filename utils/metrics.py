@@ -0,0 +1,180 @@
+"""In-process metrics for page renders and data helpers.
+
+``timed`` wraps a function and records its call count and latency in a
+fixed-bucket histogram, plus the rows it returned when the result is a
+list or a DataFrame. Rows returned, not rows scanned: the helpers read
+indexes rather than scanning tables, so the result size is what can be
+counted for free at the decorator. Reruns and user actions are plain counters. Everything
+lives in the process-wide ``METRICS`` registry, costs a couple of clock
+reads and a lock per call, and can be written out in the Prometheus text
+format.
+"""
+import bisect
+import functools
+import os
+import tempfile
+import threading
+import time
+
+# Limiti superiori dei bucket di latenza, in secondi
+LATENCY_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025,
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+class Histogram:
+    """Latency histogram with fixed bucket bounds."""
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Estimate a quantile, interpolating inside the bucket that holds it."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                low = self.bounds[i - 1] if i > 0 else 0.0
+                high = self.bounds[i] if i < len(self.bounds) else self.bounds[-1]
+                return low + (high - low) * (rank - seen) / count
+            seen += count
+        return self.bounds[-1]
+
+
+class MetricsRegistry:
+    """Call counts, latencies, rows and counters, safe to share between sessions."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.rows_returned = {}
+        self.counters = {}
+
+    def observe(self, kind, name, seconds, rows=None):
+        """Record one call of a page or helper."""
+        key = (kind, name)
+        with self._lock:
+            histogram = self.latencies.get(key)
+            if histogram is None:
+                histogram = self.latencies[key] = Histogram()
+            histogram.observe(seconds)
+            if rows is not None:
+                self.rows_returned[key] = self.rows_returned.get(key, 0) + rows
+
+    def increment(self, name, label, amount=1):
+        """Add to a labelled counter."""
+        key = (name, label)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def counter(self, name, label):
+        return self.counters.get((name, label), 0)
+
+    def summary(self, kind):
+        """Get call count and p50/p95/p99 latencies (in ms) of every function of a kind."""
+        with self._lock:
+            items = [(name, histogram, self.rows_returned.get((k, name)))
+                     for (k, name), histogram in self.latencies.items() if k == kind]
+
+        return [{
+            "name": name,
+            "calls": histogram.count,
+            "p50_ms": histogram.quantile(0.5) * 1000,
+            "p95_ms": histogram.quantile(0.95) * 1000,
+            "p99_ms": histogram.quantile(0.99) * 1000,
+            "mean_ms": histogram.sum / histogram.count * 1000,
+            "rows_returned": rows
+        } for name, histogram, rows in sorted(items, key=lambda item: -item[1].sum)]
+
+    def to_prometheus(self, prefix="torneo"):
+        """Render every metric in the Prometheus text exposition format."""
+        with self._lock:
+            latencies = sorted(self.latencies.items())
+            rows = sorted(self.rows_returned.items())
+            counters = sorted(self.counters.items())
+
+        lines = [
+            f"# HELP {prefix}_call_duration_seconds Latency of page renders and data helpers.",
+            f"# TYPE {prefix}_call_duration_seconds histogram",
+        ]
+        for (kind, name), histogram in latencies:
+            labels = f'kind="{kind}",name="{name}"'
+            cumulative = 0
+            for bound, count in zip(histogram.bounds, histogram.counts):
+                cumulative += count
+                lines.append(f'{prefix}_call_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{prefix}_call_duration_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+            lines.append(f"{prefix}_call_duration_seconds_sum{{{labels}}} {histogram.sum}")
+            lines.append(f"{prefix}_call_duration_seconds_count{{{labels}}} {histogram.count}")
+
+        lines.append(f"# HELP {prefix}_rows_returned_total Rows returned by data helpers.")
+        lines.append(f"# TYPE {prefix}_rows_returned_total counter")
+        for (kind, name), total in rows:
+            lines.append(f'{prefix}_rows_returned_total{{kind="{kind}",name="{name}"}} {total}')
+
+        for counter_name in sorted({name for name, _ in counters}):
+            lines.append(f"# TYPE {prefix}_{counter_name}_total counter")
+            for (name, label), total in counters:
+                if name == counter_name:
+                    lines.append(f'{prefix}_{name}_total{{page="{label}"}} {total}')
+
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path, prefix="torneo"):
+        """Write the metrics to a text file atomically (for node_exporter's textfile collector)."""
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        with os.fdopen(fd, "w") as tmp:
+            tmp.write(self.to_prometheus(prefix))
+        os.replace(tmp_path, path)
+
+    def reset(self):
+        with self._lock:
+            self.latencies.clear()
+            self.rows_returned.clear()
+            self.counters.clear()
+
+
+METRICS = MetricsRegistry()
+
+
+def _row_count(result):
+    # Solo liste e DataFrame contano come righe; le tuple sono (esito, messaggio)
+    if isinstance(result, list):
+        return len(result)
+    if hasattr(result, "shape"):
+        return result.shape[0]
+    return None
+
+
+def timed(kind, registry=METRICS):
+    """Decorator recording the latency and returned rows of every call."""
+    def decorator(func):
+        name = func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except BaseException:
+                # Anche st.rerun/st.stop passano da qui: si conta la durata
+                registry.observe(kind, name, time.perf_counter() - start)
+                raise
+            registry.observe(kind, name, time.perf_counter() - start, _row_count(result))
+            return result
+
+        return wrapper
+    return decorator
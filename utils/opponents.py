@@ -0,0 +1,89 @@
+"""Level-ordered athlete index for opponent selection.
+
+Athletes are kept sorted by ``(level, name, id)``, so everyone an athlete
+may challenge (equal or higher level) is the tail of the list from one
+bisect, already in display order.
+"""
+import bisect
+
+
+class LevelIndex:
+    """Athletes ordered by level, then name."""
+
+    def __init__(self):
+        self._keys = []
+        self._key_by_athlete = {}
+        self._athletes = {}
+
+    def __len__(self):
+        return len(self._keys)
+
+    @staticmethod
+    def _key(athlete):
+        return (athlete["level"], athlete["name"], athlete["id"])
+
+    def add_athlete(self, athlete):
+        """Index a new athlete."""
+        key = self._key(athlete)
+        bisect.insort(self._keys, key)
+        self._key_by_athlete[athlete["id"]] = key
+        self._athletes[athlete["id"]] = athlete
+
+    def add_athletes(self, athletes):
+        """Index many new athletes, sorting once."""
+        for athlete in athletes:
+            key = self._key(athlete)
+            self._keys.append(key)
+            self._key_by_athlete[athlete["id"]] = key
+            self._athletes[athlete["id"]] = athlete
+        self._keys.sort()
+
+    def remove_athlete(self, athlete_id):
+        """Drop an athlete from the index."""
+        key = self._key_by_athlete.pop(athlete_id, None)
+        if key is None:
+            return
+        del self._keys[bisect.bisect_left(self._keys, key)]
+        del self._athletes[athlete_id]
+
+    def update_athlete(self, athlete_id):
+        """Reposition an athlete after their level or name changed."""
+        athlete = self._athletes.get(athlete_id)
+        if athlete is None or self._key(athlete) == self._key_by_athlete[athlete_id]:
+            return
+        self.remove_athlete(athlete_id)
+        self.add_athlete(athlete)
+
+    def _eligible_keys(self, athlete_id, query=""):
+        """Yield the keys of athletes with equal or higher level, in order."""
+        key = self._key_by_athlete.get(athlete_id)
+        if key is None:
+            return
+        query = query.strip().lower()
+        for i in range(bisect.bisect_left(self._keys, (key[0],)), len(self._keys)):
+            candidate = self._keys[i]
+            if candidate[2] == athlete_id:
+                continue
+            if query and query not in candidate[1].lower():
+                continue
+            yield candidate
+
+    def count_opponents(self, athlete_id, query=""):
+        """Count the athletes that ``athlete_id`` may challenge."""
+        key = self._key_by_athlete.get(athlete_id)
+        if key is None:
+            return 0
+        if not query.strip():
+            return len(self._keys) - bisect.bisect_left(self._keys, (key[0],)) - 1
+        return sum(1 for _ in self._eligible_keys(athlete_id, query))
+
+    def opponents(self, athlete_id, query="", offset=0, limit=None):
+        """Get the athletes that ``athlete_id`` may challenge, by level and name."""
+        result = []
+        for i, key in enumerate(self._eligible_keys(athlete_id, query)):
+            if i < offset:
+                continue
+            if limit is not None and len(result) >= limit:
+                break
+            result.append(self._athletes[key[2]])
+        return result
@@ -0,0 +1,123 @@
+"""Per-tournament partition of challenges and indexes.
+
+Each tournament has a ``TournamentPartition`` holding its challenges, the
+pair+date keys used to reject duplicates, a ranking and a level index over
+the athletes enrolled in it, and the dashboard counters. Rankings, opponent
+lists and statistics of one tournament, and the cascade when it is
+deleted, only ever touch that tournament's partition. Deleted challenges
+leave the ranking and the counters at once but stay tombstoned in the maps
+until ``compact``; a tombstoned pair can't collide with a new challenge,
+since one of its athletes is gone.
+"""
+from utils.adjacency import date_ordinal
+from utils.opponents import LevelIndex
+from utils.ranking import RankingIndex
+from utils.stats import ChallengeStats
+
+
+def challenge_key(athlete_id, other_id, date):
+    """Key identifying a challenge between two athletes on a date, in either direction."""
+    if athlete_id > other_id:
+        athlete_id, other_id = other_id, athlete_id
+    return athlete_id, other_id, date
+
+
+class TournamentPartition:
+    """Challenges, ranking, level index and counters of one tournament."""
+
+    def __init__(self, tournament_id):
+        self.tournament_id = tournament_id
+        self.challenges = {}
+        self.challenge_keys = set()
+        # Sfide eliminate ancora nelle mappe, fino a ``compact``
+        self.dead = set()
+        self.rankings = RankingIndex()
+        self.levels = LevelIndex()
+        self.stats = ChallengeStats()
+
+    def __len__(self):
+        return len(self.levels)
+
+    def add_athlete(self, athlete, challenges=()):
+        """Enroll an athlete, counting the results they already have here."""
+        victories = completed = 0
+        for challenge in challenges:
+            if challenge["winner_id"] is not None:
+                completed += 1
+                if challenge["winner_id"] == athlete["id"]:
+                    victories += 1
+        self.rankings.add_athlete(athlete, victories, completed)
+        self.levels.add_athlete(athlete)
+
+    def add_athletes(self, athletes):
+        """Enroll many athletes, counting their results here in one pass and sorting the indexes once."""
+        enrolled = {athlete["id"] for athlete in athletes}
+        victories = {}
+        completed = {}
+        if self.challenges:
+            for challenge in self.live_challenges():
+                if challenge["winner_id"] is None:
+                    continue
+                for athlete_id in (challenge["challenger_id"], challenge["opponent_id"]):
+                    if athlete_id in enrolled:
+                        completed[athlete_id] = completed.get(athlete_id, 0) + 1
+                if challenge["winner_id"] in enrolled:
+                    victories[challenge["winner_id"]] = victories.get(challenge["winner_id"], 0) + 1
+        self.rankings.add_athletes(athletes, victories, completed)
+        self.levels.add_athletes(athletes)
+
+    def remove_athlete(self, athlete_id):
+        """Withdraw an athlete (their challenges stay in the partition)."""
+        self.rankings.remove_athlete(athlete_id)
+        self.levels.remove_athlete(athlete_id)
+
+    def update_athlete(self, athlete_id):
+        """Reposition an athlete after their level or name changed."""
+        self.rankings.update_athlete(athlete_id)
+        self.levels.update_athlete(athlete_id)
+
+    def add_challenge(self, challenge, ordinal):
+        """Add a challenge to the tournament."""
+        self.challenges[challenge["id"]] = challenge
+        self.challenge_keys.add(challenge_key(challenge["challenger_id"], challenge["opponent_id"], challenge["date"]))
+        self.rankings.add_result(challenge)
+        self.stats.add(challenge, ordinal)
+
+    def add_challenges(self, challenges):
+        """Add many challenges to the tournament, re-sorting the ranking once."""
+        for challenge in challenges:
+            self.challenges[challenge["id"]] = challenge
+            self.challenge_keys.add(challenge_key(challenge["challenger_id"], challenge["opponent_id"], challenge["date"]))
+        self.stats.add_many(challenges, [date_ordinal(challenge["date"]) for challenge in challenges])
+        self.rankings.add_results(challenges)
+
+    def discard_challenges(self, challenges):
+        """Tombstone many challenges: out of the ranking and counters now, out of the maps at ``compact``."""
+        for challenge in challenges:
+            self.dead.add(challenge["id"])
+            self.stats.remove(challenge, date_ordinal(challenge["date"]))
+        self.rankings.remove_results(challenges)
+
+    def compact(self):
+        """Drop the tombstoned challenges from the maps; return how many."""
+        for challenge_id in self.dead:
+            challenge = self.challenges.pop(challenge_id)
+            self.challenge_keys.discard(challenge_key(challenge["challenger_id"], challenge["opponent_id"], challenge["date"]))
+        removed = len(self.dead)
+        self.dead = set()
+        return removed
+
+    def live_challenges(self):
+        """Get the challenges of the tournament, skipping tombstones."""
+        if not self.dead:
+            return list(self.challenges.values())
+        return [challenge for challenge in self.challenges.values() if challenge["id"] not in self.dead]
+
+    def add_result(self, challenge):
+        """Count a challenge that just got its winner."""
+        self.rankings.add_result(challenge)
+        self.stats.add_result()
+
+    def has_challenge(self, athlete_id, other_id, date):
+        """Tell whether two athletes already have a challenge on a date."""
+        return challenge_key(athlete_id, other_id, date) in self.challenge_keys
@@ -0,0 +1,120 @@
+"""On-demand cProfile captures of single script runs.
+
+``capture`` runs a function under ``cProfile`` and writes two files: the
+raw ``.pstats`` (for ``pstats``/snakeviz) and a ``.collapsed`` file with one
+``frame;frame;frame microseconds`` line per stack, the input format of
+flamegraph.pl, speedscope and similar tools. Nothing here runs unless a
+capture is asked for.
+"""
+import cProfile
+import datetime
+import heapq
+import itertools
+import os
+import pstats
+
+# Profondità massima delle pile ricostruite
+MAX_DEPTH = 200
+
+# Numero massimo di pile ricostruite
+MAX_STACKS = 20000
+
+# Rami sotto questa durata (in secondi) non vengono esplorati
+MIN_SHARE = 0.000001
+
+
+def frame_name(func):
+    """Format a pstats function key as a flamegraph frame."""
+    filename, line, name = func
+    if filename == "~":
+        # Funzioni built-in, es. "<method 'append' of 'list' objects>"
+        return name
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def collapsed_stacks(stats, max_stacks=MAX_STACKS):
+    """Rebuild approximate call stacks from a ``pstats.Stats`` object.
+
+    cProfile only records caller/callee pairs, so the time of a function
+    called from several places is split between its stacks in proportion
+    to the cumulative time of each call edge. A call graph shaped like a
+    DAG has exponentially many paths: the heaviest branches are expanded
+    first and, past ``max_stacks`` stacks or ``MAX_DEPTH`` frames, a branch
+    keeps the time of its callees in its last frame. Returns ``{stack: seconds}``.
+    """
+    raw = stats.stats
+    callees = {}
+    for func, (_, _, _, _, callers) in raw.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge[3]))
+
+    def worth(func, share):
+        return raw[func][3] > 0 and share >= MIN_SHARE
+
+    # Heap dei rami da esplorare, il più pesante per primo
+    pending = []
+    order = itertools.count()
+    for func, (_, _, _, total_time, callers) in raw.items():
+        if not callers and worth(func, total_time):
+            heapq.heappush(pending, (-total_time, next(order), func, ()))
+    opened = len(pending)
+
+    stacks = {}
+    while pending:
+        share, _, func, path = heapq.heappop(pending)
+        _, _, self_time, total_time, _ = raw[func]
+        fraction = -share / total_time
+        path = path + (func,)
+        # Le chiamate ricorsive sono già contate nel tempo cumulativo
+        children = [(callee, edge_time * fraction) for callee, edge_time in callees.get(func, ())
+                    if callee not in path and worth(callee, edge_time * fraction)]
+        seconds = self_time * fraction
+        if len(path) >= MAX_DEPTH or opened + len(children) > max_stacks:
+            seconds += sum(child_share for _, child_share in children)
+            children = ()
+        stacks[path] = seconds
+        opened += len(children)
+        for callee, child_share in children:
+            heapq.heappush(pending, (-child_share, next(order), callee, path))
+
+    collapsed = {}
+    for path, seconds in stacks.items():
+        if seconds > 0:
+            stack = ";".join(frame_name(func) for func in path)
+            collapsed[stack] = collapsed.get(stack, 0.0) + seconds
+    return collapsed
+
+
+def capture(func, directory, label="run"):
+    """Run ``func`` under the profiler and save its profile in ``directory``.
+
+    The files are written even if ``func`` raises (Streamlit reruns and
+    stops are exceptions), and the exception is then re-raised.
+    """
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    base = os.path.join(directory, f"{stamp}-{label}")
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        return func()
+    finally:
+        profiler.disable()
+        stats = pstats.Stats(profiler)
+        stats.dump_stats(base + ".pstats")
+        with open(base + ".collapsed", "w") as collapsed:
+            for stack, seconds in sorted(collapsed_stacks(stats).items()):
+                microseconds = round(seconds * 1_000_000)
+                if microseconds:
+                    collapsed.write(f"{stack} {microseconds}\n")
+
+
+def list_captures(directory, limit=20):
+    """List the most recent captures as ``(name, pstats_path, collapsed_path)``."""
+    if not os.path.isdir(directory):
+        return []
+    names = sorted((name[:-len(".pstats")] for name in os.listdir(directory) if name.endswith(".pstats")),
+                   reverse=True)
+    return [(name, os.path.join(directory, name + ".pstats"), os.path.join(directory, name + ".collapsed"))
+            for name in names[:limit]]
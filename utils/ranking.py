@@ -0,0 +1,179 @@
+"""Incremental tournament ranking.
+
+``RankingIndex`` keeps per-athlete victory and completed-challenge
+counters plus a sorted list of ``(-level, -victories, name, id)`` keys, so
+each result or athlete change repositions one or two entries with a
+bisect instead of recounting every challenge.
+"""
+import bisect
+
+
+def compute_rankings(athletes, challenges):
+    """Compute the rankings from scratch (reference for consistency checks)."""
+    rankings = []
+
+    for athlete in athletes:
+        # Count victories
+        victories = sum(1 for challenge in challenges
+                        if challenge["winner_id"] == athlete["id"])
+
+        # Count total challenges
+        total_challenges = sum(1 for challenge in challenges
+                               if (challenge["challenger_id"] == athlete["id"] or
+                                   challenge["opponent_id"] == athlete["id"]) and
+                                  challenge["winner_id"] is not None)
+
+        rankings.append({
+            "id": athlete["id"],
+            "name": athlete["name"],
+            "level": athlete["level"],
+            "victories": victories,
+            "total_challenges": total_challenges,
+            "profile_img": athlete["profile_img"]
+        })
+
+    # Sort by level (descending), then by victories (descending), then by name
+    rankings.sort(key=lambda x: (-x["level"], -x["victories"], x["name"]))
+
+    return rankings
+
+
+class RankingIndex:
+    """Ordered ranking kept up to date one athlete at a time."""
+
+    def __init__(self):
+        self._keys = []
+        self._key_by_athlete = {}
+        self._athletes = {}
+        self.victories = {}
+        self.completed = {}
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _key(self, athlete):
+        athlete_id = athlete["id"]
+        return (-athlete["level"], -self.victories[athlete_id], athlete["name"], athlete_id)
+
+    def _insert(self, athlete):
+        key = self._key(athlete)
+        bisect.insort(self._keys, key)
+        self._key_by_athlete[athlete["id"]] = key
+
+    def _remove(self, athlete_id):
+        key = self._key_by_athlete.pop(athlete_id)
+        del self._keys[bisect.bisect_left(self._keys, key)]
+
+    def add_athlete(self, athlete, victories=0, completed=0):
+        """Start ranking an athlete, optionally with the results they already have."""
+        self._athletes[athlete["id"]] = athlete
+        self.victories[athlete["id"]] = victories
+        self.completed[athlete["id"]] = completed
+        self._insert(athlete)
+
+    def add_athletes(self, athletes, victories, completed):
+        """Start ranking many athletes with the results they already have (id -> count), sorting once."""
+        for athlete in athletes:
+            athlete_id = athlete["id"]
+            self._athletes[athlete_id] = athlete
+            self.victories[athlete_id] = victories.get(athlete_id, 0)
+            self.completed[athlete_id] = completed.get(athlete_id, 0)
+            key = self._key(athlete)
+            self._keys.append(key)
+            self._key_by_athlete[athlete_id] = key
+        self._keys.sort()
+
+    def remove_athlete(self, athlete_id):
+        """Stop ranking an athlete."""
+        if athlete_id not in self._key_by_athlete:
+            return
+        self._remove(athlete_id)
+        del self._athletes[athlete_id]
+        del self.victories[athlete_id]
+        del self.completed[athlete_id]
+
+    def update_athlete(self, athlete_id):
+        """Reposition an athlete after their level or name changed."""
+        if athlete_id not in self._key_by_athlete:
+            return
+        athlete = self._athletes[athlete_id]
+        if self._key(athlete) != self._key_by_athlete[athlete_id]:
+            self._remove(athlete_id)
+            self._insert(athlete)
+
+    def _count_result(self, challenge, delta):
+        winner_id = challenge["winner_id"]
+        for athlete_id in (challenge["challenger_id"], challenge["opponent_id"]):
+            if athlete_id in self.completed:
+                self.completed[athlete_id] += delta
+        if winner_id in self.victories:
+            self._remove(winner_id)
+            self.victories[winner_id] += delta
+            self._insert(self._athletes[winner_id])
+
+    def add_result(self, challenge):
+        """Count a completed challenge (call after the winner's level changed)."""
+        if challenge["winner_id"] is not None:
+            self._count_result(challenge, 1)
+
+    def remove_result(self, challenge):
+        """Uncount a completed challenge that is being removed."""
+        if challenge["winner_id"] is not None:
+            self._count_result(challenge, -1)
+
+    def add_results(self, challenges):
+        """Count many completed challenges, re-sorting once if many athletes move."""
+        self._count_results(challenges, 1)
+
+    def remove_results(self, challenges):
+        """Uncount many completed challenges, re-sorting once if many athletes move."""
+        self._count_results(challenges, -1)
+
+    def _count_results(self, challenges, delta):
+        moved = set()
+        for challenge in challenges:
+            winner_id = challenge["winner_id"]
+            if winner_id is None:
+                continue
+            for athlete_id in (challenge["challenger_id"], challenge["opponent_id"]):
+                if athlete_id in self.completed:
+                    self.completed[athlete_id] += delta
+            if winner_id in self.victories:
+                self.victories[winner_id] += delta
+                moved.add(winner_id)
+
+        # Oltre una certa quota di spostamenti conviene riordinare tutto
+        if len(moved) * 8 > len(self._keys):
+            self._key_by_athlete = {athlete_id: self._key(athlete) for athlete_id, athlete in self._athletes.items()}
+            self._keys = sorted(self._key_by_athlete.values())
+        else:
+            for athlete_id in moved:
+                self._remove(athlete_id)
+                self._insert(self._athletes[athlete_id])
+
+    def _row(self, key):
+        athlete_id = key[3]
+        athlete = self._athletes[athlete_id]
+        return {
+            "id": athlete_id,
+            "name": athlete["name"],
+            "level": athlete["level"],
+            "victories": self.victories[athlete_id],
+            "total_challenges": self.completed[athlete_id],
+            "profile_img": athlete["profile_img"]
+        }
+
+    def table(self, start=0, stop=None):
+        """Get the ranking rows between two positions (0-based)."""
+        return [self._row(key) for key in self._keys[start:stop]]
+
+    def top(self, n):
+        """Get the first ``n`` ranking rows."""
+        return self.table(0, n)
+
+    def position(self, athlete_id):
+        """Get an athlete's 1-based ranking position, or None."""
+        key = self._key_by_athlete.get(athlete_id)
+        if key is None:
+            return None
+        return bisect.bisect_left(self._keys, key) + 1
@@ -0,0 +1,115 @@
+"""Elo ratings of the athletes, next to their level.
+
+``RatingEngine.record`` updates winner and loser in O(1) when a result is
+registered, as long as it comes after the last one applied; a result dated
+earlier is refused, and the caller replays. ``replay`` recomputes every rating from the whole challenge
+history in date order with NumPy: results are grouped into rounds in which
+no athlete appears twice, so each round is one vectorised update and the
+outcome is the same as applying the results one by one.
+"""
+import numpy as np
+
+INITIAL_RATING = 1500.0
+K_FACTOR = 32.0
+
+# Differenza di rating per cui il favorito ha 10 volte le probabilità
+SCALE = 400.0
+
+
+def expected_score(rating, other_rating):
+    """Probability that an athlete rated ``rating`` beats one rated ``other_rating``."""
+    return 1.0 / (1.0 + 10.0 ** ((other_rating - rating) / SCALE))
+
+
+def replay_elo(winners, losers, n_players, k=K_FACTOR, initial=INITIAL_RATING):
+    """Apply results in order to ``n_players`` fresh ratings and return them.
+
+    ``winners`` and ``losers`` are arrays of player indexes, one pair per
+    result, already in the order the results happened.
+    """
+    winners = np.asarray(winners, dtype=np.int64)
+    losers = np.asarray(losers, dtype=np.int64)
+    ratings = np.full(n_players, initial, dtype=np.float64)
+    if not len(winners):
+        return ratings
+
+    # Ogni risultato va nel primo turno dopo l'ultimo dei suoi due atleti
+    next_round = [0] * n_players
+    rounds = np.empty(len(winners), dtype=np.int64)
+    for i, (winner, loser) in enumerate(zip(winners.tolist(), losers.tolist())):
+        current = max(next_round[winner], next_round[loser])
+        rounds[i] = current
+        next_round[winner] = next_round[loser] = current + 1
+
+    order = np.argsort(rounds, kind="stable")
+    winners = winners[order]
+    losers = losers[order]
+    bounds = np.flatnonzero(np.diff(rounds[order])) + 1
+
+    for start, stop in zip(np.concatenate(([0], bounds)), np.concatenate((bounds, [len(order)]))):
+        w = winners[start:stop]
+        l = losers[start:stop]
+        delta = k * (1.0 - expected_score(ratings[w], ratings[l]))
+        ratings[w] += delta
+        ratings[l] -= delta
+
+    return ratings
+
+
+class RatingEngine:
+    """Elo rating of every athlete."""
+
+    def __init__(self, k=K_FACTOR, initial=INITIAL_RATING):
+        self.k = k
+        self.initial = initial
+        self.ratings = {}
+        # Posizione (data, id) dell'ultimo risultato applicato
+        self.last = None
+
+    def rating(self, athlete_id):
+        """Get an athlete's rating (the initial one if they have no results)."""
+        return self.ratings.get(athlete_id, self.initial)
+
+    def record(self, winner_id, loser_id, key=None):
+        """Update both athletes after a result whose place in the history is ``key`` (date, id).
+
+        Returns False, changing nothing, when the result comes before the last
+        one applied: the ratings are then only right after a ``replay``.
+        """
+        if key is not None:
+            if self.last is not None and key < self.last:
+                return False
+            self.last = key
+        winner_rating = self.rating(winner_id)
+        loser_rating = self.rating(loser_id)
+        delta = self.k * (1.0 - expected_score(winner_rating, loser_rating))
+        self.ratings[winner_id] = winner_rating + delta
+        self.ratings[loser_id] = loser_rating - delta
+        return True
+
+    def remove_athlete(self, athlete_id):
+        """Forget a deleted athlete's rating."""
+        self.ratings.pop(athlete_id, None)
+
+    def replay(self, challenges, athlete_ids):
+        """Recompute every rating from the completed challenges, in date order.
+
+        Challenges on the same day are applied in id order. Only athletes in
+        ``athlete_ids`` keep a rating.
+        """
+        index = {athlete_id: i for i, athlete_id in enumerate(athlete_ids)}
+        results = [(c["date"], c["id"], index[c["winner_id"]],
+                    index[c["opponent_id"] if c["winner_id"] == c["challenger_id"] else c["challenger_id"]])
+                   for c in challenges
+                   if c["winner_id"] is not None and c["challenger_id"] in index and c["opponent_id"] in index]
+
+        if results:
+            dates, ids, winners, losers = zip(*results)
+            order = np.lexsort((np.array(ids), np.array(dates)))
+            self.last = max(zip(dates, ids))
+            ratings = replay_elo(np.array(winners)[order], np.array(losers)[order], len(index), self.k, self.initial)
+        else:
+            ratings = np.full(len(index), self.initial)
+            self.last = None
+
+        self.ratings = dict(zip(index, ratings.tolist()))
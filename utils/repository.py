@@ -0,0 +1,653 @@
+"""Persistence backends for the tournament store.
+
+``Repository`` is the no-op backend used when the store lives only in
+memory. ``SQLiteRepository`` keeps the data in an embedded SQLite file
+laid out like ``schema.sql`` (atleti, sfide, specialita, config_torneo)
+plus the ``iscrizioni`` table for tournament enrollment, the tournament
+of each challenge (``sfide.torneo_id``), the elimination brackets
+(``tabelloni`` with their seeds, ``incontri_tabellone`` linking each
+bracket match to its challenge), the Swiss rounds (``turni_svizzera``)
+and the Elo parameters (``parametri_rating``).
+
+Athletes and challenges carry a row version (``versione``), bumped by
+every update. Results and athlete edits are written with a compare-and-swap
+on it, so two processes sharing the database can't both apply a change
+made against the same row.
+"""
+import contextlib
+import os
+import sqlite3
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS atleti (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  nome TEXT NOT NULL,
+  soprannome TEXT,
+  email TEXT UNIQUE NOT NULL,
+  password TEXT NOT NULL,
+  livello INTEGER DEFAULT 1,
+  immagine_profilo TEXT,
+  versione INTEGER NOT NULL DEFAULT 1,
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS specialita (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  nome TEXT UNIQUE NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS config_torneo (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  nome_torneo TEXT NOT NULL,
+  registrazione_aperta BOOLEAN DEFAULT TRUE,
+  data_inizio DATE,
+  data_fine DATE,
+  aggiornato_il TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS sfide (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  atleta1_id INTEGER REFERENCES atleti(id),
+  atleta2_id INTEGER REFERENCES atleti(id),
+  data_sfida DATE NOT NULL,
+  specialita_id INTEGER REFERENCES specialita(id),
+  vincitore_id INTEGER REFERENCES atleti(id) DEFAULT NULL,
+  torneo_id INTEGER REFERENCES config_torneo(id),
+  versione INTEGER NOT NULL DEFAULT 1,
+  creato_il TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  modificato_il TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  CHECK (atleta1_id <> atleta2_id)
+);
+
+CREATE TABLE IF NOT EXISTS iscrizioni (
+  atleta_id INTEGER NOT NULL REFERENCES atleti(id),
+  torneo_id INTEGER NOT NULL REFERENCES config_torneo(id),
+  posizione INTEGER NOT NULL,
+  PRIMARY KEY (atleta_id, torneo_id)
+);
+
+CREATE TABLE IF NOT EXISTS tabelloni (
+  torneo_id INTEGER PRIMARY KEY REFERENCES config_torneo(id),
+  doppia_eliminazione BOOLEAN NOT NULL,
+  specialita_id INTEGER REFERENCES specialita(id),
+  teste_di_serie TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS incontri_tabellone (
+  sfida_id INTEGER PRIMARY KEY,
+  torneo_id INTEGER NOT NULL REFERENCES config_torneo(id),
+  incontro INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS turni_svizzera (
+  torneo_id INTEGER NOT NULL REFERENCES config_torneo(id),
+  turno INTEGER NOT NULL,
+  atleta_riposo_id INTEGER,
+  PRIMARY KEY (torneo_id, turno)
+);
+
+CREATE TABLE IF NOT EXISTS parametri_rating (
+  id INTEGER PRIMARY KEY CHECK (id = 1),
+  fattore_k REAL NOT NULL,
+  rating_iniziale REAL NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_sfide_atleta1 ON sfide(atleta1_id);
+CREATE INDEX IF NOT EXISTS idx_sfide_atleta2 ON sfide(atleta2_id);
+CREATE INDEX IF NOT EXISTS idx_sfide_data ON sfide(data_sfida);
+CREATE INDEX IF NOT EXISTS idx_atleti_email ON atleti(email);
+CREATE INDEX IF NOT EXISTS idx_iscrizioni_torneo ON iscrizioni(torneo_id);
+CREATE INDEX IF NOT EXISTS idx_incontri_tabellone_torneo ON incontri_tabellone(torneo_id);
+"""
+
+# Database creati prima che le sfide avessero un torneo: la colonna viene
+# aggiunta e ogni sfida va al primo torneo comune ai due atleti (o al primo
+# torneo esistente)
+ADD_CHALLENGE_TOURNAMENT = """
+ALTER TABLE sfide ADD COLUMN torneo_id INTEGER REFERENCES config_torneo(id);
+
+UPDATE sfide SET torneo_id = COALESCE(
+  (SELECT i1.torneo_id FROM iscrizioni i1
+   JOIN iscrizioni i2 ON i2.torneo_id = i1.torneo_id AND i2.atleta_id = sfide.atleta2_id
+   WHERE i1.atleta_id = sfide.atleta1_id
+   ORDER BY i1.posizione LIMIT 1),
+  (SELECT MIN(id) FROM config_torneo)
+);
+"""
+CREATE_CHALLENGE_TOURNAMENT_INDEX = "CREATE INDEX IF NOT EXISTS idx_sfide_torneo ON sfide(torneo_id)"
+
+# Versione di riga per atleti e sfide nei database creati prima
+ADD_VERSION = "ALTER TABLE {} ADD COLUMN versione INTEGER NOT NULL DEFAULT 1"
+
+# Statement SQL costanti: sqlite3 li prepara una volta e li riusa dalla cache
+UPSERT_ATHLETE = """
+INSERT INTO atleti (id, nome, soprannome, email, password, livello, immagine_profilo, versione)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(id) DO UPDATE SET
+  nome = excluded.nome,
+  soprannome = excluded.soprannome,
+  email = excluded.email,
+  password = excluded.password,
+  livello = excluded.livello,
+  immagine_profilo = excluded.immagine_profilo,
+  versione = excluded.versione
+"""
+DELETE_ENROLLMENTS_OF_ATHLETE = "DELETE FROM iscrizioni WHERE atleta_id = ?"
+INSERT_ENROLLMENT = "INSERT INTO iscrizioni (atleta_id, torneo_id, posizione) VALUES (?, ?, ?)"
+DELETE_CHALLENGES_OF_ATHLETE = "DELETE FROM sfide WHERE atleta1_id = ? OR atleta2_id = ?"
+DELETE_BRACKET_MATCHES_OF_ATHLETE = """
+DELETE FROM incontri_tabellone
+WHERE sfida_id IN (SELECT id FROM sfide WHERE atleta1_id = ? OR atleta2_id = ?)
+"""
+DELETE_ATHLETE = "DELETE FROM atleti WHERE id = ?"
+
+# Scritture condizionate alla versione letta (compare-and-swap): nessuna riga
+# aggiornata vuol dire che un altro processo l'ha modificata nel frattempo
+UPDATE_ATHLETE_IF_VERSION = """
+UPDATE atleti SET nome = ?, soprannome = ?, email = ?, password = ?, livello = ?, immagine_profilo = ?,
+  versione = ?
+WHERE id = ? AND versione = ?
+"""
+INCREMENT_LEVEL = "UPDATE atleti SET livello = livello + 1, versione = versione + 1 WHERE id = ? RETURNING livello, versione"
+
+SELECT_ATHLETES = "SELECT id, nome, soprannome, email, password, livello, immagine_profilo, versione FROM atleti"
+SELECT_TOURNAMENTS = "SELECT id, nome_torneo, registrazione_aperta, data_inizio, data_fine FROM config_torneo"
+SELECT_ENROLLMENTS_OF_ATHLETE = "SELECT torneo_id FROM iscrizioni WHERE atleta_id = ? ORDER BY posizione"
+
+UPSERT_CHALLENGE = """
+INSERT INTO sfide (id, atleta1_id, atleta2_id, data_sfida, specialita_id, vincitore_id, torneo_id, versione)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(id) DO UPDATE SET
+  atleta1_id = excluded.atleta1_id,
+  atleta2_id = excluded.atleta2_id,
+  data_sfida = excluded.data_sfida,
+  specialita_id = excluded.specialita_id,
+  vincitore_id = excluded.vincitore_id,
+  torneo_id = excluded.torneo_id,
+  versione = excluded.versione,
+  modificato_il = CURRENT_TIMESTAMP
+"""
+DELETE_CHALLENGE = "DELETE FROM sfide WHERE id = ?"
+RECORD_RESULT_IF_VERSION = """
+UPDATE sfide SET vincitore_id = ?, versione = versione + 1, modificato_il = CURRENT_TIMESTAMP
+WHERE id = ? AND versione = ? AND vincitore_id IS NULL
+"""
+SELECT_CHALLENGES = ("SELECT id, atleta1_id, atleta2_id, data_sfida, specialita_id, vincitore_id, torneo_id, versione "
+                     "FROM sfide")
+DELETE_CHALLENGES_OF_TOURNAMENT = "DELETE FROM sfide WHERE torneo_id = ?"
+
+UPSERT_TOURNAMENT = """
+INSERT INTO config_torneo (id, nome_torneo, registrazione_aperta, data_inizio, data_fine)
+VALUES (?, ?, ?, ?, ?)
+ON CONFLICT(id) DO UPDATE SET
+  nome_torneo = excluded.nome_torneo,
+  registrazione_aperta = excluded.registrazione_aperta,
+  data_inizio = excluded.data_inizio,
+  data_fine = excluded.data_fine,
+  aggiornato_il = CURRENT_TIMESTAMP
+"""
+DELETE_ENROLLMENTS_OF_TOURNAMENT = "DELETE FROM iscrizioni WHERE torneo_id = ?"
+DELETE_TOURNAMENT = "DELETE FROM config_torneo WHERE id = ?"
+
+UPSERT_BRACKET = """
+INSERT INTO tabelloni (torneo_id, doppia_eliminazione, specialita_id, teste_di_serie)
+VALUES (?, ?, ?, ?)
+ON CONFLICT(torneo_id) DO UPDATE SET
+  doppia_eliminazione = excluded.doppia_eliminazione,
+  specialita_id = excluded.specialita_id,
+  teste_di_serie = excluded.teste_di_serie
+"""
+INSERT_BRACKET_MATCH = "INSERT OR REPLACE INTO incontri_tabellone (sfida_id, torneo_id, incontro) VALUES (?, ?, ?)"
+DELETE_BRACKET = "DELETE FROM tabelloni WHERE torneo_id = ?"
+DELETE_BRACKET_MATCHES = "DELETE FROM incontri_tabellone WHERE torneo_id = ?"
+DELETE_BRACKET_MATCH = "DELETE FROM incontri_tabellone WHERE sfida_id = ?"
+INSERT_SWISS_ROUND = "INSERT OR REPLACE INTO turni_svizzera (torneo_id, turno, atleta_riposo_id) VALUES (?, ?, ?)"
+DELETE_SWISS_ROUNDS = "DELETE FROM turni_svizzera WHERE torneo_id = ?"
+
+UPSERT_SPECIALTY = """
+INSERT INTO specialita (id, nome) VALUES (?, ?)
+ON CONFLICT(id) DO UPDATE SET nome = excluded.nome
+"""
+
+UPSERT_RATING_PARAMETERS = """
+INSERT INTO parametri_rating (id, fattore_k, rating_iniziale) VALUES (1, ?, ?)
+ON CONFLICT(id) DO UPDATE SET fattore_k = excluded.fattore_k, rating_iniziale = excluded.rating_iniziale
+"""
+
+SEQUENCE_TABLES = {
+    "atleti": "athletes",
+    "sfide": "challenges",
+    "config_torneo": "tournaments",
+    "specialita": "specialties",
+}
+
+
+def athlete_from_row(row, tournaments):
+    """Build an athlete record from a row of ``SELECT_ATHLETES``."""
+    return {
+        "id": row[0],
+        "name": row[1],
+        "nickname": row[2],
+        "email": row[3],
+        "password": row[4],
+        "level": row[5],
+        "profile_img": row[6],
+        "version": row[7],
+        "tournaments": tournaments
+    }
+
+
+def tournament_from_row(row):
+    """Build a tournament record from a row of ``SELECT_TOURNAMENTS``."""
+    return {
+        "id": row[0],
+        "name": row[1],
+        "registration_open": bool(row[2]),
+        "start_date": row[3],
+        "end_date": row[4]
+    }
+
+
+def challenge_from_row(row):
+    """Build a challenge record from a row of ``SELECT_CHALLENGES``."""
+    return {
+        "id": row[0],
+        "challenger_id": row[1],
+        "opponent_id": row[2],
+        "date": row[3],
+        "specialty_id": row[4],
+        "winner_id": row[5],
+        "tournament_id": row[6],
+        "version": row[7]
+    }
+
+
+class Repository:
+    """Persistence backend that keeps nothing (in-memory only store)."""
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Group several writes into one unit."""
+        yield
+
+    def is_empty(self):
+        """Tell whether the backend holds any data."""
+        return True
+
+    def load(self, store):
+        """Fill a store with the persisted records."""
+
+    def save_athlete(self, athlete):
+        """Persist an athlete and their enrollments."""
+
+    def update_athlete(self, athlete, expected_version):
+        """Persist an athlete's changes if their row is still at ``expected_version``; tell whether it was."""
+        return True
+
+    def fetch_athlete(self, athlete_id):
+        """Read an athlete's persisted record, or ``None``."""
+        return None
+
+    def delete_athlete(self, athlete_id):
+        """Remove an athlete and their challenges (with their bracket links)."""
+
+    def delete_athletes(self, athlete_ids):
+        """Remove many athletes and their challenges (with their bracket links) at once."""
+
+    def save_challenge(self, challenge):
+        """Persist a challenge."""
+
+    def save_challenges(self, challenges):
+        """Persist many challenges at once."""
+
+    def record_result(self, challenge, winner):
+        """Persist a result if the challenge is still pending at its version.
+
+        Returns the winner's new ``(level, version)``, ``(None, None)`` when
+        the backend keeps no levels (the store increments its own), or
+        ``None`` when another writer got there first.
+        """
+        return None, None
+
+    def fetch_challenge(self, challenge_id):
+        """Read a challenge's persisted record, or ``None``."""
+        return None
+
+    def delete_challenge(self, challenge_id):
+        """Remove a challenge."""
+
+    def save_tournament(self, tournament):
+        """Persist a tournament."""
+
+    def fetch_tournament(self, tournament_id):
+        """Read a tournament's persisted record, or ``None``."""
+        return None
+
+    def delete_tournament(self, tournament_id):
+        """Remove a tournament with its enrollments and challenges."""
+
+    def save_specialty(self, specialty):
+        """Persist a specialty."""
+
+    def fetch_specialty(self, specialty_id):
+        """Read a specialty's persisted record, or ``None``."""
+        return None
+
+    def save_bracket(self, tournament_id, bracket):
+        """Persist a tournament's bracket (format, specialty and seeds)."""
+
+    def fetch_bracket(self, tournament_id):
+        """Read a persisted bracket as ``(seeds, double, specialty_id, links)``, or ``None``."""
+        return None
+
+    def save_bracket_matches(self, tournament_id, links):
+        """Persist ``(challenge_id, match)`` links of a bracket."""
+
+    def delete_bracket(self, tournament_id):
+        """Remove a tournament's bracket (its challenges stay)."""
+
+    def save_swiss_round(self, tournament_id, round_number, bye_id):
+        """Persist a Swiss round and the athlete resting in it."""
+
+    def fetch_swiss_rounds(self, tournament_id):
+        """Read the bye of every persisted Swiss round of a tournament, in order."""
+        return []
+
+    def save_rating_parameters(self, k, initial):
+        """Persist the Elo parameters (K factor and initial rating)."""
+
+    def fetch_rating_parameters(self):
+        """Read the persisted Elo parameters as ``(k, initial)``, or ``None``."""
+        return None
+
+    def close(self):
+        """Release any resource held by the backend."""
+
+
+class SQLiteRepository(Repository):
+    """Repository backed by an embedded SQLite database in WAL mode."""
+
+    def __init__(self, path):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        # I rerun di Streamlit possono girare su thread diversi
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None,
+                                    cached_statements=64)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.executescript(SCHEMA)
+        self._migrate()
+        # Una connessione sola per tutti i thread: le transazioni non si intrecciano
+        # e le letture puntuali (fetch_*) non vedono quelle lasciate a metà
+        self._lock = threading.RLock()
+        self._depth = 0
+
+    def _migrate(self):
+        """Bring a database created by an older version up to the current schema."""
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(sfide)")}
+        if "torneo_id" not in columns:
+            self.conn.executescript("BEGIN;" + ADD_CHALLENGE_TOURNAMENT + "COMMIT;")
+        self.conn.execute(CREATE_CHALLENGE_TOURNAMENT_INDEX)
+        for table in ("atleti", "sfide"):
+            if "versione" not in {row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")}:
+                self.conn.execute(ADD_VERSION.format(table))
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Group several writes into one transaction (nesting is allowed).
+
+        The transaction belongs to the calling thread until it ends: the
+        results are written outside the store's lock.
+        """
+        with self._lock:
+            if self._depth == 0:
+                self.conn.execute("BEGIN IMMEDIATE")
+            self._depth += 1
+            try:
+                yield
+            except BaseException:
+                self._depth -= 1
+                if self._depth == 0:
+                    self.conn.execute("ROLLBACK")
+                raise
+            else:
+                self._depth -= 1
+                if self._depth == 0:
+                    self.conn.execute("COMMIT")
+
+    def is_empty(self):
+        """Tell whether the database holds any tournament."""
+        return self.conn.execute("SELECT 1 FROM config_torneo LIMIT 1").fetchone() is None
+
+    def load(self, store):
+        """Fill a store with the persisted records."""
+        for row in self.conn.execute(SELECT_TOURNAMENTS + " ORDER BY id"):
+            store.add_tournament(tournament_from_row(row))
+
+        for row in self.conn.execute("SELECT id, nome FROM specialita ORDER BY id"):
+            store.add_specialty({"id": row[0], "name": row[1]})
+
+        enrollments = {}
+        for athlete_id, tournament_id in self.conn.execute(
+                "SELECT atleta_id, torneo_id FROM iscrizioni ORDER BY atleta_id, posizione"):
+            enrollments.setdefault(athlete_id, []).append(tournament_id)
+
+        store.add_athletes([athlete_from_row(row, enrollments.get(row[0], []))
+                            for row in self.conn.execute(SELECT_ATHLETES + " ORDER BY id")])
+
+        store.add_challenges([challenge_from_row(row) for row in self.conn.execute(SELECT_CHALLENGES + " ORDER BY id")])
+
+        # I tabelloni si ricostruiscono dalle teste di serie e dai risultati
+        links = {}
+        for challenge_id, tournament_id, match in self.conn.execute(
+                "SELECT sfida_id, torneo_id, incontro FROM incontri_tabellone ORDER BY sfida_id"):
+            links.setdefault(tournament_id, []).append((challenge_id, match))
+        for tournament_id, double, specialty_id, seeds in self.conn.execute(
+                "SELECT torneo_id, doppia_eliminazione, specialita_id, teste_di_serie FROM tabelloni"):
+            store.restore_bracket(tournament_id, [int(seed) for seed in seeds.split(",")], bool(double),
+                                  specialty_id, links.get(tournament_id, []))
+
+        for tournament_id, bye_id in self.conn.execute(
+                "SELECT torneo_id, atleta_riposo_id FROM turni_svizzera ORDER BY torneo_id, turno"):
+            store.add_swiss_round(tournament_id, bye_id)
+
+        parameters = self.fetch_rating_parameters()
+        if parameters is not None:
+            store.set_rating_parameters(*parameters)
+
+        # Gli ID eliminati non vanno riassegnati dopo un riavvio
+        for table, seq in self.conn.execute("SELECT name, seq FROM sqlite_sequence"):
+            if table in SEQUENCE_TABLES:
+                store._advance_sequence(SEQUENCE_TABLES[table], seq)
+
+    def save_athlete(self, athlete):
+        """Persist an athlete and their enrollments."""
+        with self.transaction():
+            self.conn.execute(UPSERT_ATHLETE, (
+                athlete["id"], athlete["name"], athlete.get("nickname"), athlete["email"],
+                athlete["password"], athlete["level"], athlete.get("profile_img"), athlete["version"]
+            ))
+            self._save_enrollments(athlete)
+
+    def _save_enrollments(self, athlete):
+        """Replace an athlete's enrollments (inside the caller's transaction)."""
+        self.conn.execute(DELETE_ENROLLMENTS_OF_ATHLETE, (athlete["id"],))
+        self.conn.executemany(INSERT_ENROLLMENT, [
+            (athlete["id"], tournament_id, position)
+            for position, tournament_id in enumerate(athlete["tournaments"])
+        ])
+
+    def update_athlete(self, athlete, expected_version):
+        """Persist an athlete's changes if their row is still at ``expected_version``; tell whether it was."""
+        with self.transaction():
+            cursor = self.conn.execute(UPDATE_ATHLETE_IF_VERSION, (
+                athlete["name"], athlete.get("nickname"), athlete["email"], athlete["password"],
+                athlete["level"], athlete.get("profile_img"), athlete["version"], athlete["id"], expected_version
+            ))
+            if cursor.rowcount == 0:
+                return False
+            self._save_enrollments(athlete)
+        return True
+
+    def fetch_athlete(self, athlete_id):
+        """Read an athlete's persisted record, or ``None``."""
+        with self._lock:
+            row = self.conn.execute(SELECT_ATHLETES + " WHERE id = ?", (athlete_id,)).fetchone()
+            if row is None:
+                return None
+            tournaments = [tournament_id for (tournament_id,) in self.conn.execute(SELECT_ENROLLMENTS_OF_ATHLETE,
+                                                                                  (athlete_id,))]
+            return athlete_from_row(row, tournaments)
+
+    def delete_athlete(self, athlete_id):
+        """Remove an athlete and their challenges."""
+        with self.transaction():
+            self.conn.execute(DELETE_BRACKET_MATCHES_OF_ATHLETE, (athlete_id, athlete_id))
+            self.conn.execute(DELETE_CHALLENGES_OF_ATHLETE, (athlete_id, athlete_id))
+            self.conn.execute(DELETE_ENROLLMENTS_OF_ATHLETE, (athlete_id,))
+            self.conn.execute(DELETE_ATHLETE, (athlete_id,))
+
+    def delete_athletes(self, athlete_ids):
+        """Remove many athletes and their challenges in one transaction."""
+        with self.transaction():
+            self.conn.executemany(DELETE_BRACKET_MATCHES_OF_ATHLETE,
+                                  [(athlete_id, athlete_id) for athlete_id in athlete_ids])
+            self.conn.executemany(DELETE_CHALLENGES_OF_ATHLETE, [(athlete_id, athlete_id) for athlete_id in athlete_ids])
+            self.conn.executemany(DELETE_ENROLLMENTS_OF_ATHLETE, [(athlete_id,) for athlete_id in athlete_ids])
+            self.conn.executemany(DELETE_ATHLETE, [(athlete_id,) for athlete_id in athlete_ids])
+
+    def save_challenge(self, challenge):
+        """Persist a challenge."""
+        with self.transaction():
+            self.conn.execute(UPSERT_CHALLENGE, (
+                challenge["id"], challenge["challenger_id"], challenge["opponent_id"],
+                challenge["date"], challenge["specialty_id"], challenge["winner_id"], challenge["tournament_id"],
+                challenge["version"]
+            ))
+
+    def save_challenges(self, challenges):
+        """Persist many challenges in one transaction."""
+        with self.transaction():
+            self.conn.executemany(UPSERT_CHALLENGE, [
+                (c["id"], c["challenger_id"], c["opponent_id"], c["date"], c["specialty_id"], c["winner_id"],
+                 c["tournament_id"], c["version"])
+                for c in challenges
+            ])
+
+    def record_result(self, challenge, winner):
+        """Persist a result if the challenge is still pending at its version.
+
+        The winner's level is incremented in the database, not overwritten
+        with the value in memory, so results recorded by other processes
+        are never lost. Returns the winner's new ``(level, version)``, or
+        ``None`` when another writer got there first.
+        """
+        with self.transaction():
+            cursor = self.conn.execute(RECORD_RESULT_IF_VERSION, (winner["id"], challenge["id"], challenge["version"]))
+            if cursor.rowcount == 0:
+                return None
+            return self.conn.execute(INCREMENT_LEVEL, (winner["id"],)).fetchone()
+
+    def fetch_challenge(self, challenge_id):
+        """Read a challenge's persisted record, or ``None``."""
+        with self._lock:
+            row = self.conn.execute(SELECT_CHALLENGES + " WHERE id = ?", (challenge_id,)).fetchone()
+            return challenge_from_row(row) if row is not None else None
+
+    def delete_challenge(self, challenge_id):
+        """Remove a challenge."""
+        with self.transaction():
+            self.conn.execute(DELETE_BRACKET_MATCH, (challenge_id,))
+            self.conn.execute(DELETE_CHALLENGE, (challenge_id,))
+
+    def save_tournament(self, tournament):
+        """Persist a tournament."""
+        with self.transaction():
+            self.conn.execute(UPSERT_TOURNAMENT, (
+                tournament["id"], tournament["name"], tournament["registration_open"],
+                tournament["start_date"], tournament["end_date"]
+            ))
+
+    def fetch_tournament(self, tournament_id):
+        """Read a tournament's persisted record, or ``None``."""
+        with self._lock:
+            row = self.conn.execute(SELECT_TOURNAMENTS + " WHERE id = ?", (tournament_id,)).fetchone()
+            return tournament_from_row(row) if row is not None else None
+
+    def delete_tournament(self, tournament_id):
+        """Remove a tournament with its enrollments and challenges."""
+        with self.transaction():
+            self.conn.execute(DELETE_BRACKET_MATCHES, (tournament_id,))
+            self.conn.execute(DELETE_BRACKET, (tournament_id,))
+            self.conn.execute(DELETE_SWISS_ROUNDS, (tournament_id,))
+            self.conn.execute(DELETE_CHALLENGES_OF_TOURNAMENT, (tournament_id,))
+            self.conn.execute(DELETE_ENROLLMENTS_OF_TOURNAMENT, (tournament_id,))
+            self.conn.execute(DELETE_TOURNAMENT, (tournament_id,))
+
+    def save_specialty(self, specialty):
+        """Persist a specialty."""
+        with self.transaction():
+            self.conn.execute(UPSERT_SPECIALTY, (specialty["id"], specialty["name"]))
+
+    def fetch_specialty(self, specialty_id):
+        """Read a specialty's persisted record, or ``None``."""
+        with self._lock:
+            row = self.conn.execute("SELECT id, nome FROM specialita WHERE id = ?", (specialty_id,)).fetchone()
+            return {"id": row[0], "name": row[1]} if row is not None else None
+
+    def save_bracket(self, tournament_id, bracket):
+        """Persist a tournament's bracket (format, specialty and seeds)."""
+        with self.transaction():
+            self.conn.execute(UPSERT_BRACKET, (tournament_id, bracket.double, bracket.specialty_id,
+                                               ",".join(map(str, bracket.seeds))))
+
+    def fetch_bracket(self, tournament_id):
+        """Read a persisted bracket as ``(seeds, double, specialty_id, links)``, or ``None``."""
+        with self._lock:
+            row = self.conn.execute("SELECT doppia_eliminazione, specialita_id, teste_di_serie FROM tabelloni "
+                                    "WHERE torneo_id = ?", (tournament_id,)).fetchone()
+            if row is None:
+                return None
+            links = self.conn.execute("SELECT sfida_id, incontro FROM incontri_tabellone WHERE torneo_id = ? "
+                                      "ORDER BY sfida_id", (tournament_id,)).fetchall()
+            return [int(seed) for seed in row[2].split(",")], bool(row[0]), row[1], links
+
+    def save_bracket_matches(self, tournament_id, links):
+        """Persist ``(challenge_id, match)`` links of a bracket."""
+        with self.transaction():
+            self.conn.executemany(INSERT_BRACKET_MATCH, [(challenge_id, tournament_id, match)
+                                                        for challenge_id, match in links])
+
+    def delete_bracket(self, tournament_id):
+        """Remove a tournament's bracket (its challenges stay)."""
+        with self.transaction():
+            self.conn.execute(DELETE_BRACKET_MATCHES, (tournament_id,))
+            self.conn.execute(DELETE_BRACKET, (tournament_id,))
+
+    def save_swiss_round(self, tournament_id, round_number, bye_id):
+        """Persist a Swiss round and the athlete resting in it."""
+        with self.transaction():
+            self.conn.execute(INSERT_SWISS_ROUND, (tournament_id, round_number, bye_id))
+
+    def fetch_swiss_rounds(self, tournament_id):
+        """Read the bye of every persisted Swiss round of a tournament, in order."""
+        with self._lock:
+            return [bye_id for (bye_id,) in self.conn.execute(
+                "SELECT atleta_riposo_id FROM turni_svizzera WHERE torneo_id = ? ORDER BY turno", (tournament_id,))]
+
+    def save_rating_parameters(self, k, initial):
+        """Persist the Elo parameters (K factor and initial rating)."""
+        with self.transaction():
+            self.conn.execute(UPSERT_RATING_PARAMETERS, (k, initial))
+
+    def fetch_rating_parameters(self):
+        """Read the persisted Elo parameters as ``(k, initial)``, or ``None``."""
+        with self._lock:
+            return self.conn.execute("SELECT fattore_k, rating_iniziale FROM parametri_rating").fetchone()
+
+    def close(self):
+        """Close the database connection."""
+        self.conn.close()
@@ -0,0 +1,125 @@
+"""Round-robin and pool calendar generator.
+
+``plan_calendar`` splits the athletes into pools of similar level (or keeps
+them in a single round robin), builds every pool's rounds with the circle
+method and places the matches on the tournament days with an earliest-fit
+greedy pass. A day holds at most ``courts * matches_per_court`` matches and
+an athlete plays at most ``max_per_day`` of them; rounds of all pools are
+interleaved so every pool advances at the same pace. Each athlete and the
+calendar keep a pointer to their first day with room left, so placing a
+match costs O(1) amortised and thousands of athletes plan in seconds.
+"""
+
+
+def round_robin(athlete_ids):
+    """Yield the rounds of a round robin as lists of pairs (circle method).
+
+    With an odd number of athletes, one of them rests in each round.
+    """
+    ids = list(athlete_ids)
+    if len(ids) % 2:
+        ids.append(None)
+    n = len(ids)
+    for _ in range(n - 1):
+        yield [(ids[i], ids[n - 1 - i]) for i in range(n // 2)
+               if ids[i] is not None and ids[n - 1 - i] is not None]
+        # Il primo resta fermo, gli altri ruotano di una posizione
+        ids.insert(1, ids.pop())
+
+
+def split_pools(athletes, pool_size):
+    """Split athletes into pools of consecutive levels, with sizes differing by at most one.
+
+    A ``pool_size`` of ``None`` or 0 keeps everyone in a single pool.
+    """
+    ordered = sorted(athletes, key=lambda a: (a["level"], a["name"], a["id"]))
+    if not ordered:
+        return []
+    if not pool_size or pool_size >= len(ordered):
+        return [ordered]
+    n_pools = -(-len(ordered) // pool_size)
+    return [ordered[i * len(ordered) // n_pools:(i + 1) * len(ordered) // n_pools] for i in range(n_pools)]
+
+
+def plan_calendar(athletes, dates, courts, matches_per_court=1, max_per_day=1, pool_size=None,
+                  day_load=None, athlete_load=None, played=()):
+    """Place the round robin of every pool on ``dates``.
+
+    ``day_load`` (date -> matches) and ``athlete_load`` ((athlete id, date)
+    -> matches) count the matches already on the calendar; pairs in
+    ``played`` (sorted id tuples) already met and are skipped. Returns
+    ``(matches, unscheduled)``: ``(challenger_id, opponent_id, date)``
+    tuples, with the challenger never above the opponent's level, and the
+    number of matches that found no room.
+    """
+    capacity = courts * matches_per_court
+    existing_days = day_load or {}
+    existing_athletes = athlete_load or {}
+    played = set(played)
+
+    n_days = len(dates)
+    day_index = {date: i for i, date in enumerate(dates)}
+    load = [existing_days.get(date, 0) for date in dates]
+    per_athlete = {(athlete_id, day_index[date]): count
+                   for (athlete_id, date), count in existing_athletes.items() if date in day_index}
+
+    by_id = {}
+    rounds_per_pool = []
+    for pool in split_pools(athletes, pool_size):
+        by_id.update((athlete["id"], athlete) for athlete in pool)
+        rounds_per_pool.append(round_robin(athlete["id"] for athlete in pool))
+
+    first_free = {}
+    open_day = 0
+    matches = []
+    unscheduled = 0
+
+    def advance(athlete_id, day):
+        # Sposta il puntatore dell'atleta oltre i giorni già pieni
+        while day < n_days and per_athlete.get((athlete_id, day), 0) >= max_per_day:
+            day += 1
+        first_free[athlete_id] = day
+
+    # Un turno di ogni girone alla volta
+    while rounds_per_pool:
+        still_running = []
+        for rounds in rounds_per_pool:
+            pairs = next(rounds, None)
+            if pairs is None:
+                continue
+            still_running.append(rounds)
+            for a, b in pairs:
+                if (min(a, b), max(a, b)) in played:
+                    continue
+
+                while open_day < n_days and load[open_day] >= capacity:
+                    open_day += 1
+                if a not in first_free:
+                    advance(a, 0)
+                if b not in first_free:
+                    advance(b, 0)
+
+                day = max(open_day, first_free[a], first_free[b])
+                while day < n_days and (load[day] >= capacity
+                                        or per_athlete.get((a, day), 0) >= max_per_day
+                                        or per_athlete.get((b, day), 0) >= max_per_day):
+                    day += 1
+                if day == n_days:
+                    unscheduled += 1
+                    continue
+
+                load[day] += 1
+                per_athlete[a, day] = per_athlete.get((a, day), 0) + 1
+                per_athlete[b, day] = per_athlete.get((b, day), 0) + 1
+                if day == first_free[a]:
+                    advance(a, day)
+                if day == first_free[b]:
+                    advance(b, day)
+
+                # Chi sfida non può avere livello superiore all'avversario
+                if (by_id[a]["level"], a) > (by_id[b]["level"], b):
+                    a, b = b, a
+                matches.append((a, b, dates[day]))
+        rounds_per_pool = still_running
+
+    return matches, unscheduled
@@ -0,0 +1,111 @@
+"""Challenge counters for the admin dashboard.
+
+``ChallengeStats`` is updated by the store on every insert, delete and
+result, so reading the dashboard figures never walks the challenge list.
+Dates go into a ``DateHistogram`` (a Fenwick tree over day ordinals), and
+"future" and "today" are answered from a prefix sum and a single bucket.
+"""
+
+
+class DateHistogram:
+    """Per-day counts with logarithmic prefix sums."""
+
+    def __init__(self):
+        self._counts = {}
+        self._base = 0
+        self._tree = [0]
+
+    def _rebuild(self, low, high):
+        """Resize the tree to cover the ordinals ``low..high`` with some slack."""
+        span = high - low + 1
+        size = 1
+        while size < span * 2:
+            size *= 2
+        self._base = low - (size - span) // 2
+        self._tree = [0] * (size + 1)
+        for ordinal, count in self._counts.items():
+            self._update_tree(ordinal, count)
+
+    def _update_tree(self, ordinal, delta):
+        i = ordinal - self._base + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def add(self, ordinal, delta=1):
+        """Change the count of one day."""
+        count = self._counts.get(ordinal, 0) + delta
+        if count:
+            self._counts[ordinal] = count
+        else:
+            self._counts.pop(ordinal, None)
+
+        if not self._base <= ordinal < self._base + len(self._tree) - 1:
+            # Il nuovo giorno è fuori dall'intervallo coperto: si ricostruisce
+            self._rebuild(min(self._counts, default=ordinal), max(self._counts, default=ordinal))
+        else:
+            self._update_tree(ordinal, delta)
+
+    def add_many(self, ordinals):
+        """Count one entry for each of many days, rebuilding the tree once."""
+        for ordinal in ordinals:
+            self._counts[ordinal] = self._counts.get(ordinal, 0) + 1
+        if self._counts:
+            self._rebuild(min(self._counts), max(self._counts))
+
+    def count_on(self, ordinal):
+        """Count the entries of one day."""
+        return self._counts.get(ordinal, 0)
+
+    def count_until(self, ordinal):
+        """Count the entries up to and including a day."""
+        if ordinal < self._base:
+            return 0
+        i = min(ordinal - self._base + 1, len(self._tree) - 1)
+        total = 0
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+
+class ChallengeStats:
+    """Running totals of challenges by state and date."""
+
+    def __init__(self):
+        self.total = 0
+        self.completed = 0
+        self.dates = DateHistogram()
+
+    def add(self, challenge, ordinal):
+        """Count a new challenge."""
+        self.total += 1
+        if challenge["winner_id"] is not None:
+            self.completed += 1
+        self.dates.add(ordinal)
+
+    def add_many(self, challenges, ordinals):
+        """Count many new challenges (``ordinals`` are their dates)."""
+        self.total += len(challenges)
+        self.completed += sum(1 for challenge in challenges if challenge["winner_id"] is not None)
+        self.dates.add_many(ordinals)
+
+    def remove(self, challenge, ordinal):
+        """Uncount a challenge that is being removed."""
+        self.total -= 1
+        if challenge["winner_id"] is not None:
+            self.completed -= 1
+        self.dates.add(ordinal, -1)
+
+    def add_result(self):
+        """Count a challenge that just got its winner."""
+        self.completed += 1
+
+    def summary(self, today_ordinal):
+        """Get the challenge figures relative to a day."""
+        return {
+            "total_challenges": self.total,
+            "completed_challenges": self.completed,
+            "future_challenges": self.total - self.dates.count_until(today_ordinal),
+            "today_challenges": self.dates.count_on(today_ordinal)
+        }
@@ -0,0 +1,1406 @@
+"""Indexed in-memory store for the Chanbara tournament data.
+
+Records are plain dicts, exactly as the pages expect them, kept in
+id-keyed maps so lookups and deletions don't scan. Every mutation goes
+through a ``TournamentStore`` method so the secondary indexes stay in sync
+and the change is written through to the repository. Challenges belong to
+a tournament, and rankings, opponent lists and statistics are answered by
+that tournament's partition. One store is shared by every session of the
+process: public methods take its reader-writer lock, so renders read in
+parallel and each mutation runs alone and whole. Each write then publishes
+one change event saying which kinds of data, of which tournaments, it
+changed.
+
+Athletes and challenges carry a ``version`` that grows with every change.
+Results and athlete edits are optimistic: the caller may pass the version
+it showed to the user, and the repository only accepts the write if the
+row it holds is still at the version in memory. When another process won
+the race the row is reloaded and the method fails with
+``CONFLICT_MESSAGE``, so a stale form can never apply a result twice or
+overwrite a level it didn't see.
+"""
+import datetime
+import threading
+
+from utils.adjacency import ChallengeAdjacency, date_ordinal
+from utils.bracket import Bracket, MAX_ENTRANTS
+from utils.enrollment import EnrollmentIndex
+from utils.events import PROCESS_ORIGIN, ChangeEvent, EventBus
+from utils.locking import RWLock, reads, writes
+from utils.partition import TournamentPartition, challenge_key
+from utils.ranking import compute_rankings
+from utils.rating import RatingEngine
+from utils.repository import Repository
+from utils.scheduler import plan_calendar
+from utils.swiss import swiss_pairings
+
+# Oltre questo numero di record scritti un evento non li elenca: gli altri processi ricaricano tutto
+MAX_EVENT_RECORDS = 256
+
+# Ordine in cui ``_reload`` rilegge i record arrivati dagli altri processi
+RELOAD_ORDER = ("tournaments", "specialties", "athletes", "challenges", "brackets", "swiss_rounds", "ratings")
+
+# Secondi tra due controlli della compattazione in background
+COMPACT_INTERVAL = 30
+
+ENDED_MESSAGE = "Il torneo è terminato: non ci sono più date disponibili per nuove sfide"
+
+CONFLICT_MESSAGE = ("I dati sono stati modificati da un altro amministratore mentre li consultavi: "
+                    "controlla i valori aggiornati e riprova")
+
+
+def normalize_email(email):
+    """Normalize an email address for lookups."""
+    return (email or "").strip().lower()
+
+
+class TournamentStore:
+    """Athletes, challenges, tournaments and specialties with hash indexes."""
+
+    def __init__(self, repository=None):
+        self.repository = repository if repository is not None else Repository()
+        self.lock = RWLock()
+
+        # Eventi di modifica: (tipo, torneo) cambiati dalla scrittura in corso
+        self.events = EventBus()
+        self.channel = None
+        self._changes = set()
+        self._records = set()
+
+        # Eventi pubblicati finora (anche quelli arrivati dagli altri processi)
+        self.sequence = 0
+
+        # Versioni per tipo di entità, incrementate ad ogni modifica
+        self.versions = {"athletes": 0, "challenges": 0, "tournaments": 0, "specialties": 0}
+
+        self._ratings_lock = threading.Lock()
+        self.ratings = RatingEngine()
+        self._reset()
+
+        # Compattazione e ricalcolo dei rating in background (``start_compactor``)
+        self._compactor = None
+        self._stopped = threading.Event()
+
+    def _reset(self):
+        """Start from empty data and indexes."""
+        # id -> record (dicts keep insertion order, so listings stay stable)
+        self.athletes = {}
+        self.challenges = {}
+        self.tournaments = {}
+        self.specialties = {}
+
+        # Sfide eliminate ma ancora nelle mappe e nei bucket, fino a ``compact``
+        self._tombstones = set()
+
+        # Indici secondari
+        self._athletes_by_email = {}
+        self.adjacency = ChallengeAdjacency()
+        self.enrollments = EnrollmentIndex()
+
+        # tournament id -> sfide, classifica, livelli e contatori del torneo
+        self.partitions = {}
+
+        # tournament id -> tabellone a eliminazione
+        self.brackets = {}
+
+        # tournament id -> atleta a riposo di ogni turno svizzero (None se nessuno)
+        self.swiss_rounds = {}
+
+        # Rating Elo, ricalcolato dallo storico quando non è più allineato;
+        # i parametri restano quelli scelti finché il repository non ne carica altri
+        self.ratings = RatingEngine(self.ratings.k, self.ratings.initial)
+        self._ratings_stale = False
+
+        # Sequenze monotone per i nuovi ID
+        self._sequences = {"athletes": 0, "challenges": 0, "tournaments": 0, "specialties": 0}
+
+    # --- Sequences -------------------------------------------------------
+
+    def _next_id(self, kind):
+        """Return the next id for an entity kind."""
+        self._sequences[kind] += 1
+        return self._sequences[kind]
+
+    def _advance_sequence(self, kind, record_id):
+        """Make sure the sequence never hands out an id already in use."""
+        if record_id > self._sequences[kind]:
+            self._sequences[kind] = record_id
+
+    def _touch(self, *kinds, tournaments=(None,)):
+        """Record that a mutation changed some entity kinds, in some tournaments (``None``: any)."""
+        for kind in kinds:
+            self.versions[kind] += 1
+            for tournament_id in tournaments:
+                self._changes.add((kind, tournament_id))
+
+    def _mark(self, kind, record_id):
+        """Record that a mutation wrote a record (``kind`` is a table: athletes, brackets, ratings...)."""
+        self._records.add((kind, record_id))
+
+    def _after_write(self, action):
+        """Publish what the write that just ended changed (called by ``writes``)."""
+        records, self._records = self._records, set()
+        if not self._changes:
+            return
+        event = ChangeEvent(action, frozenset(self._changes), PROCESS_ORIGIN,
+                            frozenset(records) if len(records) <= MAX_EVENT_RECORDS else None)
+        self._changes = set()
+        self.sequence += 1
+        self.events.publish(event)
+        # Caricamenti e modifiche ricaricate da un altro processo non vanno sul canale
+        if self.channel is not None and action not in ("load", "_reload"):
+            self.channel.write(event)
+
+    # --- Other processes -------------------------------------------------
+
+    @writes
+    def load(self):
+        """Fill the store with the records of its repository."""
+        self.repository.load(self)
+
+    def attach_channel(self, channel):
+        """Share change events with the other processes using the same database."""
+        self.channel = channel
+
+    def sync(self):
+        """Reload from the repository if another process changed the data; return the events read."""
+        if self.channel is None or not self.channel.pending():
+            return 0
+        return self._reload()
+
+    @writes
+    def _reload(self):
+        """Re-read the records the other processes wrote, then publish the changes they announced.
+
+        Only the records listed by the events are fetched again; an event
+        that doesn't list them (a bulk write) reloads everything.
+        """
+        events = self.channel.poll()
+        if not events:
+            return 0
+
+        if any(event.records is None for event in events):
+            self._reset()
+            self.repository.load(self)
+        else:
+            records = {}
+            for kind, record_id in set().union(*(event.records for event in events)):
+                records.setdefault(kind, []).append(record_id)
+            # Prima i tornei (le sfide vanno nelle loro partizioni), poi atleti e sfide, in ordine di ID
+            for kind in RELOAD_ORDER:
+                for record_id in sorted(records.get(kind, ()), key=lambda record_id: record_id or 0):
+                    self._refresh_record(kind, record_id)
+
+        # Una sola notifica per tutto quello che è arrivato
+        self._changes = set().union(*(event.changes for event in events))
+        return len(events)
+
+    def _refresh_record(self, kind, record_id):
+        """Align one record in memory with the repository (added, changed or deleted elsewhere)."""
+        if kind == "tournaments":
+            record = self.repository.fetch_tournament(record_id)
+            tournament = self.tournaments.get(record_id)
+            if record is None:
+                if tournament is not None:
+                    self._remove_tournament(record_id)
+            elif tournament is None:
+                self.add_tournament(record)
+            else:
+                # Stesso oggetto: chi lo tiene (la sessione) vede i nuovi valori
+                tournament.update(record)
+                self._touch("tournaments", tournaments=(record_id,))
+        elif kind == "specialties":
+            record = self.repository.fetch_specialty(record_id)
+            if record is not None:
+                self.add_specialty(record)
+        elif kind == "athletes":
+            record = self.repository.fetch_athlete(record_id)
+            athlete = self.athletes.get(record_id)
+            if record is None:
+                if athlete is not None:
+                    self._remove_athletes([record_id])
+            elif athlete is None:
+                self.add_athlete(record)
+            else:
+                self._apply_athlete(athlete, record)
+        elif kind == "challenges":
+            record = self.repository.fetch_challenge(record_id)
+            challenge = self._challenge(record_id)
+            if record is None:
+                if challenge is not None:
+                    self._discard_challenges(challenge["tournament_id"], [challenge])
+            elif challenge is None:
+                if record_id not in self.challenges:
+                    self.add_challenge(record)
+            elif record["winner_id"] is not None and challenge["winner_id"] is None:
+                # Il livello del vincitore è già stato riletto con il suo record
+                winner = self.athletes[record["winner_id"]]
+                self._apply_result(challenge, record["winner_id"], winner["level"], winner["version"])
+                challenge["version"] = record["version"]
+        elif kind == "brackets":
+            record = self.repository.fetch_bracket(record_id)
+            if record is None:
+                self.brackets.pop(record_id, None)
+            elif record_id in self.tournaments:
+                seeds, double, specialty_id, links = record
+                self.restore_bracket(record_id, seeds, double, specialty_id, links)
+            self._touch("tournaments", tournaments=(record_id,))
+        elif kind == "swiss_rounds":
+            if record_id in self.tournaments:
+                self.swiss_rounds[record_id] = self.repository.fetch_swiss_rounds(record_id)
+        elif kind == "ratings":
+            parameters = self.repository.fetch_rating_parameters()
+            if parameters is not None:
+                self.set_rating_parameters(*parameters)
+        # Gli ID usati altrove non vanno riassegnati, anche se il record non c'è più
+        if record_id is not None and kind in self._sequences:
+            self._advance_sequence(kind, record_id)
+
+    @reads
+    def version_of(self, *kinds):
+        """Get the current versions of some entity kinds, as a cache key."""
+        return tuple(self.versions[kind] for kind in kinds)
+
+    def partition(self, tournament_id):
+        """Get the partition of a tournament (an empty one for an unknown tournament)."""
+        partition = self.partitions.get(tournament_id)
+        return partition if partition is not None else TournamentPartition(tournament_id)
+
+    def _challenge(self, challenge_id):
+        """Get a challenge by id, unless it is tombstoned."""
+        return None if challenge_id in self._tombstones else self.challenges.get(challenge_id)
+
+    def _live_challenges(self):
+        """Get every challenge, skipping tombstones."""
+        if not self._tombstones:
+            return self.challenges.values()
+        return [challenge for challenge in self.challenges.values() if challenge["id"] not in self._tombstones]
+
+    def _challenges_in(self, athlete_id, tournament_id):
+        """Get an athlete's challenges that belong to one tournament."""
+        return [challenge for challenge in map(self.challenges.get, self.adjacency.challenge_ids(athlete_id))
+                if challenge["tournament_id"] == tournament_id]
+
+    def _enroll(self, athlete, tournament_id):
+        """Index an enrollment and add the athlete to the tournament's partition."""
+        if tournament_id in self.tournaments and not self.enrollments.is_enrolled(athlete["id"], tournament_id):
+            self.enrollments.enroll(athlete["id"], tournament_id)
+            self.partitions[tournament_id].add_athlete(athlete, self._challenges_in(athlete["id"], tournament_id))
+
+    def _withdraw(self, athlete_id, tournament_id):
+        """Drop an enrollment and remove the athlete from the tournament's partition."""
+        self.enrollments.withdraw(athlete_id, tournament_id)
+        partition = self.partitions.get(tournament_id)
+        if partition is not None:
+            partition.remove_athlete(athlete_id)
+
+    def _reposition(self, athlete):
+        """Reposition an athlete in the partitions of their tournaments."""
+        for tournament_id in self.enrollments.tournaments_of(athlete["id"]):
+            self.partitions[tournament_id].update_athlete(athlete["id"])
+
+    # --- Loading ---------------------------------------------------------
+
+    @writes
+    def add_tournament(self, tournament):
+        """Insert a tournament record that already has an ID."""
+        self.tournaments[tournament["id"]] = tournament
+        if tournament["id"] not in self.partitions:
+            self.partitions[tournament["id"]] = TournamentPartition(tournament["id"])
+        self._advance_sequence("tournaments", tournament["id"])
+        self._mark("tournaments", tournament["id"])
+        self._touch("tournaments", tournaments=(tournament["id"],))
+        return tournament
+
+    @writes
+    def add_specialty(self, specialty):
+        """Insert a specialty record that already has an ID."""
+        self.specialties[specialty["id"]] = specialty
+        self._advance_sequence("specialties", specialty["id"])
+        self._mark("specialties", specialty["id"])
+        self._touch("specialties")
+        return specialty
+
+    @writes
+    def add_athlete(self, athlete):
+        """Insert an athlete record that already has an ID."""
+        athlete.setdefault("tournaments", [])
+        athlete.setdefault("version", 1)
+        self.athletes[athlete["id"]] = athlete
+        self._athletes_by_email[normalize_email(athlete["email"])] = athlete
+        for tournament_id in athlete["tournaments"]:
+            self._enroll(athlete, tournament_id)
+        self._advance_sequence("athletes", athlete["id"])
+        self._mark("athletes", athlete["id"])
+        self._touch("athletes", tournaments=athlete["tournaments"] or (None,))
+        return athlete
+
+    @writes
+    def add_challenge(self, challenge):
+        """Insert a challenge record that already has an ID and a tournament."""
+        challenge.setdefault("version", 1)
+        self.challenges[challenge["id"]] = challenge
+        self.adjacency.add(challenge)
+        self.partitions[challenge["tournament_id"]].add_challenge(challenge, date_ordinal(challenge["date"]))
+        if challenge["winner_id"] is not None:
+            self._ratings_stale = True
+        self._advance_sequence("challenges", challenge["id"])
+        self._mark("challenges", challenge["id"])
+        self._touch("challenges", tournaments=(challenge["tournament_id"],))
+        return challenge
+
+    @writes
+    def add_athletes(self, athletes):
+        """Insert many athlete records that already have IDs (a load), sorting each index once."""
+        enrolled = {}
+        for athlete in athletes:
+            athlete.setdefault("tournaments", [])
+            athlete.setdefault("version", 1)
+            self.athletes[athlete["id"]] = athlete
+            self._athletes_by_email[normalize_email(athlete["email"])] = athlete
+            for tournament_id in athlete["tournaments"]:
+                if tournament_id in self.tournaments and not self.enrollments.is_enrolled(athlete["id"], tournament_id):
+                    self.enrollments.enroll(athlete["id"], tournament_id)
+                    enrolled.setdefault(tournament_id, []).append(athlete)
+            self._advance_sequence("athletes", athlete["id"])
+        for tournament_id, tournament_athletes in enrolled.items():
+            self.partitions[tournament_id].add_athletes(tournament_athletes)
+        self._touch("athletes")
+
+    @writes
+    def add_challenges(self, challenges):
+        """Insert many challenge records that already have IDs and tournaments (a load), sorting each index once."""
+        challenges = list(challenges)
+        by_tournament = {}
+        for challenge in challenges:
+            challenge.setdefault("version", 1)
+            self.challenges[challenge["id"]] = challenge
+            by_tournament.setdefault(challenge["tournament_id"], []).append(challenge)
+            if challenge["winner_id"] is not None:
+                self._ratings_stale = True
+            self._advance_sequence("challenges", challenge["id"])
+        self.adjacency.add_many(challenges)
+        for tournament_id, tournament_challenges in by_tournament.items():
+            self.partitions[tournament_id].add_challenges(tournament_challenges)
+        self._touch("challenges")
+
+    @writes
+    def add_swiss_round(self, tournament_id, bye_id):
+        """Append a Swiss round that was already played (only its bye is kept)."""
+        self.swiss_rounds.setdefault(tournament_id, []).append(bye_id)
+
+    @writes
+    def set_rating_parameters(self, k, initial):
+        """Use persisted Elo parameters (the ratings are replayed on the next read)."""
+        self.ratings.k = k
+        self.ratings.initial = initial
+        self._ratings_stale = True
+        self._mark("ratings", None)
+
+    @writes
+    def save_all(self):
+        """Write every record to the repository (used after seeding)."""
+        with self.repository.transaction():
+            for specialty in self.specialties.values():
+                self.repository.save_specialty(specialty)
+            for tournament in self.tournaments.values():
+                self.repository.save_tournament(tournament)
+            for athlete in self.athletes.values():
+                self.repository.save_athlete(athlete)
+            for challenge in self._live_challenges():
+                self.repository.save_challenge(challenge)
+
+    # --- Lookups ---------------------------------------------------------
+
+    @reads
+    def list_athletes(self):
+        """Get every athlete, in insertion order."""
+        return list(self.athletes.values())
+
+    @reads
+    def list_tournaments(self):
+        """Get every tournament, in insertion order."""
+        return list(self.tournaments.values())
+
+    @reads
+    def list_specialties(self):
+        """Get every specialty, in insertion order."""
+        return list(self.specialties.values())
+
+    @reads
+    def get_athlete_by_id(self, athlete_id):
+        """Get athlete information by ID."""
+        return self.athletes.get(athlete_id)
+
+    @reads
+    def get_athlete_by_email(self, email):
+        """Get athlete information by email."""
+        return self._athletes_by_email.get(normalize_email(email))
+
+    @reads
+    def get_specialty_by_id(self, specialty_id):
+        """Get specialty information by ID."""
+        return self.specialties.get(specialty_id)
+
+    @reads
+    def get_tournament_by_id(self, tournament_id):
+        """Get tournament information by ID."""
+        return self.tournaments.get(tournament_id)
+
+    @reads
+    def get_challenge_by_id(self, challenge_id):
+        """Get challenge information by ID."""
+        return self._challenge(challenge_id)
+
+    # --- Athletes --------------------------------------------------------
+
+    @writes
+    def register_athlete(self, name, email, password, nickname=None, tournament_id=1):
+        """Register a new athlete."""
+        # Trova il torneo selezionato
+        selected_tournament = self.get_tournament_by_id(tournament_id)
+
+        if not selected_tournament:
+            return False, "Torneo non trovato"
+
+        if not selected_tournament["registration_open"]:
+            return False, "Le registrazioni per questo torneo sono chiuse"
+
+        # Check if email already exists
+        if self.get_athlete_by_email(email):
+            return False, "Email già registrata"
+
+        # Use nickname or default to name if not provided
+        if not nickname:
+            nickname = name.split()[0]  # Use first name as default nickname
+
+        # Create new athlete
+        new_athlete = {
+            "id": self._next_id("athletes"),
+            "name": name,
+            "nickname": nickname,
+            "email": email,
+            "password": password,
+            "level": 1,
+            "profile_img": None,  # avatar con le iniziali finché non carica una foto
+            "tournaments": [tournament_id],
+            "version": 1
+        }
+
+        self.add_athlete(new_athlete)
+        self.repository.save_athlete(new_athlete)
+        return True, "Registrazione completata con successo"
+
+    @writes
+    def delete_athlete(self, athlete_id):
+        """Delete an athlete and all their challenges."""
+        if athlete_id not in self.athletes:
+            return False, "Atleta non trovato"
+
+        self.delete_athletes([athlete_id])
+        return True, "Atleta eliminato con successo"
+
+    @writes
+    def delete_athletes(self, athlete_ids):
+        """Delete many athletes and all their challenges in one batch.
+
+        Athletes leave every index at once. Their challenges leave the
+        rankings and counters at once too, but are only tombstoned in the
+        id map, the partitions and the adjacency buckets: every read skips
+        them, and ``compact`` drops them later in one pass. Returns the
+        number of athletes deleted.
+        """
+        athlete_ids = [athlete_id for athlete_id in dict.fromkeys(athlete_ids) if athlete_id in self.athletes]
+        if not athlete_ids:
+            return 0
+
+        self._remove_athletes(athlete_ids)
+        self.repository.delete_athletes(athlete_ids)
+        return len(athlete_ids)
+
+    def _remove_athletes(self, athlete_ids):
+        """Remove athletes from memory and tombstone their challenges (already deleted from the repository)."""
+        # Raccogli le sfide degli atleti (una sfida tra due eliminati si conta una volta)
+        removed = {}
+        seen = set()
+        for athlete_id in athlete_ids:
+            for challenge_id in self.adjacency.challenge_ids(athlete_id):
+                if challenge_id not in seen:
+                    seen.add(challenge_id)
+                    challenge = self.challenges[challenge_id]
+                    removed.setdefault(challenge["tournament_id"], []).append(challenge)
+
+        # Rimuovi gli atleti prima delle sfide, così i loro risultati non li riposizionano
+        for athlete_id in athlete_ids:
+            athlete = self.athletes.pop(athlete_id)
+            self._athletes_by_email.pop(normalize_email(athlete["email"]), None)
+            for tournament_id in self.enrollments.remove_athlete(athlete_id):
+                self.partitions[tournament_id].remove_athlete(athlete_id)
+            self.adjacency.remove_athlete(athlete_id)
+            self.ratings.remove_athlete(athlete_id)
+            self._mark("athletes", athlete_id)
+
+        for tournament_id, challenges in removed.items():
+            self._discard_challenges(tournament_id, challenges)
+        self._touch("athletes", "challenges")
+
+    def _discard_challenges(self, tournament_id, challenges):
+        """Tombstone challenges of one tournament: hidden from every read, dropped by ``compact``."""
+        bracket = self.brackets.get(tournament_id)
+        for challenge in challenges:
+            self._tombstones.add(challenge["id"])
+            self.adjacency.discard(challenge)
+            if bracket is not None:
+                bracket.detach(challenge["id"])
+        self.partitions[tournament_id].discard_challenges(challenges)
+        self._ratings_stale = True
+
+    @writes
+    def compact(self):
+        """Drop tombstoned challenges from the id map, the partitions and the adjacency buckets."""
+        for partition in self.partitions.values():
+            if partition.dead:
+                partition.compact()
+        for challenge_id in self._tombstones:
+            del self.challenges[challenge_id]
+        self._tombstones = set()
+        return self.adjacency.compact()
+
+    def compact_if_needed(self, threshold=1000):
+        """Compact once enough challenges have been tombstoned, and replay stale ratings."""
+        if self._ratings_stale:
+            with self.lock.read():
+                self._refresh_ratings()
+        if self.adjacency.tombstones() >= threshold:
+            return self.compact()
+        return 0
+
+    def start_compactor(self, interval=COMPACT_INTERVAL, threshold=1000):
+        """Run ``compact_if_needed`` every ``interval`` seconds on a background thread."""
+        if self._compactor is not None:
+            return
+        self._compactor = threading.Thread(target=self._compact_loop, args=(interval, threshold),
+                                           name="store-compactor", daemon=True)
+        self._compactor.start()
+
+    def stop_compactor(self):
+        """Stop the background compaction thread."""
+        self._stopped.set()
+        if self._compactor is not None:
+            self._compactor.join()
+            self._compactor = None
+
+    def _compact_loop(self, interval, threshold):
+        while not self._stopped.wait(interval):
+            self.compact_if_needed(threshold)
+
+    def _apply_athlete(self, athlete, data):
+        """Apply changes to an athlete in memory and realign the indexes."""
+        athlete_id = athlete["id"]
+        old_email_key = normalize_email(athlete["email"])
+        old_tournaments = self.enrollments.tournaments_of(athlete_id)
+
+        # Aggiorna i dati dell'atleta
+        for key, value in data.items():
+            if key in athlete:
+                athlete[key] = value
+
+        new_email_key = normalize_email(athlete["email"])
+        if new_email_key != old_email_key:
+            self._athletes_by_email.pop(old_email_key, None)
+            self._athletes_by_email[new_email_key] = athlete
+
+        # Allinea le partizioni dei tornei a cui è stato iscritto o ritirato
+        new_tournaments = set(athlete["tournaments"])
+        for tournament_id in old_tournaments - new_tournaments:
+            self._withdraw(athlete_id, tournament_id)
+        for tournament_id in new_tournaments - old_tournaments:
+            self._enroll(athlete, tournament_id)
+        self._reposition(athlete)
+        self._mark("athletes", athlete_id)
+        self._touch("athletes", tournaments=(old_tournaments | new_tournaments) or (None,))
+
+    def _refresh_athlete(self, athlete_id):
+        """Replace an athlete's data in memory with the persisted record (after a conflict)."""
+        athlete = self.athletes.get(athlete_id)
+        record = self.repository.fetch_athlete(athlete_id)
+        if athlete is not None and record is not None:
+            self._apply_athlete(athlete, record)
+
+    def _commit_athlete(self, athlete, data):
+        """Write an athlete's changes against their version in memory, then apply them.
+
+        Returns ``False`` (after reloading the athlete) if the persisted row
+        had moved on.
+        """
+        updated = dict(athlete, **{key: value for key, value in data.items() if key in athlete})
+        updated["tournaments"] = list(updated["tournaments"])
+        updated["version"] = athlete["version"] + 1
+        if not self.repository.update_athlete(updated, athlete["version"]):
+            self._refresh_athlete(athlete["id"])
+            return False
+        self._apply_athlete(athlete, updated)
+        return True
+
+    @writes
+    def modify_athlete(self, athlete_id, data, expected_version=None):
+        """Modify an athlete's data.
+
+        With ``expected_version`` the change is refused if the athlete was
+        modified since the caller read that version.
+        """
+        athlete = self.athletes.get(athlete_id)
+        if athlete is None:
+            return False, "Atleta non trovato"
+
+        if expected_version is not None and athlete["version"] != expected_version:
+            return False, CONFLICT_MESSAGE
+
+        # L'email deve restare univoca anche dopo la modifica
+        if "email" in data:
+            owner = self.get_athlete_by_email(data["email"])
+            if owner is not None and owner["id"] != athlete_id:
+                return False, "Email già registrata"
+
+        if not self._commit_athlete(athlete, data):
+            return False, CONFLICT_MESSAGE
+        return True, "Dati atleta aggiornati con successo"
+
+    @writes
+    def enroll_in_tournament(self, athlete_id, tournament_id):
+        """Enroll an athlete in a tournament."""
+        athlete = self.athletes.get(athlete_id)
+        if athlete is None:
+            return False, "Atleta non trovato"
+
+        tournament = self.get_tournament_by_id(tournament_id)
+        if not tournament:
+            return False, "Torneo non trovato"
+
+        if not tournament["registration_open"]:
+            return False, "Le registrazioni per questo torneo sono chiuse"
+
+        # Verifica se l'atleta è già iscritto
+        if self.enrollments.is_enrolled(athlete_id, tournament_id):
+            return False, "Atleta già iscritto a questo torneo"
+
+        # Iscrivi l'atleta al torneo
+        if not self._commit_athlete(athlete, {"tournaments": athlete["tournaments"] + [tournament_id]}):
+            return False, CONFLICT_MESSAGE
+
+        return True, f"Iscrizione al torneo {tournament['name']} completata con successo"
+
+    # --- Challenges ------------------------------------------------------
+
+    def _check_tournament_for_challenges(self, tournament_id):
+        """Return an error message if the tournament doesn't accept challenges."""
+        tournament = self.get_tournament_by_id(tournament_id)
+        if not tournament:
+            return "Torneo non trovato"
+
+        if tournament["registration_open"]:
+            return "Le sfide possono essere create solo dopo la chiusura delle registrazioni"
+
+        return None
+
+    def _check_challenge(self, challenger_id, opponent_id, date, specialty_id, tournament_id, today):
+        """Return an error message if a proposed challenge is not valid."""
+        # Validate challenger and opponent
+        challenger = self.get_athlete_by_id(challenger_id)
+        opponent = self.get_athlete_by_id(opponent_id)
+
+        if not challenger or not opponent:
+            return "Atleta non trovato"
+
+        if challenger_id == opponent_id:
+            return "Non puoi sfidare te stesso"
+
+        # Entrambi gli atleti devono essere iscritti al torneo
+        if not (self.enrollments.is_enrolled(challenger_id, tournament_id)
+                and self.enrollments.is_enrolled(opponent_id, tournament_id)):
+            return "Entrambi gli atleti devono essere iscritti al torneo"
+
+        # Check if opponent is of equal or higher level
+        if opponent["level"] < challenger["level"]:
+            return "Puoi sfidare solo atleti di livello pari o superiore"
+
+        # Check if specialty exists
+        if specialty_id not in self.specialties:
+            return "Specialità non trovata"
+
+        # Check if date is in the future
+        challenge_date = datetime.date.fromisoformat(date)
+        if challenge_date <= today:
+            return "La data della sfida deve essere futura"
+
+        # Check if there's already a challenge between these athletes on this date
+        if self.partitions[tournament_id].has_challenge(challenger_id, opponent_id, date):
+            return "Esiste già una sfida tra questi atleti per questa data"
+
+        return None
+
+    def _new_challenge(self, challenger_id, opponent_id, date, specialty_id, tournament_id):
+        """Add a validated challenge to the store."""
+        return self.add_challenge({
+            "id": self._next_id("challenges"),
+            "challenger_id": challenger_id,
+            "opponent_id": opponent_id,
+            "date": date,
+            "specialty_id": specialty_id,
+            "winner_id": None,
+            "tournament_id": tournament_id,
+            "version": 1
+        })
+
+    @writes
+    def create_challenge(self, challenger_id, opponent_id, date, specialty_id, tournament_id):
+        """Create a new challenge."""
+        error = self._check_tournament_for_challenges(tournament_id)
+        if error is None:
+            error = self._check_challenge(challenger_id, opponent_id, date, specialty_id, tournament_id,
+                                          datetime.date.today())
+        if error is not None:
+            return False, error
+
+        # Create new challenge
+        new_challenge = self._new_challenge(challenger_id, opponent_id, date, specialty_id, tournament_id)
+        self.repository.save_challenge(new_challenge)
+        return True, "Sfida creata con successo"
+
+    @writes
+    def create_challenges(self, proposals, tournament_id):
+        """Create many challenges in one pass.
+
+        ``proposals`` is an iterable of ``(challenger_id, opponent_id, date,
+        specialty_id)`` tuples. Each one is checked like ``create_challenge``,
+        and also against the proposals accepted before it in the same batch.
+        Returns one ``(success, message)`` pair per proposal.
+        """
+        proposals = list(proposals)
+        error = self._check_tournament_for_challenges(tournament_id)
+        if error is not None:
+            return [(False, error)] * len(proposals)
+
+        today = datetime.date.today()
+        results = []
+        created = []
+        for challenger_id, opponent_id, date, specialty_id in proposals:
+            # Le sfide accettate entrano subito nell'indice, quindi i duplicati
+            # interni al lotto vengono scartati dallo stesso controllo
+            error = self._check_challenge(challenger_id, opponent_id, date, specialty_id, tournament_id, today)
+            if error is not None:
+                results.append((False, error))
+                continue
+            created.append(self._new_challenge(challenger_id, opponent_id, date, specialty_id, tournament_id))
+            results.append((True, "Sfida creata con successo"))
+
+        self.repository.save_challenges(created)
+        return results
+
+    @writes
+    def generate_calendar(self, tournament_id, specialty_id, courts, matches_per_court=1, max_per_day=1,
+                          pool_size=None):
+        """Generate the round robin (or pool) calendar of a tournament and create its challenges.
+
+        Matches go on the future days between the tournament's start and
+        end date, around the challenges already scheduled; pairs that
+        already have a challenge in the tournament are skipped.
+        """
+        error = self._check_tournament_for_challenges(tournament_id)
+        if error is not None:
+            return False, error
+
+        if specialty_id not in self.specialties:
+            return False, "Specialità non trovata"
+
+        if courts < 1 or matches_per_court < 1 or max_per_day < 1:
+            return False, "Campi, incontri per campo e incontri per atleta devono essere almeno 1"
+
+        tournament = self.tournaments[tournament_id]
+        first_day = max(datetime.date.fromisoformat(tournament["start_date"]),
+                        datetime.date.today() + datetime.timedelta(days=1))
+        last_day = datetime.date.fromisoformat(tournament["end_date"])
+        dates = [(first_day + datetime.timedelta(days=i)).isoformat()
+                 for i in range((last_day - first_day).days + 1)]
+        if not dates:
+            return False, "Nessuna data disponibile nel periodo del torneo"
+
+        # Carico già presente in calendario e coppie che si sono già sfidate
+        day_load = {}
+        athlete_load = {}
+        played = set()
+        for challenge in self.partitions[tournament_id].live_challenges():
+            a, b = challenge["challenger_id"], challenge["opponent_id"]
+            played.add((min(a, b), max(a, b)))
+            day_load[challenge["date"]] = day_load.get(challenge["date"], 0) + 1
+            for athlete_id in (a, b):
+                athlete_load[athlete_id, challenge["date"]] = athlete_load.get((athlete_id, challenge["date"]), 0) + 1
+
+        matches, unscheduled = plan_calendar(
+            self.get_tournament_athletes(tournament_id), dates, courts, matches_per_court, max_per_day,
+            pool_size, day_load, athlete_load, played
+        )
+
+        results = self.create_challenges(
+            ((challenger_id, opponent_id, date, specialty_id) for challenger_id, opponent_id, date in matches),
+            tournament_id
+        )
+        created = sum(1 for success, _ in results if success)
+
+        message = f"Calendario generato: {created} sfide create"
+        if unscheduled:
+            message += f", {unscheduled} incontri non collocati per mancanza di date o campi"
+        return True, message
+
+    def _apply_result(self, challenge, winner_id, level, version):
+        """Apply a persisted result in memory: winner, level, rankings, ratings and bracket.
+
+        Returns the bracket matches that became ready.
+        """
+        challenge["winner_id"] = winner_id
+        challenge["version"] += 1
+
+        winner = self.athletes[winner_id]
+        if level is None:
+            # Il backend non tiene i livelli: conta la copia in memoria
+            level, version = winner["level"] + 1, winner["version"] + 1
+        # Un risultato dello stesso atleta salvato dopo può essere già arrivato qui
+        if version > winner["version"]:
+            winner["level"] = level
+            winner["version"] = version
+        self.partitions[challenge["tournament_id"]].add_result(challenge)
+        self._reposition(winner)
+        loser_id = challenge["opponent_id"] if winner_id == challenge["challenger_id"] else challenge["challenger_id"]
+        if not self.ratings.record(winner_id, loser_id, (challenge["date"], challenge["id"])):
+            # Risultato di una data già superata: l'ordine giusto lo dà solo il replay
+            self._ratings_stale = True
+
+        # Livello e rating dei due atleti compaiono in tutti i loro tornei
+        self._mark("challenges", challenge["id"])
+        self._mark("athletes", winner_id)
+        self._touch("challenges", tournaments=(challenge["tournament_id"],))
+        self._touch("athletes", tournaments=self.enrollments.tournaments_of(winner_id)
+                    | self.enrollments.tournaments_of(loser_id) | {challenge["tournament_id"]})
+
+        bracket = self.brackets.get(challenge["tournament_id"])
+        if bracket is not None and challenge["id"] in bracket.match_of:
+            return bracket.record(bracket.match_of[challenge["id"]], winner_id)
+        return []
+
+    def _refresh_result(self, challenge):
+        """Catch up with a result another process recorded first (after a conflict)."""
+        record = self.repository.fetch_challenge(challenge["id"])
+        if record is not None and record["winner_id"] is not None and challenge["winner_id"] is None:
+            winner = self.repository.fetch_athlete(record["winner_id"])
+            if winner is not None:
+                # Gli incontri successivi del tabellone li crea chi ha registrato il
+                # risultato: l'altro processo, o il thread di questo in ``_commit_result``
+                self._apply_result(challenge, record["winner_id"], winner["level"], winner["version"])
+                challenge["version"] = record["version"]
+        for athlete_id in (challenge["challenger_id"], challenge["opponent_id"]):
+            self._refresh_athlete(athlete_id)
+
+    def record_challenge_result(self, challenge_id, winner_id, expected_version=None):
+        """Record the result of a challenge.
+
+        With ``expected_version`` the result is refused if the challenge was
+        modified since the caller read that version. The compare-and-swap in
+        the repository runs outside the store's lock; only applying the
+        result in memory takes it.
+        """
+        checked = self._check_result(challenge_id, winner_id, expected_version)
+        if isinstance(checked, str):
+            return False, checked
+        challenge, winner = checked
+
+        # Sfida e livello del vincitore si scrivono solo se la sfida è ancora
+        # alla versione letta; il livello cresce nel database
+        committed = self.repository.record_result(challenge, winner)
+        return self._commit_result(challenge_id, winner_id, challenge["version"], committed)
+
+    @reads
+    def _check_result(self, challenge_id, winner_id, expected_version):
+        """Validate a result; return an error message or copies of the challenge and the winner."""
+        challenge = self._challenge(challenge_id)
+        if challenge is None:
+            return "Sfida non trovata"
+
+        if expected_version is not None and challenge["version"] != expected_version:
+            return CONFLICT_MESSAGE
+
+        # Check if result is already recorded
+        if challenge["winner_id"] is not None:
+            return "Il risultato è già stato registrato"
+
+        # Check if winner is one of the athletes
+        if winner_id != challenge["challenger_id"] and winner_id != challenge["opponent_id"]:
+            return "Il vincitore deve essere uno degli atleti partecipanti alla sfida"
+
+        # Check if the challenge date is today or in the past
+        challenge_date = datetime.date.fromisoformat(challenge["date"])
+        if challenge_date > datetime.date.today():
+            return "Non è possibile registrare il risultato di una sfida futura"
+
+        return dict(challenge), dict(self.athletes[winner_id])
+
+    @writes
+    def _commit_result(self, challenge_id, winner_id, version, committed):
+        """Apply in memory a result the repository accepted (or catch up after a conflict)."""
+        challenge = self._challenge(challenge_id)
+        if challenge is None:
+            return False, "Sfida non trovata"
+
+        if committed is None:
+            self._refresh_result(challenge)
+            return False, CONFLICT_MESSAGE
+
+        tournament_id = challenge["tournament_id"]
+        if committed[0] is not None and challenge["winner_id"] == winner_id and challenge["version"] == version + 1:
+            # Il risultato salvato è questo: un thread in conflitto l'ha già riletto
+            # e applicato, ma gli incontri che sblocca restano da creare
+            bracket = self.brackets.get(tournament_id)
+            ready = []
+            if bracket is not None and challenge_id in bracket.match_of:
+                ready = bracket.waiting_after(bracket.match_of[challenge_id])
+        elif challenge["version"] != version:
+            # Senza database il confronto sulla versione si fa qui
+            return False, CONFLICT_MESSAGE
+        else:
+            # Nei tabelloni il vincitore avanza e i nuovi incontri diventano sfide
+            ready = self._apply_result(challenge, winner_id, *committed)
+        if ready:
+            self._schedule_bracket_matches(tournament_id, self.brackets[tournament_id], ready)
+
+        return True, "Risultato registrato con successo"
+
+    # --- Tournaments -----------------------------------------------------
+
+    @writes
+    def close_registration(self, tournament_id):
+        """Close tournament registration."""
+        tournament = self.get_tournament_by_id(tournament_id)
+        if not tournament:
+            return False, "Torneo non trovato"
+
+        tournament["registration_open"] = False
+        self.repository.save_tournament(tournament)
+        self._mark("tournaments", tournament_id)
+        self._touch("tournaments", tournaments=(tournament_id,))
+        return True, f"Registrazione per {tournament['name']} chiusa con successo"
+
+    @writes
+    def update_tournament_settings(self, tournament_id, name=None, start_date=None, end_date=None, registration_open=None):
+        """Update tournament settings."""
+        tournament = self.get_tournament_by_id(tournament_id)
+        if tournament is None:
+            return False, "Torneo non trovato"
+
+        # Il nome compare anche nelle viste degli altri tornei
+        scope = (None,) if name and name != tournament["name"] else (tournament_id,)
+
+        # Aggiorna i campi specificati
+        if name:
+            tournament["name"] = name
+        if start_date:
+            tournament["start_date"] = start_date
+        if end_date:
+            tournament["end_date"] = end_date
+        if registration_open is not None:
+            tournament["registration_open"] = registration_open
+
+        self.repository.save_tournament(tournament)
+        self._mark("tournaments", tournament_id)
+
+        # Con nuove date gli incontri del tabellone rimasti senza giorno trovano posto
+        bracket = self.brackets.get(tournament_id)
+        if bracket is not None and (start_date or end_date):
+            self._schedule_bracket_matches(tournament_id, bracket, bracket.unscheduled_matches())
+        self._touch("tournaments", tournaments=scope)
+        return True, "Impostazioni aggiornate con successo"
+
+    @writes
+    def create_tournament(self, name, start_date, end_date, registration_open=True):
+        """Create a new tournament."""
+        new_tournament = self.add_tournament({
+            "id": self._next_id("tournaments"),
+            "name": name,
+            "registration_open": registration_open,
+            "start_date": start_date,
+            "end_date": end_date
+        })
+        self.repository.save_tournament(new_tournament)
+
+        return True, f"Torneo {name} creato con successo"
+
+    @writes
+    def delete_tournament(self, tournament_id):
+        """Delete a tournament with its enrollments and challenges."""
+        if tournament_id not in self.tournaments:
+            return False, "Torneo non trovato"
+
+        self._remove_tournament(tournament_id)
+        self.repository.delete_tournament(tournament_id)
+
+        # Crea un torneo predefinito se non ce ne sono altri
+        if not self.tournaments:
+            self.create_tournament("Torneo Chanbara 2025", "2025-06-01", "2025-06-30")
+
+        return True, "Torneo eliminato con successo"
+
+    def _remove_tournament(self, tournament_id):
+        """Remove a tournament with its enrollments, challenges, bracket and rounds from memory."""
+        partition = self.partitions.pop(tournament_id)
+        self.brackets.pop(tournament_id, None)
+        self.swiss_rounds.pop(tournament_id, None)
+
+        # Rimuovi il torneo dalle iscrizioni degli atleti
+        for athlete_id in self.enrollments.remove_tournament(tournament_id):
+            self.athletes[athlete_id]["tournaments"].remove(tournament_id)
+
+        # Rimuovi tutte le sfide associate al torneo (anche quelle già eliminate)
+        for challenge in partition.challenges.values():
+            del self.challenges[challenge["id"]]
+            self._tombstones.discard(challenge["id"])
+            self.adjacency.discard(challenge)
+
+        # Rimuovi il torneo
+        del self.tournaments[tournament_id]
+        self._ratings_stale = True
+        self._mark("tournaments", tournament_id)
+        self._touch("tournaments", "athletes", "challenges")
+
+    # --- Pairings --------------------------------------------------------
+
+    def _next_match_date(self, tournament_id):
+        """Get the date of generated pairings: the first future day of the tournament (``None`` once it is over)."""
+        tournament = self.tournaments[tournament_id]
+        date = max(datetime.date.fromisoformat(tournament["start_date"]),
+                   datetime.date.today() + datetime.timedelta(days=1))
+        return date if date <= datetime.date.fromisoformat(tournament["end_date"]) else None
+
+    def _pair_challenges(self, tournament_id, pairs, specialty_id):
+        """Create a challenge for each pair of athletes on the first free future day.
+
+        The athlete with the lower level challenges the other, as for free
+        challenges. Returns the new challenge of each pair (``None`` for a
+        pair that can't play, also when no day is left before the end of the
+        tournament); writing them is up to the caller.
+        """
+        date = self._next_match_date(tournament_id)
+        if date is None:
+            return [None] * len(pairs)
+        end = datetime.date.fromisoformat(self.tournaments[tournament_id]["end_date"])
+        partition = self.partitions[tournament_id]
+        today = datetime.date.today()
+
+        challenges = []
+        for challenger_id, opponent_id in pairs:
+            challenger = self.athletes.get(challenger_id)
+            opponent = self.athletes.get(opponent_id)
+            if challenger is None or opponent is None:
+                challenges.append(None)
+                continue
+            if challenger["level"] > opponent["level"]:
+                challenger_id, opponent_id = opponent_id, challenger_id
+            match_date = date
+            while partition.has_challenge(challenger_id, opponent_id, match_date.isoformat()):
+                match_date += datetime.timedelta(days=1)
+            if match_date > end:
+                challenges.append(None)
+                continue
+            if self._check_challenge(challenger_id, opponent_id, match_date.isoformat(), specialty_id, tournament_id,
+                                     today) is not None:
+                challenges.append(None)
+                continue
+            challenges.append(self._new_challenge(challenger_id, opponent_id, match_date.isoformat(), specialty_id,
+                                                  tournament_id))
+        return challenges
+
+    # --- Brackets --------------------------------------------------------
+
+    def _schedule_bracket_matches(self, tournament_id, bracket, matches):
+        """Create the challenges of bracket matches whose two athletes are known."""
+        if not matches:
+            return
+        challenges = self._pair_challenges(tournament_id, [(bracket.top[m], bracket.bottom[m]) for m in matches],
+                                           bracket.specialty_id)
+        created = []
+        for match, challenge in zip(matches, challenges):
+            if challenge is not None:
+                bracket.attach(match, challenge["id"])
+                created.append(challenge)
+
+        with self.repository.transaction():
+            self.repository.save_challenges(created)
+            self.repository.save_bracket_matches(tournament_id, [(c["id"], bracket.match_of[c["id"]]) for c in created])
+        self._mark("brackets", tournament_id)
+
+    @writes
+    def create_bracket(self, tournament_id, specialty_id, double=False):
+        """Seed the enrolled athletes by ranking and start an elimination bracket."""
+        error = self._check_tournament_for_challenges(tournament_id)
+        if error is not None:
+            return False, error
+
+        if tournament_id in self.brackets:
+            return False, "Il torneo ha già un tabellone"
+
+        if specialty_id not in self.specialties:
+            return False, "Specialità non trovata"
+
+        if self._next_match_date(tournament_id) is None:
+            return False, ENDED_MESSAGE
+
+        seeds = [athlete["id"] for athlete in self.get_rankings(tournament_id)]
+        if not 2 <= len(seeds) <= MAX_ENTRANTS:
+            return False, f"Il tabellone richiede da 2 a {MAX_ENTRANTS} atleti iscritti"
+
+        bracket = Bracket(seeds, double, specialty_id)
+        self.brackets[tournament_id] = bracket
+        self.repository.save_bracket(tournament_id, bracket)
+        self._mark("brackets", tournament_id)
+        self._schedule_bracket_matches(tournament_id, bracket, bracket.opening_matches())
+        self._touch("tournaments", tournaments=(tournament_id,))
+
+        return True, f"Tabellone creato con {len(seeds)} atleti e {len(bracket.challenge_of)} sfide"
+
+    @writes
+    def restore_bracket(self, tournament_id, seeds, double, specialty_id, links):
+        """Rebuild a persisted bracket by replaying its linked challenges in id order."""
+        bracket = Bracket(seeds, double, specialty_id)
+        for challenge_id, match in links:
+            challenge = self._challenge(challenge_id)
+            if challenge is None:
+                continue
+            bracket.attach(match, challenge_id)
+            if challenge["winner_id"] is not None:
+                bracket.record(match, challenge["winner_id"])
+        self.brackets[tournament_id] = bracket
+        return bracket
+
+    @writes
+    def delete_bracket(self, tournament_id):
+        """Drop a tournament's bracket, keeping the challenges already created."""
+        if self.brackets.pop(tournament_id, None) is None:
+            return False, "Il torneo non ha un tabellone"
+        self.repository.delete_bracket(tournament_id)
+        self._mark("brackets", tournament_id)
+        self._touch("tournaments", tournaments=(tournament_id,))
+        return True, "Tabellone eliminato"
+
+    @reads
+    def get_bracket(self, tournament_id):
+        """Get a tournament's bracket, if it has one."""
+        return self.brackets.get(tournament_id)
+
+    # --- Swiss rounds ----------------------------------------------------
+
+    @writes
+    def generate_swiss_round(self, tournament_id, specialty_id):
+        """Pair the enrolled athletes for the next Swiss round and create its challenges in one write.
+
+        Athletes are paired in ranking order avoiding rematches; with an odd
+        number of athletes one of them rests (without a victory, since only
+        challenges count in the rankings).
+        """
+        error = self._check_tournament_for_challenges(tournament_id)
+        if error is not None:
+            return False, error
+
+        if specialty_id not in self.specialties:
+            return False, "Specialità non trovata"
+
+        partition = self.partitions[tournament_id]
+        stats = partition.stats.summary(datetime.date.today().toordinal())
+        if stats["completed_challenges"] < stats["total_challenges"]:
+            return False, "Registra prima i risultati delle sfide in attesa del torneo"
+
+        if self._next_match_date(tournament_id) is None:
+            return False, ENDED_MESSAGE
+
+        order = [athlete["id"] for athlete in self.get_rankings(tournament_id)]
+        if len(order) < 2:
+            return False, "Servono almeno 2 atleti iscritti"
+
+        played = {}
+        for challenge in partition.live_challenges():
+            played.setdefault(challenge["challenger_id"], set()).add(challenge["opponent_id"])
+            played.setdefault(challenge["opponent_id"], set()).add(challenge["challenger_id"])
+
+        rounds = self.swiss_rounds.setdefault(tournament_id, [])
+        pairs, bye = swiss_pairings(order, played, {athlete_id for athlete_id in rounds if athlete_id is not None})
+        created = [challenge for challenge in self._pair_challenges(tournament_id, pairs, specialty_id)
+                   if challenge is not None]
+        rounds.append(bye)
+
+        with self.repository.transaction():
+            self.repository.save_challenges(created)
+            self.repository.save_swiss_round(tournament_id, len(rounds), bye)
+        self._mark("swiss_rounds", tournament_id)
+        self._touch("tournaments", tournaments=(tournament_id,))
+
+        message = f"Turno {len(rounds)}: {len(created)} sfide create"
+        if bye is not None:
+            message += f", riposa {self.athletes[bye]['name']}"
+        return True, message
+
+    @reads
+    def count_swiss_rounds(self, tournament_id):
+        """Count the Swiss rounds generated for a tournament."""
+        return len(self.swiss_rounds.get(tournament_id, ()))
+
+    # --- Read models -----------------------------------------------------
+
+    @reads
+    def profile_images(self):
+        """Get the profile image references of every athlete."""
+        return {athlete["profile_img"] for athlete in self.athletes.values() if athlete.get("profile_img")}
+
+    @writes
+    def replay_ratings(self, k=None, initial=None):
+        """Recompute every rating from the challenge history, optionally with new (persisted) parameters."""
+        if (k is not None and k != self.ratings.k) or (initial is not None and initial != self.ratings.initial):
+            self.ratings.k = self.ratings.k if k is None else k
+            self.ratings.initial = self.ratings.initial if initial is None else initial
+            self.repository.save_rating_parameters(self.ratings.k, self.ratings.initial)
+            self._mark("ratings", None)
+        self.ratings.replay(self._live_challenges(), self.athletes)
+        self._ratings_stale = False
+        self._touch("athletes")
+
+    def _refresh_ratings(self):
+        """Replay stale ratings (under the read lock: the ratings have a lock of their own)."""
+        with self._ratings_lock:
+            if self._ratings_stale:
+                self.ratings.replay(self._live_challenges(), self.athletes)
+                self._ratings_stale = False
+
+    @reads
+    def get_rating(self, athlete_id):
+        """Get an athlete's Elo rating."""
+        if self._ratings_stale:
+            self._refresh_ratings()
+        return self.ratings.rating(athlete_id)
+
+    @reads
+    def get_rankings(self, tournament_id):
+        """Get the rankings of a tournament sorted by level."""
+        return self.partition(tournament_id).rankings.table()
+
+    @reads
+    def get_top_athletes(self, tournament_id, n=3):
+        """Get the first ``n`` athletes of a tournament's ranking."""
+        return self.partition(tournament_id).rankings.top(n)
+
+    @reads
+    def get_ranking_position(self, tournament_id, athlete_id):
+        """Get an athlete's 1-based position in a tournament's ranking."""
+        return self.partition(tournament_id).rankings.position(athlete_id)
+
+    @reads
+    def check_rankings(self, tournament_id):
+        """Compare a tournament's incremental ranking with a full recomputation.
+
+        Returns the list of positions where the two disagree, as
+        ``(position, incremental_row, recomputed_row)`` tuples.
+        """
+        partition = self.partition(tournament_id)
+        expected = compute_rankings([self.athletes[athlete_id] for athlete_id in self.enrollments.roster(tournament_id)],
+                                    partition.live_challenges())
+        actual = partition.rankings.table()
+
+        mismatches = []
+        for position in range(max(len(expected), len(actual))):
+            actual_row = actual[position] if position < len(actual) else None
+            expected_row = expected[position] if position < len(expected) else None
+            if actual_row != expected_row:
+                mismatches.append((position + 1, actual_row, expected_row))
+        return mismatches
+
+    @reads
+    def describe_challenge(self, challenge):
+        """Resolve the names referenced by a challenge."""
+        challenger = self.get_athlete_by_id(challenge["challenger_id"])
+        opponent = self.get_athlete_by_id(challenge["opponent_id"])
+        specialty = self.get_specialty_by_id(challenge["specialty_id"])
+        winner = self.get_athlete_by_id(challenge["winner_id"]) if challenge["winner_id"] else None
+
+        return {
+            "id": challenge["id"],
+            "date": challenge["date"],
+            "challenger": challenger["name"] if challenger else "Sconosciuto",
+            "opponent": opponent["name"] if opponent else "Sconosciuto",
+            "specialty": specialty["name"] if specialty else "Sconosciuta",
+            "winner": winner["name"] if winner else None
+        }
+
+    @reads
+    def get_athlete_challenges(self, athlete_id):
+        """Get upcoming and past challenges for an athlete."""
+        return self.get_upcoming_challenges(athlete_id), self.get_past_challenges(athlete_id)
+
+    @reads
+    def get_upcoming_challenges(self, athlete_id):
+        """Get an athlete's challenges from today on, soonest first."""
+        today = datetime.date.today().toordinal()
+        return [self.describe_challenge(self.challenges[challenge_id])
+                for challenge_id in self.adjacency.upcoming(athlete_id, today)]
+
+    @reads
+    def count_past_challenges(self, athlete_id):
+        """Count an athlete's past challenges."""
+        return self.adjacency.count_past(athlete_id, datetime.date.today().toordinal())
+
+    @reads
+    def get_past_challenges(self, athlete_id, offset=0, limit=None):
+        """Get one page of an athlete's past challenges, most recent first."""
+        today = datetime.date.today().toordinal()
+        return [self.describe_challenge(self.challenges[challenge_id])
+                for challenge_id in self.adjacency.past(athlete_id, today, offset, limit)]
+
+    @reads
+    def is_enrolled(self, athlete_id, tournament_id):
+        """Tell whether an athlete is enrolled in a tournament."""
+        return self.enrollments.is_enrolled(athlete_id, tournament_id)
+
+    @reads
+    def count_enrolled(self, tournament_id):
+        """Count the athletes enrolled in a tournament."""
+        return self.enrollments.count(tournament_id)
+
+    @reads
+    def get_tournament_athletes(self, tournament_id):
+        """Get the athletes enrolled in a tournament, by id."""
+        return [self.athletes[athlete_id] for athlete_id in sorted(self.enrollments.roster(tournament_id))]
+
+    @reads
+    def get_tournament_challenges(self, tournament_id):
+        """Get the challenges of a tournament."""
+        return self.partition(tournament_id).live_challenges()
+
+    @reads
+    def get_possible_opponents(self, athlete_id, tournament_id):
+        """Get possible opponents for an athlete in a tournament."""
+        # Athletes with equal or higher level, sorted by level and name
+        return self.partition(tournament_id).levels.opponents(athlete_id)
+
+    @reads
+    def count_opponents(self, athlete_id, tournament_id, query=""):
+        """Count possible opponents in a tournament whose name contains ``query``."""
+        return self.partition(tournament_id).levels.count_opponents(athlete_id, query)
+
+    @reads
+    def find_opponents(self, athlete_id, tournament_id, query="", offset=0, limit=None):
+        """Get one page of possible opponents in a tournament whose name contains ``query``."""
+        return self.partition(tournament_id).levels.opponents(athlete_id, query, offset, limit)
+
+    @reads
+    def get_admin_stats(self, tournament_id):
+        """Get statistics for admin dashboard."""
+        tournament = self.get_tournament_by_id(tournament_id)
+        partition = self.partition(tournament_id)
+
+        stats = partition.stats.summary(datetime.date.today().toordinal())
+        stats["total_athletes"] = self.enrollments.count(tournament_id)
+        stats["registration_open"] = tournament["registration_open"] if tournament else False
+        return stats
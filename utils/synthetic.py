@@ -0,0 +1,136 @@
+"""Reproducible synthetic tournaments for load testing.
+
+``generate_store`` fills a ``TournamentStore`` with N athletes, M challenges
+and T tournaments. The same arguments and seed always give the same data.
+Levels are skewed towards beginners, most athletes are enrolled in one
+tournament and some in two or three, and challenges are drawn between
+tournament mates of similar level. Most challenges dated up to today
+already have a winner, more often the higher-level athlete; the others are
+still waiting for their result.
+"""
+import datetime
+import random
+
+from utils.store import TournamentStore, challenge_key
+
+FIRST_NAMES = (
+    "Mario", "Luigi", "Anna", "Sara", "Giulia", "Marco", "Luca", "Chiara",
+    "Francesca", "Matteo", "Elena", "Davide", "Marta", "Paolo", "Silvia",
+    "Andrea", "Federica", "Simone", "Valentina", "Stefano",
+)
+
+LAST_NAMES = (
+    "Rossi", "Verdi", "Bianchi", "Neri", "Russo", "Ferrari", "Esposito",
+    "Romano", "Colombo", "Ricci", "Marino", "Greco", "Bruno", "Gallo",
+    "Conti", "De Luca", "Costa", "Giordano", "Mancini", "Rizzo",
+)
+
+SPECIALTIES = ("kodachi", "choken free", "nito", "tate-kodachi", "tate-choken")
+
+# Pesi dei livelli 1..10: molti principianti, pochi esperti
+LEVEL_WEIGHTS = (20, 18, 15, 12, 10, 8, 6, 5, 4, 2)
+
+# Probabilità di essere iscritti anche a un secondo e a un terzo torneo
+EXTRA_ENROLLMENT = (0.3, 0.1)
+
+# Quota delle sfide passate con il risultato già registrato
+RECORDED_RESULTS = 0.9
+
+# Durata in giorni di ogni torneo
+TOURNAMENT_DAYS = 30
+
+
+def generate_store(n_athletes, n_challenges, n_tournaments=1, seed=0, repository=None, today=None):
+    """Build a store filled with a synthetic tournament.
+
+    Tournaments are consecutive 30-day windows, the last one centred on
+    ``today``, all with registration closed so challenges can be created.
+    """
+    rng = random.Random(seed)
+    today = today or datetime.date.today()
+    store = TournamentStore(repository)
+
+    first_start = today - datetime.timedelta(days=TOURNAMENT_DAYS * n_tournaments - TOURNAMENT_DAYS // 2)
+    windows = {}
+    for tournament_id in range(1, n_tournaments + 1):
+        start = first_start + datetime.timedelta(days=TOURNAMENT_DAYS * (tournament_id - 1))
+        end = start + datetime.timedelta(days=TOURNAMENT_DAYS - 1)
+        windows[tournament_id] = (start.toordinal(), end.toordinal())
+        store.add_tournament({
+            "id": tournament_id,
+            "name": f"Torneo Sintetico {tournament_id}",
+            "registration_open": False,
+            "start_date": start.isoformat(),
+            "end_date": end.isoformat()
+        })
+
+    for specialty_id, name in enumerate(SPECIALTIES, start=1):
+        store.add_specialty({"id": specialty_id, "name": name})
+
+    # Atleti per torneo, per estrarre le coppie tra compagni di torneo
+    members = {tournament_id: [] for tournament_id in windows}
+    levels = rng.choices(range(1, len(LEVEL_WEIGHTS) + 1), weights=LEVEL_WEIGHTS, k=n_athletes)
+    for athlete_id in range(1, n_athletes + 1):
+        tournaments = [rng.randint(1, n_tournaments)]
+        for probability in EXTRA_ENROLLMENT:
+            if rng.random() < probability:
+                extra = rng.randint(1, n_tournaments)
+                if extra not in tournaments:
+                    tournaments.append(extra)
+        for tournament_id in tournaments:
+            members[tournament_id].append(athlete_id)
+
+        store.add_athlete({
+            "id": athlete_id,
+            "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {athlete_id}",
+            "nickname": None,
+            "email": f"atleta{athlete_id}@example.com",
+            "password": "password",
+            "level": levels[athlete_id - 1],
+            "profile_img": None,
+            "tournaments": tournaments
+        })
+
+    eligible = [tournament_id for tournament_id, ids in members.items() if len(ids) > 1]
+    today_ordinal = today.toordinal()
+    keys = set()
+    challenge_id = 0
+    attempts = 0
+    while challenge_id < n_challenges and eligible and attempts < n_challenges * 10:
+        attempts += 1
+        tournament_id = rng.choice(eligible)
+        pool = members[tournament_id]
+        athlete_id = rng.choice(pool)
+        other_id = rng.choice(pool)
+        # Solo avversari di livello simile
+        if other_id == athlete_id or abs(levels[athlete_id - 1] - levels[other_id - 1]) > 2:
+            continue
+
+        # Lo sfidante è quello di livello più basso
+        if levels[athlete_id - 1] > levels[other_id - 1]:
+            athlete_id, other_id = other_id, athlete_id
+
+        ordinal = rng.randint(*windows[tournament_id])
+        date = datetime.date.fromordinal(ordinal).isoformat()
+        key = challenge_key(athlete_id, other_id, date)
+        if key in keys:
+            continue
+        keys.add(key)
+
+        winner_id = None
+        if ordinal <= today_ordinal and rng.random() < RECORDED_RESULTS:
+            gap = levels[other_id - 1] - levels[athlete_id - 1]
+            winner_id = other_id if rng.random() < 0.5 + 0.15 * gap else athlete_id
+
+        challenge_id += 1
+        store.add_challenge({
+            "id": challenge_id,
+            "challenger_id": athlete_id,
+            "opponent_id": other_id,
+            "date": date,
+            "specialty_id": rng.randint(1, len(SPECIALTIES)),
+            "winner_id": winner_id,
+            "tournament_id": tournament_id
+        })
+
+    return store
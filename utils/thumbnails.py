@@ -0,0 +1,153 @@
+"""Background transcoding of uploaded profile photos.
+
+Originals stay in the blob store. ``ThumbnailPipeline`` hands them to a
+process pool that decodes the image, drops its metadata and writes square
+WebP thumbnails in the sizes the pages use. Pages ask for a thumbnail
+path and show a placeholder until it exists, so neither the script thread
+nor the browser ever handles the original file.
+"""
+import io
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageOps
+
+from utils.blobstore import KEY_PREFIX, is_blob_key
+
+# Lati in pixel delle miniature (classifica, profilo, intestazione)
+THUMBNAIL_SIZES = (100, 150, 50)
+
+# Immagine neutra mostrata finché la miniatura non è pronta
+PLACEHOLDER_SVG = (
+    '<svg xmlns="http://www.w3.org/2000/svg" width="150" height="150" viewBox="0 0 150 150">'
+    '<rect width="150" height="150" fill="#3a3d4a"/>'
+    '<circle cx="75" cy="58" r="28" fill="#5b5f70"/>'
+    '<rect x="30" y="98" width="90" height="40" rx="20" fill="#5b5f70"/>'
+    '</svg>'
+)
+
+
+def transcode(data, sizes=THUMBNAIL_SIZES):
+    """Decode an image and return ``{size: webp_bytes}`` square thumbnails.
+
+    Runs in a worker process. Orientation from EXIF is applied before the
+    metadata is dropped.
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+
+    thumbnails = {}
+    for size in sizes:
+        thumbnail = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        # Nessun parametro exif/icc: la miniatura esce senza metadati
+        thumbnail.save(buffer, format="WEBP", quality=80, method=4)
+        thumbnails[size] = buffer.getvalue()
+    return thumbnails
+
+
+class ThumbnailPipeline:
+    """Thumbnails of blob-store images, produced by a process pool."""
+
+    def __init__(self, blob_store, root, max_workers=2):
+        self.blob_store = blob_store
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+        # "spawn": il processo di Streamlit ha già dei thread attivi
+        self._executor = ProcessPoolExecutor(max_workers=max_workers,
+                                             mp_context=multiprocessing.get_context("spawn"))
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._failed = set()
+        self._ready = set()
+
+    def _path(self, digest, size):
+        return os.path.join(self.root, digest[:2], f"{digest[2:]}-{size}.webp")
+
+    def _write(self, digest, thumbnails):
+        for size, data in thumbnails.items():
+            path = self._path(digest, size)
+            directory = os.path.dirname(path)
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+            with os.fdopen(fd, "wb") as tmp:
+                tmp.write(data)
+            os.replace(tmp_path, path)
+
+    def _done(self, digest, future):
+        try:
+            self._write(digest, future.result())
+        except Exception:
+            # File non decodificabile: resta il segnaposto
+            with self._lock:
+                self._failed.add(digest)
+        else:
+            with self._lock:
+                self._ready.add(digest)
+        finally:
+            with self._lock:
+                self._pending.pop(digest, None)
+
+    def submit(self, key):
+        """Queue the thumbnails of a blob, unless they exist or are queued."""
+        if not is_blob_key(key):
+            return
+        digest = key[len(KEY_PREFIX):]
+
+        # Il digest è l'hash del contenuto: un'immagine già vista non genera
+        # un altro lavoro, senza rileggere il blob né controllare il disco
+        with self._lock:
+            if digest in self._ready or digest in self._pending or digest in self._failed:
+                return
+            if all(os.path.exists(self._path(digest, size)) for size in THUMBNAIL_SIZES):
+                self._ready.add(digest)
+                return
+            self._pending[digest] = None
+
+        data = self.blob_store.get(key)
+        if data is None:
+            with self._lock:
+                self._pending.pop(digest, None)
+            return
+        with self._lock:
+            future = self._executor.submit(transcode, data)
+            self._pending[digest] = future
+        future.add_done_callback(lambda f: self._done(digest, f))
+
+    def thumbnail(self, key, size):
+        """Get the path of a ready thumbnail, or None (queueing it if needed)."""
+        if not is_blob_key(key):
+            return None
+        path = self._path(key[len(KEY_PREFIX):], size)
+        if os.path.exists(path):
+            return path
+        self.submit(key)
+        return None
+
+    def collect_garbage(self, referenced):
+        """Delete thumbnails of images no longer referenced."""
+        digests = {key[len(KEY_PREFIX):] for key in referenced if is_blob_key(key)}
+        removed = 0
+        for prefix in os.listdir(self.root):
+            directory = os.path.join(self.root, prefix)
+            if not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                if name.startswith(".tmp-"):
+                    continue
+                digest = prefix + name.split("-", 1)[0]
+                if digest not in digests:
+                    os.unlink(os.path.join(directory, name))
+                    removed += 1
+                    with self._lock:
+                        self._ready.discard(digest)
+        return removed
+
+    def shutdown(self):
+        """Stop the worker processes."""
+        self._executor.shutdown(wait=False, cancel_futures=True)